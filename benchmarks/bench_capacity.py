@@ -0,0 +1,372 @@
+﻿#!/usr/bin/env python3
+"""
+Load simulator: capacity of one ingestion instance vs number of users.
+
+Seeds a scratch Postgres database with N synthetic users and M keywords
+each (Zipf-distributed, so a few keywords are shared by many users, as in
+production), serves every platform from a local stand-in that publishes
+--new-jobs fresh listings per cycle, stubs Telegram, and runs full
+IngestionEngine cycles (fetch -> near-dup -> match -> store -> claim ->
+deliver) at each scale point.
+
+    python3 benchmarks/bench_capacity.py --database-url postgresql://localhost/fb_loadsim \
+        --users 100,1000,5000 --keywords 5 --cycles 3
+
+Per scale point it reports cycle time (fetch to last send queued), the
+time the delivery engine needs to drain, DB queries per cycle, sends per
+second and RSS, and saves everything as JSON under benchmarks/results/.
+
+The ingest path uses Postgres-only SQL (unnest, ON CONFLICT, xmax), so
+SQLite is not enough. All app tables in the target database are dropped
+and recreated: the database name must contain "sim", "bench" or "test".
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "workers"))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, "results")
+
+VOCABULARY = [
+    "python", "django", "wordpress", "seo", "react", "logo", "translation", "excel",
+    "shopify", "data entry", "php", "laravel", "javascript", "node", "graphic design",
+    "video editing", "copywriting", "scraping", "flutter", "android", "ios", "figma",
+    "marketing", "accounting", "aws", "docker", "sql", "power bi", "tableau", "ai",
+    "machine learning", "chatbot", "telegram", "woocommerce", "magento", "unity",
+    "3d", "illustration", "animation", "voice over", "ghostwriting", "proofreading",
+    "lead generation", "customer support", "virtual assistant", "bookkeeping",
+    "autocad", "solidworks", "arduino", "embedded", "kotlin", "swift", "golang",
+    "rust", "c#", ".net", "angular", "vue", "tailwind", "webflow", "wix", "bubble",
+    "zapier", "airtable", "notion", "salesforce", "hubspot", "google ads",
+    "facebook ads", "tiktok", "youtube", "podcast", "music", "photoshop",
+    "illustrator", "indesign", "ui/ux", "landing page", "email marketing",
+    "μετάφραση", "λογιστής", "προγραμματιστής", "γραφίστας",
+]
+FILLER = ("need help with the project deliver quality work fast budget flexible long term "
+          "looking for experienced freelancer please send portfolio details attached").split()
+
+PAGE_JOBS = 40
+
+
+def zipf_weights(n: int, s: float):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--database-url", required=True, help="scratch Postgres database (dropped and reseeded)")
+    ap.add_argument("--users", default="100,1000,5000", help="comma separated scale points")
+    ap.add_argument("--keywords", type=int, default=5, help="keywords per user")
+    ap.add_argument("--zipf", type=float, default=1.1, help="keyword popularity skew")
+    ap.add_argument("--cycles", type=int, default=3, help="measured cycles per scale point (after one warm-up)")
+    ap.add_argument("--new-jobs", type=int, default=10, help="fresh listings per platform per cycle")
+    ap.add_argument("--site-ms", type=float, default=150, help="stand-in platform response time")
+    ap.add_argument("--tg-ms", type=float, default=60, help="stub sendMessage latency")
+    ap.add_argument("--tg-rate", type=float, help="global send rate (default: TG_GLOBAL_RATE)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="results JSON (default: benchmarks/results/capacity-<timestamp>.json)")
+    ap.add_argument("--force", action="store_true", help="skip the database name check")
+    return ap.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+
+if ARGS is not None:
+    url = urlsplit(ARGS.database_url)
+    if not url.scheme.startswith("postgres"):
+        sys.exit("the ingest path needs Postgres (unnest / ON CONFLICT / xmax); got " + url.scheme)
+    dbname = url.path.lstrip("/")
+    if not ARGS.force and not any(tag in dbname for tag in ("sim", "bench", "test")):
+        sys.exit(f"refusing to wipe database {dbname!r}: use a name containing sim/bench/test or --force")
+
+    # before any app module creates its engine
+    os.environ["DATABASE_URL"] = ARGS.database_url
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+    os.environ.setdefault("HTML_STREAMING", "0")
+
+import httpx
+from sqlalchemy import event, text
+
+import db
+import telegram_delivery
+from db_events import ensure_feed_events_schema
+from db_jobs import ensure_job_schema
+from db_keywords import ensure_keywords_schema
+from db_platform_state import ensure_platform_state_schema
+from digest import ensure_digest_schema
+from http_client import HttpClient
+from worker_ingest import FETCHERS, IngestionEngine, fetch_result
+
+# one line per request would drown the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# ----------------------------------------------------------
+# DATABASE
+# ----------------------------------------------------------
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def seed(n_users: int, per_user: int, skew: float, rng: random.Random):
+    ensure_keywords_schema()
+    ensure_feed_events_schema()
+    ensure_job_schema()
+    ensure_platform_state_schema()
+
+    session = db.get_session()
+    try:
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS app_user (
+                id SERIAL PRIMARY KEY,
+                telegram_id BIGINT UNIQUE,
+                countries TEXT,
+                proposal_template TEXT,
+                active BOOLEAN DEFAULT TRUE,
+                blocked BOOLEAN DEFAULT FALSE,
+                start_date TIMESTAMP DEFAULT NOW(),
+                trial_until TIMESTAMP,
+                license_until TIMESTAMP
+            )
+        """))
+        session.commit()
+        ensure_digest_schema()
+        session.execute(text(
+            "TRUNCATE app_user, user_keywords, feed_event, saved_job, job, platform_state RESTART IDENTITY"
+        ))
+
+        weights = zipf_weights(len(VOCABULARY), skew)
+        users, keywords = [], []
+        for i in range(n_users):
+            tid = 7_000_000_000 + i
+            users.append({"t": tid})
+            picked = set()
+            while len(picked) < min(per_user, len(VOCABULARY)):
+                picked.add(rng.choices(VOCABULARY, weights)[0])
+            keywords.extend({"u": tid, "k": kw} for kw in sorted(picked))
+
+        session.execute(text("INSERT INTO app_user (telegram_id, countries) VALUES (:t, 'ALL')"), users)
+        session.execute(text("INSERT INTO user_keywords (user_id, keyword) VALUES (:u, :k)"), keywords)
+        session.commit()
+    finally:
+        db.close_session(session)
+
+
+# ----------------------------------------------------------
+# PLATFORM STAND-IN
+# ----------------------------------------------------------
+CARDS = {
+    "www.careerjet.com": (
+        '<article class="job clicky"><header><h2><a class="title" href="/jobad/{i}">{title}</a></h2></header>'
+        '<ul class="location"><li>Athens</li></ul><div class="desc">{desc}</div>'
+        '<footer><span class="date">1 hours ago</span></footer></article>'
+    ),
+    "www.kariera.gr": (
+        '<article class="job-card"><a href="/el/jobs/{i}-job">{title}</a>'
+        '<div class="company">Company {i}</div><p>{desc}</p></article>'
+    ),
+    "www.peopleperhour.com": (
+        '<section class="job"><a href="/freelance-jobs/sim/job-{i}"><h3 class="job-title">{title}</h3></a>'
+        '<p class="job-description">{desc}</p></section>'
+    ),
+    "www.skywalker.gr": (
+        '<article class="article-item"><a href="/el/jobs/{i}-job"><h3 class="article-title">{title}</h3></a>'
+        '<div class="article-desc">{desc}</div></article>'
+    ),
+}
+
+
+class SiteStandIn:
+    """
+    Serves every platform from memory. Each advance() publishes `new_jobs`
+    listings per platform; HTML pages show the newest PAGE_JOBS, the
+    Freelancer API honours from_time / offset / limit.
+    """
+
+    def __init__(self, new_jobs: int, latency_ms: float, skew: float, rng: random.Random):
+        self.new_jobs = new_jobs
+        self.latency = latency_ms / 1000
+        self.rng = rng
+        self.weights = zipf_weights(len(VOCABULARY), skew)
+        self.listings = {host: [] for host in list(CARDS) + ["www.freelancer.com"]}
+        self.next_id = 1
+        self.clock = int(time.time())
+        self.requests = 0
+
+    def _job(self):
+        rng = self.rng
+        terms = rng.choices(VOCABULARY, self.weights, k=rng.randint(1, 3))
+        words = rng.choices(FILLER, k=rng.randint(15, 40)) + rng.choices(VOCABULARY, self.weights, k=rng.randint(0, 3))
+        rng.shuffle(words)
+        job = {"i": self.next_id, "title": " ".join(dict.fromkeys(terms)).title() + f" #{self.next_id}",
+               "desc": " ".join(words), "ts": self.clock}
+        self.next_id += 1
+        return job
+
+    def advance(self):
+        self.clock += 60
+        for listing in self.listings.values():
+            listing[:0] = [self._job() for _ in range(self.new_jobs)]
+            del listing[PAGE_JOBS * 10:]
+
+    def _html(self, host: str) -> str:
+        cards = "".join(CARDS[host].format(**job) for job in self.listings[host][:PAGE_JOBS])
+        return f'<html><head><meta charset="utf-8"></head><body><main>{cards}</main></body></html>'
+
+    def _freelancer(self, params) -> dict:
+        since = int(params.get("from_time", 0))
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 50))
+        fresh = [j for j in self.listings["www.freelancer.com"] if j["ts"] >= since]
+        projects = [{
+            "id": j["i"], "title": j["title"], "preview_description": j["desc"],
+            "seo_url": f"sim/project-{j['i']}", "time_submitted": j["ts"],
+            "currency": {"code": "USD"}, "budget": {"minimum": 30, "maximum": 250},
+        } for j in fresh[offset:offset + limit]]
+        return {"status": "success", "result": {"projects": projects}}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        host = request.url.host
+        if host == "www.freelancer.com":
+            return httpx.Response(200, json=self._freelancer(request.url.params))
+        if host in CARDS:
+            return httpx.Response(200, text=self._html(host), headers={"Content-Type": "text/html; charset=utf-8"})
+        return httpx.Response(404)
+
+
+class TelegramStub:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.messages = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        self.messages += 1
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": self.messages}})
+
+
+# ----------------------------------------------------------
+# RUN
+# ----------------------------------------------------------
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+async def run_scale_point(n_users: int, args, queries: QueryCounter, site: SiteStandIn) -> dict:
+    rng = random.Random(f"{args.seed}-{n_users}")
+    await asyncio.to_thread(seed, n_users, args.keywords, args.zipf, rng)
+
+    tg = TelegramStub(args.tg_ms)
+    engine = IngestionEngine(platforms=dict(FETCHERS))
+    engine.http = HttpClient(transport=httpx.MockTransport(site.handle))
+    engine.delivery = telegram_delivery.DeliveryEngine(
+        token="sim", transport=httpx.MockTransport(tg.handle),
+        global_rate=args.tg_rate or telegram_delivery.GLOBAL_RATE,
+    )
+    engine.digests.delivery = engine.delivery
+    await engine.delivery.start()
+
+    async def cycle():
+        site.advance()
+        q0, m0, started = queries.count, tg.messages, time.perf_counter()
+
+        async def one(name, fetch):
+            # same contract as IngestionEngine.run_platform: commit only after processing
+            jobs, commit = fetch_result(await fetch(engine.http))
+            queued = await engine.process_jobs(name, jobs)
+            if commit is not None:
+                await commit()
+            return queued
+
+        queued = sum(await asyncio.gather(*(one(name, fetch) for name, (fetch, _) in engine.platforms.items())))
+        cycle_s = time.perf_counter() - started
+
+        while engine.delivery.queue_depth() or engine.delivery.get_stats()["in_flight"]:
+            await asyncio.sleep(0.02)
+        total_s = time.perf_counter() - started
+        return {
+            "cycle_s": cycle_s,
+            "deliver_s": total_s - cycle_s,
+            "total_s": total_s,
+            "queued": queued,
+            "db_queries": queries.count - q0,
+            "sends_per_sec": (tg.messages - m0) / total_s,
+        }
+
+    try:
+        await cycle()  # warm-up: first fetch, matcher build, Freelancer watermark
+        runs = [await cycle() for _ in range(args.cycles)]
+    finally:
+        await engine.delivery.stop(drain_timeout=0)
+        await engine.http.aclose()
+
+    def avg(key):
+        return round(sum(r[key] for r in runs) / len(runs), 3)
+
+    return {
+        "users": n_users,
+        "keywords": n_users * args.keywords,
+        "cycle_s": avg("cycle_s"),
+        "deliver_s": avg("deliver_s"),
+        "total_s": avg("total_s"),
+        "sends_per_cycle": avg("queued"),
+        "sends_per_sec": avg("sends_per_sec"),
+        "db_queries_per_cycle": avg("db_queries"),
+        "rss_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "delivery": engine.delivery.get_stats(),
+    }
+
+
+async def main(args):
+    from config import WORKER_INTERVAL
+
+    scale = [int(n) for n in args.users.split(",")]
+    queries = QueryCounter(db.engine)
+    site = SiteStandIn(args.new_jobs, args.site_ms, args.zipf, random.Random(args.seed))
+
+    results = []
+    print(f"{'users':>7} {'keywords':>9} {'cycle s':>8} {'deliver s':>10} {'total s':>8} "
+          f"{'sends':>7} {'sends/s':>8} {'queries':>8} {'RSS MB':>7}  fits {WORKER_INTERVAL}s")
+    for n in scale:
+        r = await run_scale_point(n, args, queries, site)
+        r["fits_interval"] = r["total_s"] <= WORKER_INTERVAL
+        results.append(r)
+        print(f"{r['users']:>7} {r['keywords']:>9} {r['cycle_s']:>8} {r['deliver_s']:>10} {r['total_s']:>8} "
+              f"{r['sends_per_cycle']:>7} {r['sends_per_sec']:>8} {r['db_queries_per_cycle']:>8} "
+              f"{r['rss_mb']:>7}  {r['fits_interval']}")
+
+    out = args.out or os.path.join(RESULTS, f"capacity-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "worker_interval": WORKER_INTERVAL,
+            "params": {k: v for k, v in vars(args).items() if k != "database_url"},
+            "results": results,
+        }, f, indent=1)
+    print(f"\nresults saved to {out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(ARGS))
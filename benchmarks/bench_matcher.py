@@ -0,0 +1,112 @@
+﻿#!/usr/bin/env python3
+"""
+Benchmark: KeywordMatcher vs the old per-user nested loop.
+
+    python3 benchmarks/bench_matcher.py --users 10000 --jobs 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher
+
+VOCAB = [
+    "python", "django", "flask", "fastapi", "react", "vue", "angular", "node",
+    "javascript", "typescript", "php", "laravel", "wordpress", "shopify",
+    "seo", "logo", "design", "figma", "photoshop", "video", "editing",
+    "translation", "greek", "english", "copywriting", "excel", "data entry",
+    "scraping", "telegram", "bot", "android", "ios", "flutter", "swift",
+    "kotlin", "java", "c#", ".net", "golang", "rust", "devops", "aws",
+    "docker", "kubernetes", "sql", "postgres", "mongodb", "machine learning",
+    "ai", "chatgpt", "openai", "blockchain", "solidity", "unity", "3d",
+    "blender", "marketing", "facebook ads", "google ads", "e-commerce",
+]
+
+FILLER = (
+    "We are looking for an experienced freelancer to help with our project. "
+    "The work includes planning, implementation and support. Please share "
+    "relevant examples of previous work and your availability. "
+).split()
+
+
+def make_users(n_users, kws_per_user, rng):
+    # skewed like real usage: a few keywords are followed by most users
+    weights = [1.0 / (i + 1) for i in range(len(VOCAB))]
+    users = {}
+    for uid in range(1, n_users + 1):
+        kws = set()
+        while len(kws) < kws_per_user:
+            kws.add(rng.choices(VOCAB, weights)[0])
+            if rng.random() < 0.05:
+                kws.add(f"niche{rng.randint(0, 5000)}")
+        users[uid] = list(kws)
+    return users
+
+
+def make_jobs(n_jobs, rng):
+    jobs = []
+    for _ in range(n_jobs):
+        words = rng.sample(FILLER, 20) + rng.sample(VOCAB, 3)
+        rng.shuffle(words)
+        jobs.append(" ".join(words).lower())
+    return jobs
+
+
+def old_loop(users, jobs):
+    hits = 0
+    for uid, kws in users.items():
+        for fulltext in jobs:
+            for k in kws:
+                if k.lower() in fulltext:
+                    hits += 1
+                    break
+    return hits
+
+
+def new_matcher(matcher, jobs):
+    hits = 0
+    for fulltext in jobs:
+        hits += len(matcher.match(fulltext))
+    return hits
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--keywords", type=int, default=5)
+    ap.add_argument("--jobs", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    users = make_users(args.users, args.keywords, rng)
+    jobs = make_jobs(args.jobs, rng)
+
+    t0 = time.perf_counter()
+    old_hits = old_loop(users, jobs)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matcher = KeywordMatcher(users)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new_hits = new_matcher(matcher, jobs)
+    t_new = time.perf_counter() - t0
+
+    print(f"users={args.users} keywords/user={args.keywords} jobs={args.jobs}")
+    print(f"distinct keywords: {len(matcher.patterns)}")
+    print(f"old nested loop : {t_old * 1000:9.1f} ms  ({old_hits} user/job hits)")
+    print(f"matcher build   : {t_build * 1000:9.1f} ms")
+    print(f"matcher match   : {t_new * 1000:9.1f} ms  ({new_hits} user/job hits)")
+    if old_hits != new_hits:
+        print("MISMATCH between old loop and matcher!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+﻿#!/usr/bin/env python3
+"""
+Benchmark: NearDuplicateIndex lookup latency and accuracy.
+
+Indexes N synthetic postings, then checks reposts (a few words edited)
+and unrelated postings against it.
+
+    python3 benchmarks/bench_near_duplicates.py --index 20000 --probes 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicates import NearDuplicateIndex
+
+VOCAB = [f"w{i}" for i in range(3000)]
+BOILERPLATE = (
+    "we are looking for an experienced freelancer please share examples "
+    "of previous work and your availability budget is negotiable"
+).split()
+
+
+def make_posting(rng, words=60):
+    body = rng.sample(VOCAB, words - len(BOILERPLATE) // 2) + rng.sample(BOILERPLATE, len(BOILERPLATE) // 2)
+    rng.shuffle(body)
+    return body
+
+
+def repost(rng, words, edits):
+    words = list(words)
+    for _ in range(edits):
+        op = rng.random()
+        i = rng.randrange(len(words))
+        if op < 0.4:
+            words[i] = rng.choice(VOCAB)
+        elif op < 0.7:
+            words.insert(i, rng.choice(VOCAB))
+        else:
+            del words[i]
+    return words
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index", type=int, default=20000)
+    ap.add_argument("--probes", type=int, default=2000)
+    ap.add_argument("--edits", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    index = NearDuplicateIndex()
+
+    originals = [" ".join(make_posting(rng)) for _ in range(args.index)]
+    reposts = [" ".join(repost(rng, rng.choice(originals).split(), args.edits)) for _ in range(args.probes)]
+    unrelated = [" ".join(make_posting(rng)) for _ in range(args.probes)]
+
+    t0 = time.perf_counter()
+    for i, text in enumerate(originals):
+        index.check(("src", str(i)), text)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    dup_hits = sum(index.check(("dup", str(i)), text) is not None for i, text in enumerate(reposts))
+    t_dup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    false_hits = sum(index.check(("new", str(i)), text) is not None for i, text in enumerate(unrelated))
+    t_new = time.perf_counter() - t0
+
+    print(f"index={args.index} probes={args.probes} edits/repost={args.edits}")
+    print(f"index build    : {t_build * 1000:9.1f} ms  ({t_build / args.index * 1e6:6.1f} us/job)")
+    print(f"repost lookups : {t_dup / args.probes * 1e6:9.1f} us/job  recall {dup_hits / args.probes:.3f}")
+    print(f"new lookups    : {t_new / args.probes * 1e6:9.1f} us/job  false positives {false_hits / args.probes:.3f}")
+    print(f"index stats    : {index.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
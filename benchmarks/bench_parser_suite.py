@@ -0,0 +1,231 @@
+﻿#!/usr/bin/env python3
+"""
+Parser benchmark suite over the stored fixtures in benchmarks/fixtures.
+
+    python3 benchmarks/bench_parser_suite.py                      # run, save results JSON
+    python3 benchmarks/bench_parser_suite.py --compare OLD.json   # run and diff against a saved run
+    python3 benchmarks/bench_parser_suite.py --update-golden      # re-record expected outputs
+
+For every platform fixture (small / typical / huge) and parser path
+(legacy html.parser, CardParser, lxml streaming where it applies) it
+records jobs/second, per-page latency percentiles and tracemalloc peak,
+and checks that every path extracts the same fields as the recorded
+<fixture>.expected.json.gz. Exits 1 on any mismatch.
+
+The checked-in fixtures are synthetic (see make_fixtures.py): they test
+parser equivalence and relative speed, not production page shapes.
+Each result carries "source": "synthetic" for files listed in
+fixtures/synthetic.json and "captured" for real pages dropped in later.
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import platform as sysplatform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from bench_parsers import PARSERS, comparable
+
+import platform_freelancer
+from html_parser import HTML_PARSER
+from html_stream import CardStream, etree
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+RESULTS = os.path.join(HERE, "results")
+MANIFEST = os.path.join(FIXTURES, "synthetic.json")
+
+
+def parse_freelancer(text: str, parser=None):
+    projects = json.loads(text).get("result", {}).get("projects", [])
+    return [platform_freelancer.normalize_project(p) for p in projects]
+
+
+def stream_parse(parse, parser):
+    """The html_stream path: pull-parse card by card, then parse each card."""
+    def run(text: str, _parser=None):
+        stream = CardStream(parser.card_selector, encoding="utf-8")
+        data = text.encode("utf-8")
+        jobs = []
+        for i in range(0, len(data), 16384):
+            for card in stream.feed(data[i:i + 16384]):
+                jobs.extend(parse(card, parser))
+            if stream.done:
+                break
+        else:
+            for card in stream.close():
+                jobs.extend(parse(card, parser))
+        return jobs
+    return run
+
+
+def parser_paths(name: str):
+    """{path name: callable(text)} for one platform."""
+    if name == "freelancer":
+        return {"json": parse_freelancer}
+
+    parse, parser = PARSERS[name]
+    legacy = parser.legacy()
+    paths = {
+        "legacy": lambda text: parse(text, legacy),
+        "cardparser": lambda text: parse(text, parser),
+    }
+    if etree is not None:
+        paths["stream"] = stream_parse(parse, parser)
+    return paths
+
+
+def synthetic_files() -> set:
+    """Fixture paths (relative to FIXTURES) written by make_fixtures.py."""
+    if not os.path.exists(MANIFEST):
+        return set()
+    with open(MANIFEST) as f:
+        return set(json.load(f)["files"])
+
+
+def load_fixtures():
+    synthetic = synthetic_files()
+    fixtures = []
+    for platform in sorted(os.listdir(FIXTURES)):
+        pdir = os.path.join(FIXTURES, platform)
+        if not os.path.isdir(pdir) or (platform != "freelancer" and platform not in PARSERS):
+            continue
+        for fname in sorted(os.listdir(pdir)):
+            if not fname.endswith(".gz") or ".expected." in fname:
+                continue
+            path = os.path.join(pdir, fname)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                text = f.read()
+            source = "synthetic" if f"{platform}/{fname}" in synthetic else "captured"
+            fixtures.append((platform, fname.split(".")[0], source, path, text))
+    return fixtures
+
+
+def golden_path(fixture_path: str) -> str:
+    return fixture_path.rsplit(".", 2)[0] + ".expected.json.gz"
+
+
+def to_json(jobs):
+    return json.loads(json.dumps(comparable(jobs), default=str))
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+def measure(fn, text: str, min_seconds: float, min_runs: int):
+    tracemalloc.start()
+    jobs = fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_runs or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn(text)
+        latencies.append(time.perf_counter() - t0)
+    total = sum(latencies)
+
+    return jobs, {
+        "runs": len(latencies),
+        "jobs": len(jobs),
+        "jobs_per_sec": round(len(jobs) * len(latencies) / total, 1) if total else None,
+        "pages_per_sec": round(len(latencies) / total, 1) if total else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(min_seconds: float, min_runs: int, update_golden: bool):
+    results = []
+    ok = True
+    for platform, size, source, path, text in load_fixtures():
+        expected = None
+        gpath = golden_path(path)
+        if os.path.exists(gpath) and not update_golden:
+            with gzip.open(gpath, "rt", encoding="utf-8") as f:
+                expected = json.load(f)
+
+        for path_name, fn in parser_paths(platform).items():
+            jobs, stats = measure(fn, text, min_seconds, min_runs)
+            got = to_json(jobs)
+
+            if expected is None:
+                expected = got
+                if update_golden or not os.path.exists(gpath):
+                    with gzip.GzipFile(gpath, "wb", mtime=0) as raw, \
+                            io.TextIOWrapper(raw, encoding="utf-8") as f:
+                        json.dump(got, f, ensure_ascii=False, indent=1)
+
+            stats.update(platform=platform, fixture=size, source=source, path=path_name,
+                         page_kb=round(len(text.encode("utf-8")) / 1024, 1), equivalent=got == expected)
+            ok &= stats["equivalent"]
+            results.append(stats)
+    return results, ok
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path) as f:
+        base = {(r["platform"], r["fixture"], r["path"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}  (jobs/s and p95 change, + is faster)")
+    for r in results:
+        b = base.get((r["platform"], r["fixture"], r["path"]))
+        if not b or not b.get("jobs_per_sec") or not r.get("jobs_per_sec"):
+            continue
+        speed = (r["jobs_per_sec"] / b["jobs_per_sec"] - 1) * 100
+        p95 = (b["p95_ms"] / r["p95_ms"] - 1) * 100 if r["p95_ms"] else 0.0
+        print(f"{r['platform']:17} {r['fixture']:8} {r['path']:10} jobs/s {speed:+7.1f}%  p95 {p95:+7.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--min-seconds", type=float, default=0.3, help="minimum timing per fixture/path")
+    ap.add_argument("--min-runs", type=int, default=5)
+    ap.add_argument("--out", help="results JSON (default: benchmarks/results/parsers-<timestamp>.json)")
+    ap.add_argument("--compare", help="previous results JSON to diff against")
+    ap.add_argument("--update-golden", action="store_true", help="re-record expected outputs")
+    args = ap.parse_args()
+
+    results, ok = run(args.min_seconds, args.min_runs, args.update_golden)
+
+    captured = sum(r["source"] == "captured" for r in results)
+    print(f"backend: {HTML_PARSER}")
+    if not captured:
+        print("NOTE: all fixtures are synthetic; numbers compare parser paths, not production pages")
+    print(f"{'platform':17} {'fixture':8} {'source':9} {'path':10} {'KB':>7} {'jobs':>5} {'jobs/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KB':>8}  same")
+    for r in results:
+        print(f"{r['platform']:17} {r['fixture']:8} {r['source']:9} {r['path']:10} {r['page_kb']:>7} {r['jobs']:>5} "
+              f"{r['jobs_per_sec']:>10} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['peak_kb']:>8}  {r['equivalent']}")
+
+    out = args.out or os.path.join(RESULTS, f"parsers-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "machine": sysplatform.machine(),
+            "backend": HTML_PARSER,
+            "synthetic_only": not captured,
+            "results": results,
+        }, f, indent=1)
+    print(f"\nresults saved to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+    if not ok:
+        print("MISMATCH: some parser paths disagree with the expected output")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
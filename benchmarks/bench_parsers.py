@@ -0,0 +1,141 @@
+﻿#!/usr/bin/env python3
+"""
+Benchmark: legacy whole-page html.parser path vs CardParser, per platform.
+
+    python3 benchmarks/bench_parsers.py --cards 40 --pages 30
+
+Reports pages/second and tracemalloc peak for both paths and checks that
+both produce the same normalized jobs (posted_at excluded).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "workers"))
+
+# worker modules import db; the engine is created lazily and never used here
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench.db"))
+
+import platform_careerjet
+import platform_kariera
+import platform_peopleperhour
+import platform_skywalker
+import worker_pph
+import worker_skywalker
+
+CARD_TEMPLATES = {
+    "careerjet": (
+        '<article class="job clicky"><header><h2><a class="title" href="/jobad/{i}">'
+        'Python developer {i}</a></h2></header><ul class="location"><li>Athens</li></ul>'
+        '<div class="desc">Build and maintain services for project {i}. Django, SQL.</div>'
+        '<footer><span class="date">{h} hours ago</span></footer></article>'
+    ),
+    "kariera": (
+        '<article class="job-card"><a href="/el/jobs/{i}-web-developer">Web developer {i}</a>'
+        '<div class="company">Company {i}</div><p>Greek-speaking web developer wanted {i}.</p></article>'
+    ),
+    "peopleperhour": (
+        '<section class="job"><a href="/freelance-jobs/design/logo-{i}">'
+        '<h3 class="job-title">Logo design {i}</h3></a>'
+        '<p class="job-description">Need a modern logo for brand {i}.</p></section>'
+    ),
+    "skywalker": (
+        '<article class="article-item"><a href="/el/jobs/{i}-accountant">'
+        '<h3 class="article-title">Accountant {i}</h3></a>'
+        '<div class="article-desc">Accounting position {i}, full time.</div></article>'
+    ),
+    "worker_pph": (
+        '<li class="project"><div class="project__header"><h3><a href="/freelance-jobs/seo-{i}">'
+        'SEO audit {i}</a></h3></div><p class="project__description">Audit site {i}.</p>'
+        '<span class="project__budget">£{b}</span></li>'
+    ),
+    "worker_skywalker": (
+        '<div class="job-item"><a class="job-title" href="/el/aggelia/{i}-programmer">Programmer {i}</a>'
+        '<div class="job-description">Backend programmer {i}.</div></div>'
+    ),
+}
+
+PARSERS = {
+    "careerjet": (platform_careerjet.parse_careerjet_jobs, platform_careerjet.CARD_PARSER),
+    "kariera": (platform_kariera.parse_kariera_jobs, platform_kariera.CARD_PARSER),
+    "peopleperhour": (platform_peopleperhour.parse_peopleperhour_jobs, platform_peopleperhour.CARD_PARSER),
+    "skywalker": (platform_skywalker.parse_skywalker_jobs, platform_skywalker.CARD_PARSER),
+    "worker_pph": (worker_pph.parse_pph, worker_pph.CARD_PARSER),
+    "worker_skywalker": (worker_skywalker.parse_skywalker, worker_skywalker.CARD_PARSER),
+}
+
+CHROME = (
+    '<div class="nav">' + "".join(f'<a href="/c/{i}">Category {i}</a>' for i in range(80)) + "</div>"
+    '<script>var data = "' + "x" * 20000 + '";</script>'
+)
+FOOTER = '<footer class="site">' + "".join(f"<p>Footer link {i}</p>" for i in range(300)) + "</footer>"
+
+
+def make_page(platform: str, cards: int) -> str:
+    tpl = CARD_TEMPLATES[platform]
+    body = "".join(tpl.format(i=i, h=i % 23 + 1, b=50 + i) for i in range(cards))
+    return f"<html><head><title>{platform}</title></head><body>{CHROME}<main>{body}</main>{FOOTER}</body></html>"
+
+
+def comparable(jobs):
+    return [{k: v for k, v in j.items() if k != "posted_at"} for j in jobs]
+
+
+def measure(parse, parser, page: str, pages: int):
+    tracemalloc.start()
+    parse(page, parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        parse(page, parser)
+    elapsed = time.perf_counter() - started
+    return pages / elapsed, peak
+
+
+def run(cards: int, pages: int):
+    results = {}
+    for name, (parse, parser) in PARSERS.items():
+        page = make_page(name, cards)
+        legacy = parser.legacy()
+
+        same = comparable(parse(page, legacy)) == comparable(parse(page, parser))
+        old_rate, old_peak = measure(parse, legacy, page, pages)
+        new_rate, new_peak = measure(parse, parser, page, pages)
+
+        results[name] = {
+            "equivalent": same,
+            "jobs": len(parse(page, parser)),
+            "old_pages_per_sec": round(old_rate, 1),
+            "new_pages_per_sec": round(new_rate, 1),
+            "old_peak_kb": round(old_peak / 1024, 1),
+            "new_peak_kb": round(new_peak / 1024, 1),
+        }
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cards", type=int, default=40)
+    ap.add_argument("--pages", type=int, default=30)
+    args = ap.parse_args()
+
+    print(f"backend: {platform_skywalker.CARD_PARSER.backend}, {args.cards} cards/page")
+    print(f"{'platform':18} {'jobs':>4} {'old p/s':>9} {'new p/s':>9} {'old KB':>9} {'new KB':>9}  same")
+    ok = True
+    for name, r in run(args.cards, args.pages).items():
+        ok &= r["equivalent"]
+        print(f"{name:18} {r['jobs']:>4} {r['old_pages_per_sec']:>9} {r['new_pages_per_sec']:>9} "
+              f"{r['old_peak_kb']:>9} {r['new_peak_kb']:>9}  {r['equivalent']}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
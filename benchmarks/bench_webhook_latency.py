@@ -0,0 +1,144 @@
+﻿#!/usr/bin/env python3
+"""
+Benchmark: webhook handler latency, sync DB helpers vs db_async.
+
+Replays a settings-screen handler (get_user + get_keywords) for updates
+arriving at a fixed rate from many concurrent users, against a throwaway
+SQLite database. Every read pays --query-ms inside the database and a
+fraction --slow-rate of them pays --slow-ms, so one slow query shows up
+the way it does in production: the sync path stalls the event loop for
+every other update, the async path only delays its own.
+
+    python3 benchmarks/bench_webhook_latency.py --users 200 --rate 40 --seconds 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_webhook.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + DB_PATH
+
+from sqlalchemy import event
+
+import db
+import db_async
+import db_keywords
+import utils
+
+
+def setup_db(n_users: int):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    con = sqlite3.connect(DB_PATH)
+    con.executescript("""
+        CREATE TABLE app_user_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id BIGINT UNIQUE, countries TEXT, proposal_template TEXT,
+            active BOOLEAN DEFAULT 1, blocked BOOLEAN DEFAULT 0,
+            start_date TIMESTAMP, trial_until TIMESTAMP, license_until TIMESTAMP,
+            digest_minutes INTEGER
+        );
+        CREATE TABLE user_keywords_data (id INTEGER PRIMARY KEY, user_id BIGINT, keyword TEXT);
+        CREATE INDEX uk_user ON user_keywords_data (user_id);
+        -- reads go through views that call db_delay(), i.e. the time is
+        -- spent inside the database driver, not in Python
+        CREATE VIEW app_user AS SELECT * FROM app_user_data WHERE db_delay();
+        CREATE VIEW user_keywords AS SELECT * FROM user_keywords_data WHERE db_delay();
+    """)
+    con.executemany("INSERT INTO app_user_data (telegram_id, countries) VALUES (?, 'ALL')",
+                    [(1000 + i,) for i in range(n_users)])
+    con.executemany("INSERT INTO user_keywords_data (user_id, keyword) VALUES (?, ?)",
+                    [(1000 + i, kw) for i in range(n_users) for kw in ("python", "django", "seo")])
+    con.commit()
+    con.close()
+
+
+def install_delay(engine, query_ms: float, slow_ms: float, slow_rate: float):
+    def db_delay():
+        slow = random.random() < slow_rate
+        time.sleep((slow_ms if slow else query_ms) / 1000)
+        return 1
+
+    @event.listens_for(engine, "connect")
+    def register(dbapi_connection, _):
+        dbapi_connection.create_function("db_delay", 0, db_delay)
+
+
+async def handler_sync(tid):
+    user = utils.get_user(tid)
+    kws = db_keywords.get_keywords(tid)
+    await asyncio.sleep(0)  # stands in for the Telegram reply
+    return user, kws
+
+
+async def handler_async(tid):
+    user = await db_async.get_user(tid)
+    kws = await db_async.get_keywords(tid)
+    await asyncio.sleep(0)
+    return user, kws
+
+
+async def replay(handler, users: int, rate: float, seconds: float, seed: int):
+    rng = random.Random(seed)
+    latencies = []
+    tasks = []
+
+    async def one(tid, due):
+        await handler(tid)
+        latencies.append(time.perf_counter() - due)
+
+    start = time.perf_counter()
+    due = start
+    while due - start < seconds:
+        due += rng.expovariate(rate)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(1000 + rng.randrange(users), due)))
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed):
+    ms = sorted(x * 1000 for x in latencies)
+    q = statistics.quantiles(ms, n=100)
+    print(f"{name:6s} updates={len(ms):5d} throughput={len(ms) / elapsed:7.1f}/s "
+          f"p50={q[49]:8.1f}ms p95={q[94]:8.1f}ms p99={q[98]:8.1f}ms max={ms[-1]:8.1f}ms")
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=40, help="updates per second")
+    ap.add_argument("--seconds", type=float, default=8)
+    ap.add_argument("--query-ms", type=float, default=2)
+    ap.add_argument("--slow-ms", type=float, default=150)
+    ap.add_argument("--slow-rate", type=float, default=0.01)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    setup_db(args.users)
+    install_delay(db.engine, args.query_ms, args.slow_ms, args.slow_rate)
+    install_delay(db_async.get_async_engine().sync_engine, args.query_ms, args.slow_ms, args.slow_rate)
+
+    print(f"users={args.users} rate={args.rate}/s seconds={args.seconds} "
+          f"query={args.query_ms}ms slow={args.slow_ms}ms@{args.slow_rate:.0%}")
+    for name, handler in (("sync", handler_sync), ("async", handler_async)):
+        random.seed(args.seed)
+        latencies, elapsed = await replay(handler, args.users, args.rate, args.seconds, args.seed)
+        report(name, latencies, elapsed)
+
+    await db_async.dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
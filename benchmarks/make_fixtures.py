@@ -0,0 +1,126 @@
+﻿#!/usr/bin/env python3
+"""
+Writes the SYNTHETIC parser fixtures used by bench_parser_suite.py.
+
+    python3 benchmarks/make_fixtures.py
+
+None of these pages were captured from the live sites: they are built
+from the card templates in bench_parsers.py plus a few edge-case cards
+per platform (missing link, Greek text, empty description), in three
+sizes. Every file written is listed in fixtures/synthetic.json, and the
+suite reports those fixtures as "synthetic".
+
+Real captured pages can be dropped next to them as
+benchmarks/fixtures/<platform>/<name>.html.gz (not listed in the
+manifest, so they report as "captured"); rerun the suite with
+--update-golden to record their expected output.
+"""
+import gzip
+import json
+import os
+import random
+
+from bench_parsers import CARD_TEMPLATES, CHROME, FOOTER
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = os.path.join(FIXTURES, "synthetic.json")
+
+SIZES = {"small": 3, "typical": 40, "huge": 1500}
+
+EDGE_CARDS = {
+    "careerjet": [
+        '<article class="job"><header><h2>No link here</h2></header><div class="desc">Skipped.</div></article>',
+        '<article class="job"><header><h2><a class="title" href="/jobad/gr1">Προγραμματιστής Python</a></h2></header>'
+        '<div class="desc">Εταιρεία λογισμικού στην Αθήνα.</div><footer><span class="date">3 days ago</span></footer></article>',
+        '<article class="job"><header><h2><a class="title" href="https://www.careerjet.com/jobad/abs">Absolute url</a>'
+        '</h2></header></article>',
+    ],
+    "kariera": [
+        '<article class="job-card"><div>No link</div><p>Skipped.</p></article>',
+        '<article class="job-card"><a href="/el/jobs/gr1-logistis">Λογιστής</a><p>Πλήρης απασχόληση, Θεσσαλονίκη.</p></article>',
+        '<article class="job-card"><a href="/el/jobs/nodesc">No description</a></article>',
+    ],
+    "peopleperhour": [
+        '<section class="job"><h3 class="job-title">Title without link</h3></section>',
+        '<section class="job"><a href="/freelance-jobs/gr-translation"><h3 class="job-title">Μετάφραση κειμένων</h3></a>'
+        '<p class="job-description">Greek to English.</p></section>',
+    ],
+    "skywalker": [
+        '<article class="article-item"><h3 class="article-title">No link</h3></article>',
+        '<article class="article-item"><a href="/el/jobs/gr1-polites">'
+        '<h3 class="article-title">Πωλητής καταστήματος</h3></a><div class="article-desc">Κέντρο Αθήνας.</div></article>',
+        '<article class="article-item"><a href="https://www.skywalker.gr/el/jobs/abs-1"></a></article>',
+    ],
+    "worker_pph": [
+        '<li class="project"><div class="project__header"><h3>No anchor</h3></div></li>',
+        '<li class="project"><div class="project__header"><h3><a href="/freelance-jobs/gr-seo">SEO για eshop</a></h3></div>'
+        '<p class="project__description">Βελτίωση κατάταξης.</p><span class="project__budget">€300</span></li>',
+        '<li class="project"><div class="project__header"><h3><a href="/freelance-jobs/no-budget">No budget</a></h3></div></li>',
+    ],
+    "worker_skywalker": [
+        '<div class="job-item"><span>No title link</span></div>',
+        '<div class="job-item"><a class="job-title" href="/el/aggelia/77-mageiras">Μάγειρας</a>'
+        '<div class="job-description">Εστιατόριο στον Πειραιά.</div></div>',
+    ],
+}
+
+
+def make_page(platform: str, cards: int, rng: random.Random) -> str:
+    tpl = CARD_TEMPLATES[platform]
+    body = [tpl.format(i=i, h=i % 23 + 1, b=50 + i) for i in range(cards)]
+    for card in EDGE_CARDS[platform]:
+        body.insert(rng.randrange(len(body) + 1), card)
+    return (f"<html><head><meta charset=\"utf-8\"><title>{platform}</title></head>"
+            f"<body>{CHROME}<main>{''.join(body)}</main>{FOOTER}</body></html>")
+
+
+def make_projects(count: int, rng: random.Random) -> dict:
+    projects = []
+    for i in range(count):
+        p = {
+            "id": 40000000 + i,
+            "title": f"Project {i}: {rng.choice(['Python scraper', 'Logo design', 'Μετάφραση', 'React app'])}",
+            "preview_description": "Details for project %d. " % i * rng.randint(1, 6),
+            "seo_url": f"python/project-{i}",
+            "time_submitted": 1760000000 - i * 37,
+            "currency": {"code": rng.choice(["USD", "EUR", "GBP"])},
+        }
+        if i % 7:
+            p["budget"] = {"minimum": 10 * (i % 50 + 1), "maximum": 20 * (i % 50 + 1)}
+        projects.append(p)
+    return {"status": "success", "result": {"projects": projects, "total_count": count}}
+
+
+def write(path: str, data: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # fixed mtime keeps the .gz files byte-identical between runs
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(data.encode("utf-8"))
+
+
+def main():
+    written = []
+    for platform in CARD_TEMPLATES:
+        for size, cards in SIZES.items():
+            rng = random.Random(f"{platform}-{size}")
+            written.append(f"{platform}/{size}.html.gz")
+            write(os.path.join(FIXTURES, written[-1]), make_page(platform, cards, rng))
+
+    for size, cards in SIZES.items():
+        rng = random.Random(f"freelancer-{size}")
+        written.append(f"freelancer/{size}.json.gz")
+        write(os.path.join(FIXTURES, written[-1]), json.dumps(make_projects(cards, rng)))
+
+    with open(MANIFEST, "w") as f:
+        json.dump({
+            "generator": "benchmarks/make_fixtures.py",
+            "note": "synthetic pages built from bench_parsers.py templates, not captured from the live sites",
+            "files": sorted(written),
+        }, f, indent=1)
+        f.write("\n")
+
+    print(f"synthetic fixtures written to {FIXTURES} (listed in {os.path.basename(MANIFEST)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,13 @@ from telegram.ext import (
 )
 
 from db_events import ensure_feed_events_schema
+from db_jobs import ensure_job_schema
+from db_platform_state import ensure_platform_state_schema
+from digest import ensure_digest_schema
 from handlers_start import start_command
+from handlers_admin import admin_traces
+from handlers_settings import digest_command
+from telegram_delivery import API_BASE
 
 try:
     from handlers_ui import handle_ui_callback, handle_user_message
@@ -32,8 +38,17 @@ if not TOKEN:
 def build_application():
     # Ensure DB schema
     ensure_feed_events_schema()
+    ensure_job_schema()
+    ensure_platform_state_schema()
+    ensure_digest_schema()
 
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"{API_BASE}/bot")
+        .base_file_url(f"{API_BASE}/file/bot")
+        .build()
+    )
 
     # âœ… Inject ADMIN IDS into bot_data
     # Î’Î¬Î»Îµ ÎµÎ´ÏŽ Ï„Î¿Ï…Ï‚ admin Telegram IDs
@@ -48,6 +63,8 @@ def build_application():
 
     # âœ… Register handlers
     app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("traces", admin_traces))
+    app.add_handler(CommandHandler("digest", digest_command))
     app.add_handler(CallbackQueryHandler(handle_ui_callback, pattern=r"^(ui|act):"))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_user_message))
 
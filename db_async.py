@@ -0,0 +1,273 @@
+﻿import os
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from db_jobs import JOB_COLUMNS, job_from_row
+from metrics import db_timer
+from user_cache import known_users, user_rows, user_keywords, invalidate_user, invalidate_keywords
+
+# Coroutine twins of the db/utils/db_keywords helpers for the async bot
+# handlers, so a slow query no longer blocks the webhook event loop.
+# Workers keep using the synchronous layer in db.py. User rows, keyword
+# lists and known telegram ids are served from user_cache and invalidated
+# by the write helpers below.
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+def async_url(url: str) -> str:
+    """Maps a sync DATABASE_URL to its async driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    scheme, sep, rest = url.partition("://")
+    base = scheme.split("+", 1)[0]
+    if base == "postgresql":
+        return f"postgresql+asyncpg{sep}{rest}"
+    if base == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+_engine = None
+_sessionmaker = None
+
+
+def get_async_engine():
+    global _engine, _sessionmaker
+    if _engine is None:
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is missing")
+        url = async_url(DATABASE_URL)
+        kwargs = {"pool_pre_ping": True}
+        if not url.startswith("sqlite"):
+            kwargs.update(pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "10")),
+                          max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10")))
+        _engine = create_async_engine(url, **kwargs)
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False, autoflush=False)
+    return _engine
+
+
+def get_async_session():
+    get_async_engine()
+    return _sessionmaker()
+
+
+async def close_async_session(db):
+    try:
+        await db.close()
+    except:
+        pass
+
+
+async def dispose_async_engine():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _sessionmaker = None
+
+
+# ----------------------------------------------------------
+# USERS
+# ----------------------------------------------------------
+async def get_or_create_user_by_tid(tid: int):
+    known = known_users.get(tid)
+    if known is not None:
+        return known
+
+    db = get_async_session()
+    try:
+        with db_timer("get_or_create_user"):
+            row = (await db.execute(
+                text("SELECT id FROM app_user WHERE telegram_id=:t"),
+                {"t": tid}
+            )).fetchone()
+
+        if row:
+            known_users.set(tid, row[0])
+            return row[0]
+
+        new_id = (await db.execute(
+            text("""
+                INSERT INTO app_user (telegram_id)
+                VALUES (:t)
+                RETURNING id
+            """),
+            {"t": tid}
+        )).fetchone()[0]
+
+        await db.commit()
+        known_users.set(tid, new_id)
+        return new_id
+
+    finally:
+        await close_async_session(db)
+
+
+async def get_user(tid: int):
+    cached = user_rows.get(tid)
+    if cached is not None:
+        return dict(cached)
+
+    db = get_async_session()
+    try:
+        with db_timer("get_user"):
+            row = (await db.execute(
+                text("""
+                    SELECT telegram_id, countries, proposal_template, active, blocked,
+                           start_date, trial_until, license_until, digest_minutes
+                    FROM app_user
+                    WHERE telegram_id=:u
+                """),
+                {"u": tid}
+            )).fetchone()
+
+        if not row:
+            return None
+
+        user = {
+            "telegram_id": row[0],
+            "countries": row[1],
+            "proposal_template": row[2],
+            "active": row[3],
+            "blocked": row[4],
+            "start_date": row[5],
+            "trial_until": row[6],
+            "license_until": row[7],
+            "digest_minutes": row[8]
+        }
+        user_rows.set(tid, user)
+        return dict(user)
+
+    finally:
+        await close_async_session(db)
+
+
+async def set_user_setting(tid: int, field: str, value):
+    db = get_async_session()
+    try:
+        await db.execute(
+            text(f"UPDATE app_user SET {field}=:v WHERE telegram_id=:u"),
+            {"v": value, "u": tid}
+        )
+        await db.commit()
+    finally:
+        await close_async_session(db)
+        invalidate_user(tid)
+
+
+# ----------------------------------------------------------
+# KEYWORDS
+# ----------------------------------------------------------
+async def get_keywords(user_id: int):
+    cached = user_keywords.get(user_id)
+    if cached is not None:
+        return list(cached)
+
+    db = get_async_session()
+    try:
+        with db_timer("get_keywords"):
+            rows = (await db.execute(
+                text("SELECT keyword FROM user_keywords WHERE user_id=:u"),
+                {"u": user_id}
+            )).fetchall()
+        keywords = [r[0] for r in rows]
+        user_keywords.set(user_id, keywords)
+        return list(keywords)
+    finally:
+        await close_async_session(db)
+
+
+async def add_keywords(user_id: int, keywords):
+    db = get_async_session()
+    try:
+        for kw in keywords:
+            await db.execute(
+                text("INSERT INTO user_keywords (user_id, keyword) VALUES (:u, :k)"),
+                {"u": user_id, "k": kw}
+            )
+        await db.commit()
+    finally:
+        await close_async_session(db)
+        invalidate_keywords(user_id)
+
+
+async def delete_keyword(user_id: int, keyword: str):
+    db = get_async_session()
+    try:
+        await db.execute(
+            text("DELETE FROM user_keywords WHERE user_id=:u AND keyword=:k"),
+            {"u": user_id, "k": keyword}
+        )
+        await db.commit()
+    finally:
+        await close_async_session(db)
+        invalidate_keywords(user_id)
+
+
+# ----------------------------------------------------------
+# SAVED JOBS
+# ----------------------------------------------------------
+async def save_job(tid: int, job_id: str):
+    db = get_async_session()
+    try:
+        await db.execute(
+            text("""
+                INSERT INTO saved_job (user_id, job_id, job_ref)
+                VALUES (:u, :j, (
+                    SELECT job_ref FROM feed_event
+                    WHERE user_id=:u AND job_id=:j AND job_ref IS NOT NULL
+                    ORDER BY id DESC LIMIT 1
+                ))
+                ON CONFLICT DO NOTHING;
+            """),
+            {"u": tid, "j": job_id}
+        )
+        await db.commit()
+    finally:
+        await close_async_session(db)
+
+
+async def delete_saved_job(tid: int, job_id: str):
+    db = get_async_session()
+    try:
+        await db.execute(
+            text("DELETE FROM saved_job WHERE user_id=:u AND job_id=:j"),
+            {"u": tid, "j": job_id}
+        )
+        await db.commit()
+    finally:
+        await close_async_session(db)
+
+
+async def fetch_saved_jobs(user_id: int, limit: int = 50):
+    """Async twin of db_jobs.fetch_saved_jobs."""
+    db = get_async_session()
+    try:
+        rows = (await db.execute(
+            text(f"""
+                SELECT {JOB_COLUMNS}, s.saved_at
+                FROM saved_job s
+                JOIN job j ON j.id = s.job_ref
+                WHERE s.user_id = :u
+                ORDER BY s.saved_at DESC
+                LIMIT :n
+            """),
+            {"u": user_id, "n": limit}
+        )).fetchall()
+        return [job_from_row(r, saved_at=r[11]) for r in rows]
+    finally:
+        await close_async_session(db)
+
+
+# ----------------------------------------------------------
+# ADMIN
+# ----------------------------------------------------------
+async def list_user_ids():
+    db = get_async_session()
+    try:
+        rows = (await db.execute(text("SELECT telegram_id FROM app_user ORDER BY telegram_id"))).fetchall()
+        return [r[0] for r in rows]
+    finally:
+        await close_async_session(db)
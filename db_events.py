@@ -1,9 +1,62 @@
-﻿import logging
+﻿import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import wait
 from sqlalchemy import text
 from db import get_session, close_session
+from metrics import EVENT_WRITER_PENDING, FEED_ACKS, db_timer
 
 log = logging.getLogger("db_events")
 
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "500"))
+EVENT_FLUSH_SECONDS = float(os.getenv("EVENT_FLUSH_SECONDS", "2"))
+# cap on acks held in memory by EventWriter (e.g. while the DB is down)
+EVENT_MAX_PENDING = int(os.getenv("EVENT_MAX_PENDING", "50000"))
+# a claim whose send failed this many times is given up on (status 'failed')
+FEED_MAX_ATTEMPTS = int(os.getenv("FEED_MAX_ATTEMPTS", "3"))
+
+_CLAIM_EVENTS_SQL = """
+    INSERT INTO feed_event (user_id, platform, job_id, job_ref, status)
+    SELECT u, p, j, r, 'claimed' FROM unnest(
+        CAST(:u AS BIGINT[]),
+        CAST(:p AS TEXT[]),
+        CAST(:j AS TEXT[]),
+        CAST(:r AS BIGINT[])
+    ) AS t(u, p, j, r)
+    ON CONFLICT (user_id, platform, job_id) DO NOTHING
+    RETURNING user_id, platform, job_id
+"""
+
+_DELIVERED_SQL = """
+    UPDATE feed_event e
+    SET status = 'delivered', delivered_at = NOW()
+    FROM unnest(CAST(:u AS BIGINT[]), CAST(:p AS TEXT[]), CAST(:j AS TEXT[])) AS t(u, p, j)
+    WHERE e.user_id = t.u AND e.platform = t.p AND e.job_id = t.j
+"""
+
+_FAILED_SQL = """
+    UPDATE feed_event e
+    SET attempts = e.attempts + 1,
+        status = CASE WHEN e.attempts + 1 >= :m THEN 'failed' ELSE 'claimed' END,
+        sent_at = NOW()
+    FROM unnest(CAST(:u AS BIGINT[]), CAST(:p AS TEXT[]), CAST(:j AS TEXT[])) AS t(u, p, j)
+    WHERE e.user_id = t.u AND e.platform = t.p AND e.job_id = t.j
+      AND e.status = 'claimed'
+"""
+
+
+def _key_arrays(keys):
+    users, platforms, job_ids = zip(*keys)
+    return {"u": list(users), "p": list(platforms), "j": list(job_ids)}
+
+
+def _event_arrays(rows):
+    users, platforms, job_ids, refs = zip(*rows)
+    return {"u": list(users), "p": list(platforms), "j": list(job_ids), "r": list(refs)}
+
 
 def ensure_feed_events_schema():
     db = get_session()
@@ -17,23 +70,266 @@ def ensure_feed_events_schema():
                 sent_at TIMESTAMP DEFAULT NOW()
             );
         """))
+
+        # One row per (user, platform, job) — drop old duplicates, then enforce it
+        db.execute(text("""
+            DELETE FROM feed_event a
+            USING feed_event b
+            WHERE a.id > b.id
+              AND a.user_id = b.user_id
+              AND a.platform = b.platform
+              AND a.job_id = b.job_id;
+        """))
+        db.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS feed_event_user_platform_job_uq
+            ON feed_event (user_id, platform, job_id);
+        """))
+
+        # Delivery status: 'claimed' until the send succeeds ('delivered') or
+        # has failed FEED_MAX_ATTEMPTS times ('failed'). Rows older than this
+        # column were written after the send, hence the default.
+        db.execute(text("""
+            ALTER TABLE feed_event
+            ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'delivered',
+            ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMP;
+        """))
+        db.execute(text("""
+            CREATE INDEX IF NOT EXISTS feed_event_claimed_idx
+            ON feed_event (sent_at) WHERE status = 'claimed';
+        """))
+        db.commit()
+    finally:
+        close_session(db)
+
+
+def record_event(user_id: int, platform: str, job_id: str, job_ref: int = None):
+    """Records a delivery. Returns True if it was new, False if already recorded."""
+    db = get_session()
+    try:
+        with db_timer("record_event"):
+            row = db.execute(
+                text("""
+                    INSERT INTO feed_event (user_id, platform, job_id, job_ref)
+                    VALUES (:u, :p, :j, :r)
+                    ON CONFLICT (user_id, platform, job_id) DO NOTHING
+                    RETURNING id
+                """),
+                {"u": user_id, "p": platform, "j": job_id, "r": job_ref}
+            ).fetchone()
+        db.commit()
+        return row is not None
+    finally:
+        close_session(db)
+
+
+def claim_events(candidates, job_refs: dict = None):
+    """
+    Atomically claims a whole cycle of (user_id, platform, job_id) candidates
+    in one round-trip. Returns the set of triples that were newly claimed;
+    triples already in feed_event (or claimed by another worker) are left out.
+    `job_refs` ({job_id: job ref} from db_jobs.store_jobs) links each event
+    to its row in the job store.
+
+    Claimed rows stay in status 'claimed' until ack_events() records the
+    outcome of the send; anything left claimed (failed send, crash, a digest
+    lost with the process) is picked up again by db_jobs.fetch_unsent_jobs().
+    """
+    job_refs = job_refs or {}
+    candidates = {(int(u), str(p), str(j)) for u, p, j in candidates}
+    if not candidates:
+        return set()
+
+    db = get_session()
+    try:
+        with db_timer("claim_events"):
+            rows = db.execute(
+                text(_CLAIM_EVENTS_SQL),
+                _event_arrays([(u, p, j, job_refs.get(j)) for u, p, j in candidates])
+            ).fetchall()
         db.commit()
+        return {(r[0], r[1], r[2]) for r in rows}
     finally:
         close_session(db)
 
 
-def record_event(user_id: int, platform: str, job_id: str):
+def ack_events(delivered=(), failed=(), max_attempts: int = FEED_MAX_ATTEMPTS):
+    """
+    Records send outcomes for claimed (user_id, platform, job_id) triples.
+    Delivered rows are marked 'delivered'; failed ones stay 'claimed' for a
+    retry (sent_at is reset, so the retry waits a full redelivery delay)
+    until they have failed `max_attempts` times.
+    """
+    delivered = {(int(u), str(p), str(j)) for u, p, j in delivered}
+    failed = {(int(u), str(p), str(j)) for u, p, j in failed} - delivered
+    if not delivered and not failed:
+        return
+
     db = get_session()
     try:
-        db.execute(
-            text("INSERT INTO feed_event (user_id, platform, job_id) VALUES (:u, :p, :j)"),
-            {"u": user_id, "p": platform, "j": job_id}
-        )
+        with db_timer("ack_events"):
+            if delivered:
+                db.execute(text(_DELIVERED_SQL), _key_arrays(delivered))
+            if failed:
+                db.execute(text(_FAILED_SQL), dict(_key_arrays(failed), m=max_attempts))
         db.commit()
     finally:
         close_session(db)
 
 
+def ack_sends(sends: dict, timeout: float = None):
+    """
+    For synchronous workers: waits for {(user_id, platform, job_id): concurrent
+    Future} from send_message() and acks the outcomes in one round-trip.
+    Sends still pending at `timeout` stay claimed and are redelivered later.
+    """
+    if not sends:
+        return
+    done, _ = wait(sends.values(), timeout=timeout)
+    delivered, failed = [], []
+    for key, future in sends.items():
+        if future not in done:
+            continue
+        ok = not future.cancelled() and future.exception() is None and future.result() is True
+        (delivered if ok else failed).append(key)
+    ack_events(delivered, failed)
+
+
+# ----------------------------------------------------------
+# BUFFERED ACK WRITER
+# ----------------------------------------------------------
+class EventWriter:
+    """
+    Collects send outcomes from the delivery loop and writes them with
+    ack_events() when the buffer reaches `batch_size` or every
+    `flush_seconds`, so a burst of sends costs a few round-trips instead of
+    one per message. The buffer holds at most `max_pending` acks; past that
+    the oldest are dropped. A dropped ack leaves its row 'claimed', so the
+    worst case is a redelivered duplicate, never a lost job.
+    """
+
+    def __init__(self, batch_size: int = EVENT_BATCH_SIZE, flush_seconds: float = EVENT_FLUSH_SECONDS,
+                 max_pending: int = EVENT_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.stats = {
+            "flushes": 0,
+            "rows": 0,
+            "errors": 0,
+            "dropped": 0,
+            "max_batch": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, key: tuple, delivered: bool):
+        """Queues the outcome of one send for a claimed (user_id, platform, job_id)."""
+        with self._lock:
+            self._buffer.append((key, delivered))
+            self._trim()
+            full = len(self._buffer) >= self.batch_size
+            EVENT_WRITER_PENDING.set(len(self._buffer))
+        if full:
+            self._wake.set()
+
+    def _trim(self):
+        # caller holds self._lock
+        overflow = len(self._buffer) - self.max_pending
+        if overflow > 0:
+            for _ in range(overflow):
+                self._buffer.popleft()
+            self.stats["dropped"] += overflow
+            FEED_ACKS.labels("dropped").inc(overflow)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows:
+                return 0
+
+            delivered = [key for key, ok in rows if ok]
+            failed = [key for key, ok in rows if not ok]
+            started = time.perf_counter()
+            try:
+                ack_events(delivered, failed)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error(f"Ack flush failed ({len(rows)} rows): {e}")
+                with self._lock:
+                    self._buffer.extendleft(reversed(rows))
+                    self._trim()
+                    EVENT_WRITER_PENDING.set(len(self._buffer))
+                return 0
+
+            ms = (time.perf_counter() - started) * 1000
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(rows)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(rows))
+            self.stats["last_flush_ms"] = ms
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], ms)
+            self.stats["total_flush_ms"] += ms
+            FEED_ACKS.labels("delivered").inc(len(delivered))
+            FEED_ACKS.labels("failed").inc(len(failed))
+            EVENT_WRITER_PENDING.set(self.pending())
+            return len(rows)
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        flushes = s["flushes"] or 1
+        s["avg_batch"] = s["rows"] / flushes
+        s["avg_flush_ms"] = s["total_flush_ms"] / flushes
+        s["pending"] = self.pending()
+        return s
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error(f"Event writer error: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_event_writer() -> EventWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EventWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
 def get_platform_stats(hours: int = 24):
     db = get_session()
     try:
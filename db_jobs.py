@@ -0,0 +1,301 @@
+﻿import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from db import get_session, close_session
+from metrics import db_timer
+
+log = logging.getLogger("db_jobs")
+
+JOB_HASH_CACHE_SIZE = int(os.getenv("JOB_HASH_CACHE_SIZE", "20000"))
+
+# Fields that define a job's content; a re-scrape with the same values is a no-op
+HASHED_FIELDS = ("title", "description", "budget_amount", "budget_currency", "budget_usd", "url", "affiliate_url")
+
+_UPSERT_JOBS_SQL = """
+    INSERT INTO job (platform, job_id, title, description_z, url, affiliate_url,
+                     budget_amount, budget_currency, budget_usd, posted_at, content_hash)
+    SELECT * FROM unnest(
+        CAST(:p AS TEXT[]),
+        CAST(:j AS TEXT[]),
+        CAST(:t AS TEXT[]),
+        CAST(:d AS BYTEA[]),
+        CAST(:url AS TEXT[]),
+        CAST(:aff AS TEXT[]),
+        CAST(:amt AS NUMERIC[]),
+        CAST(:cur AS TEXT[]),
+        CAST(:usd AS NUMERIC[]),
+        CAST(:posted AS TIMESTAMPTZ[]),
+        CAST(:h AS BYTEA[])
+    )
+    ON CONFLICT (platform, job_id) DO UPDATE SET
+        title = EXCLUDED.title,
+        description_z = EXCLUDED.description_z,
+        url = EXCLUDED.url,
+        affiliate_url = EXCLUDED.affiliate_url,
+        budget_amount = EXCLUDED.budget_amount,
+        budget_currency = EXCLUDED.budget_currency,
+        budget_usd = EXCLUDED.budget_usd,
+        posted_at = COALESCE(EXCLUDED.posted_at, job.posted_at),
+        content_hash = EXCLUDED.content_hash,
+        updated_at = NOW()
+    WHERE job.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    RETURNING id, job_id, (xmax = 0) AS inserted
+"""
+
+
+def ensure_job_schema():
+    """
+    Canonical job store: one row per (platform, job_id). feed_event and
+    saved_job point at it through job_ref instead of carrying job data.
+    """
+    db = get_session()
+    try:
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS job (
+                id BIGSERIAL PRIMARY KEY,
+                platform TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                title TEXT,
+                description_z BYTEA,
+                url TEXT,
+                affiliate_url TEXT,
+                budget_amount NUMERIC,
+                budget_currency TEXT,
+                budget_usd NUMERIC,
+                posted_at TIMESTAMPTZ,
+                content_hash BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE (platform, job_id)
+            );
+        """))
+        db.execute(text("""
+            ALTER TABLE feed_event
+            ADD COLUMN IF NOT EXISTS job_ref BIGINT REFERENCES job(id) ON DELETE SET NULL;
+        """))
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS saved_job (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT,
+                job_id TEXT,
+                saved_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE (user_id, job_id)
+            );
+        """))
+        db.execute(text("""
+            ALTER TABLE saved_job
+            ADD COLUMN IF NOT EXISTS saved_at TIMESTAMP DEFAULT NOW(),
+            ADD COLUMN IF NOT EXISTS job_ref BIGINT REFERENCES job(id) ON DELETE SET NULL;
+        """))
+        db.commit()
+    finally:
+        close_session(db)
+
+
+# ----------------------------------------------------------
+# ENCODING
+# ----------------------------------------------------------
+def compress_text(value: str):
+    if not value:
+        return None
+    return zlib.compress(value.encode("utf-8"), 6)
+
+
+def decompress_text(blob) -> str:
+    if not blob:
+        return ""
+    return zlib.decompress(bytes(blob)).decode("utf-8")
+
+
+def job_url(job: dict):
+    return job.get("original_url") or job.get("url")
+
+
+def content_hash(job: dict) -> bytes:
+    values = [job.get(f) if f != "url" else job_url(job) for f in HASHED_FIELDS]
+    payload = json.dumps(values, default=str, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+# ----------------------------------------------------------
+# WRITE
+# ----------------------------------------------------------
+# (platform, job_id) -> (job ref, content hash) for rows already in the store.
+# store_jobs() runs on worker threads (asyncio.to_thread), so every access
+# to _known and store_stats holds _known_lock.
+_known = OrderedDict()
+_known_lock = threading.Lock()
+
+store_stats = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped_cached": 0}
+
+
+def _remember(platform: str, job_id: str, ref: int, digest: bytes):
+    # caller holds _known_lock
+    key = (platform, job_id)
+    _known[key] = (ref, digest)
+    _known.move_to_end(key)
+    while len(_known) > JOB_HASH_CACHE_SIZE:
+        _known.popitem(last=False)
+
+
+def store_jobs(platform: str, jobs) -> dict:
+    """
+    Writes normalized jobs to the store, once per (platform, job_id).
+    Rows whose content hash hasn't changed are not rewritten; the hash of
+    recently stored jobs is kept in memory so unchanged re-scrapes don't
+    even reach the database. Returns {job_id: job ref}.
+    """
+    refs = {}
+    pending = {}
+    hashed = []
+    for job in jobs:
+        jid = str(job.get("job_id") or "")
+        if jid:
+            hashed.append((jid, job, content_hash(job)))
+
+    with _known_lock:
+        for jid, job, digest in hashed:
+            known = _known.get((platform, jid))
+            if known and known[1] == digest:
+                refs[jid] = known[0]
+                store_stats["skipped_cached"] += 1
+                continue
+            pending[jid] = (job, digest)
+
+    if not pending:
+        return refs
+
+    rows = list(pending.items())
+    params = {
+        "p": [platform] * len(rows),
+        "j": [jid for jid, _ in rows],
+        "t": [job.get("title") for _, (job, _) in rows],
+        "d": [compress_text(job.get("description")) for _, (job, _) in rows],
+        "url": [job_url(job) for _, (job, _) in rows],
+        "aff": [job.get("affiliate_url") for _, (job, _) in rows],
+        "amt": [job.get("budget_amount") for _, (job, _) in rows],
+        "cur": [job.get("budget_currency") for _, (job, _) in rows],
+        "usd": [job.get("budget_usd") for _, (job, _) in rows],
+        "posted": [job.get("posted_at") for _, (job, _) in rows],
+        "h": [digest for _, (_, digest) in rows],
+    }
+
+    db = get_session()
+    try:
+        with db_timer("store_jobs"):
+            written = db.execute(text(_UPSERT_JOBS_SQL), params).fetchall()
+
+        unchanged = set(pending) - {r[1] for r in written}
+        existing = []
+        if unchanged:
+            existing = db.execute(
+                text("SELECT id, job_id FROM job WHERE platform=:p AND job_id = ANY(:ids)"),
+                {"p": platform, "ids": list(unchanged)}
+            ).fetchall()
+        db.commit()
+    finally:
+        close_session(db)
+
+    with _known_lock:
+        for ref, jid, inserted in written:
+            store_stats["inserted" if inserted else "updated"] += 1
+            refs[jid] = ref
+            _remember(platform, jid, ref, pending[jid][1])
+        for ref, jid in existing:
+            store_stats["unchanged"] += 1
+            refs[jid] = ref
+            _remember(platform, jid, ref, pending[jid][1])
+
+    return refs
+
+
+# ----------------------------------------------------------
+# READ
+# ----------------------------------------------------------
+JOB_COLUMNS = """
+    j.id, j.platform, j.job_id, j.title, j.description_z, j.url, j.affiliate_url,
+    j.budget_amount, j.budget_currency, j.budget_usd, COALESCE(j.posted_at, j.created_at)
+"""
+
+
+def job_from_row(row, **extra):
+    return SimpleNamespace(
+        id=row[2],
+        ref=row[0],
+        platform=row[1],
+        title=row[3],
+        description=decompress_text(row[4]),
+        original_url=row[5],
+        affiliate_url=row[6] or row[5],
+        budget_amount=row[7],
+        budget_currency=row[8],
+        budget_usd=row[9],
+        created_at=row[10],
+        match_keyword=None,
+        **extra,
+    )
+
+
+def get_job(platform: str, job_id: str):
+    db = get_session()
+    try:
+        row = db.execute(
+            text(f"SELECT {JOB_COLUMNS} FROM job j WHERE j.platform=:p AND j.job_id=:j"),
+            {"p": platform, "j": str(job_id)}
+        ).fetchone()
+        return job_from_row(row) if row else None
+    finally:
+        close_session(db)
+
+
+def fetch_saved_jobs(user_id: int, limit: int = 50):
+    """A user's saved jobs, newest first, served straight from the job store."""
+    db = get_session()
+    try:
+        rows = db.execute(
+            text(f"""
+                SELECT {JOB_COLUMNS}, s.saved_at
+                FROM saved_job s
+                JOIN job j ON j.id = s.job_ref
+                WHERE s.user_id = :u
+                ORDER BY s.saved_at DESC
+                LIMIT :n
+            """),
+            {"u": user_id, "n": limit}
+        ).fetchall()
+        return [job_from_row(r, saved_at=r[11]) for r in rows]
+    finally:
+        close_session(db)
+
+
+def fetch_unsent_jobs(min_age_seconds: int, max_age_hours: int = 24, limit: int = 500):
+    """
+    Claimed feed events that are still waiting for a successful send, oldest
+    first, with their job from the store: [(user_id, job)]. Claims younger
+    than `min_age_seconds` are left alone (a send may still be in flight).
+    """
+    db = get_session()
+    try:
+        rows = db.execute(
+            text(f"""
+                SELECT {JOB_COLUMNS}, e.user_id
+                FROM feed_event e
+                JOIN job j ON j.id = e.job_ref
+                WHERE e.status = 'claimed'
+                  AND e.sent_at < NOW() - (INTERVAL '1 second' * :min_age)
+                  AND e.sent_at > NOW() - (INTERVAL '1 hour' * :max_age)
+                ORDER BY e.sent_at
+                LIMIT :n
+            """),
+            {"min_age": min_age_seconds, "max_age": max_age_hours, "n": limit}
+        ).fetchall()
+        return [(r[11], job_from_row(r)) for r in rows]
+    finally:
+        close_session(db)
@@ -1,6 +1,8 @@
 ﻿import logging
 from sqlalchemy import text
 from db import get_session, close_session
+from metrics import db_timer
+from user_cache import invalidate_keywords
 
 log = logging.getLogger("db_keywords")
 
@@ -24,10 +26,11 @@ def ensure_keywords_schema():
 def get_keywords(user_id: int):
     db = get_session()
     try:
-        rows = db.execute(
-            text("SELECT keyword FROM user_keywords WHERE user_id=:u"),
-            {"u": user_id}
-        ).fetchall()
+        with db_timer("get_keywords"):
+            rows = db.execute(
+                text("SELECT keyword FROM user_keywords WHERE user_id=:u"),
+                {"u": user_id}
+            ).fetchall()
         return [r[0] for r in rows]
     finally:
         close_session(db)
@@ -44,6 +47,7 @@ def add_keywords(user_id: int, keywords):
         db.commit()
     finally:
         close_session(db)
+        invalidate_keywords(user_id)
 
 
 def delete_keyword(user_id: int, keyword: str):
@@ -56,5 +60,26 @@ def delete_keyword(user_id: int, keyword: str):
         db.commit()
     finally:
         close_session(db)
+        invalidate_keywords(user_id)
+
+
+def get_all_user_keywords():
+    """Loads keywords of every active user in one query: {telegram_id: [keyword, ...]}."""
+    db = get_session()
+    try:
+        rows = db.execute(text("""
+            SELECT k.user_id, k.keyword
+            FROM user_keywords k
+            JOIN app_user u ON u.telegram_id = k.user_id
+            WHERE u.active = true
+            ORDER BY k.user_id, k.id
+        """)).fetchall()
+
+        result = {}
+        for user_id, keyword in rows:
+            result.setdefault(user_id, []).append(keyword)
+        return result
+    finally:
+        close_session(db)
 
 
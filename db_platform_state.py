@@ -0,0 +1,57 @@
+﻿import json
+import logging
+from sqlalchemy import text
+from db import get_session, close_session
+
+log = logging.getLogger("db_platform_state")
+
+
+def ensure_platform_state_schema():
+    """Small key/value store for per-platform worker state (watermarks, schedules)."""
+    db = get_session()
+    try:
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS platform_state (
+                platform TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT NOW(),
+                PRIMARY KEY (platform, key)
+            );
+        """))
+        db.commit()
+    finally:
+        close_session(db)
+
+
+def get_platform_state(platform: str, key: str, default=None):
+    db = get_session()
+    try:
+        row = db.execute(
+            text("SELECT value FROM platform_state WHERE platform=:p AND key=:k"),
+            {"p": platform, "k": key}
+        ).fetchone()
+        if not row or row[0] is None:
+            return default
+        return json.loads(row[0])
+    finally:
+        close_session(db)
+
+
+def set_platform_state(platform: str, key: str, value):
+    db = get_session()
+    try:
+        db.execute(
+            text("""
+                INSERT INTO platform_state (platform, key, value, updated_at)
+                VALUES (:p, :k, :v, NOW())
+                ON CONFLICT (platform, key)
+                DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()
+            """),
+            {"p": platform, "k": key, "v": json.dumps(value)}
+        )
+        db.commit()
+    finally:
+        close_session(db)
+
+
@@ -31,7 +31,7 @@ EOF
 echo
 
 echo "ðŸ‘‰ Checking workers..."
-ps aux | grep -E "worker_freelancer|worker_pph|worker_skywalker" | grep -v grep || true
+ps aux | grep -E "worker_ingest|worker_freelancer|worker_pph|worker_skywalker" | grep -v grep || true
 echo
 
 echo "ðŸ‘‰ Checking logs..."
@@ -0,0 +1,178 @@
+﻿import asyncio
+import html
+import logging
+import os
+from functools import partial
+
+from sqlalchemy import text
+from db import get_session, close_session
+from metrics import db_timer
+from utils import CARD_MATCH_CHARS, MESSAGE_MAX_CHARS, build_job_card, shorten
+
+log = logging.getLogger("digest")
+
+# jobs per digest message; a full digest goes out without waiting for the window
+DIGEST_MAX_JOBS = int(os.getenv("DIGEST_MAX_JOBS", "10"))
+# window used when a user switches digest mode on from the settings screen
+DIGEST_DEFAULT_MINUTES = int(os.getenv("DIGEST_DEFAULT_MINUTES", "15"))
+DIGEST_TITLE_CHARS = int(os.getenv("DIGEST_TITLE_CHARS", "90"))
+
+
+def ensure_digest_schema():
+    """app_user.digest_minutes: NULL = one message per job, N = one digest per N minutes."""
+    db = get_session()
+    try:
+        db.execute(text("ALTER TABLE app_user ADD COLUMN IF NOT EXISTS digest_minutes INTEGER"))
+        db.commit()
+    finally:
+        close_session(db)
+
+
+def get_digest_users() -> dict:
+    """{telegram_id: window minutes} for active users in digest mode."""
+    db = get_session()
+    try:
+        with db_timer("get_digest_users"):
+            rows = db.execute(text("""
+                SELECT telegram_id, digest_minutes
+                FROM app_user
+                WHERE digest_minutes > 0 AND active = true
+            """)).fetchall()
+        return {tid: minutes for tid, minutes in rows}
+    finally:
+        close_session(db)
+
+
+def describe_digest(minutes) -> str:
+    if not minutes:
+        return "off (one message per job)"
+    return f"every {minutes} min, up to {DIGEST_MAX_JOBS} jobs per message"
+
+
+def build_digest(jobs: list):
+    """
+    Returns (text, reply_markup, count) for as many of the normalized job
+    dicts as fit in one message (at least one): one line and one button row
+    per job. The text is HTML with every job field escaped.
+    """
+    lines = []
+    rows = []
+    size = 64  # header
+    for n, job in enumerate(jobs, 1):
+        title = html.escape(shorten(job.get("title") or "(no title)", DIGEST_TITLE_CHARS))
+        if job.get("budget_amount"):
+            budget = html.escape(f"{job['budget_amount']} {job.get('budget_currency') or ''}".strip())
+        else:
+            budget = "N/A"
+        line = f"{n}. <b>{title}</b>\n    🪙 {budget} · 🌍 {html.escape(job.get('platform') or 'Unknown')}"
+        if job.get("match_keyword"):
+            line += f" · 🔍 {html.escape(shorten(job['match_keyword'], CARD_MATCH_CHARS))}"
+        if lines and size + len(line) + 1 > MESSAGE_MAX_CHARS:
+            break
+        size += len(line) + 1
+        lines.append(line)
+
+        url = job.get("affiliate_url") or job.get("original_url") or job.get("url")
+        jid = job.get("job_id") or job.get("id")
+        row = [{"text": f"{n}. Open", "url": url}] if url else []
+        row.append({"text": f"⭐ Save {n}", "callback_data": f"act:save:{jid}"})
+        rows.append(row)
+
+    header = f"📬 <b>{len(lines)} new matching jobs</b>"
+    return "\n".join([header, ""] + lines), {"inline_keyboard": rows}, len(lines)
+
+
+def _resolve(items, done):
+    ok = not done.cancelled() and done.exception() is None and done.result() is True
+    for _, future in items:
+        if not future.done():
+            future.set_result(ok)
+
+
+class DigestRouter:
+    """
+    Sits in front of DeliveryEngine and picks instant or digest per user.
+
+    Users without a digest window get one card per job as before. For the
+    others matches are held for their window (counted from the first held
+    job) or until DIGEST_MAX_JOBS pile up, then go out as one message.
+    send() returns a future per job either way, resolved when its message
+    is delivered. Held jobs live in memory; stop() flushes them.
+    """
+
+    def __init__(self, delivery, max_jobs: int = DIGEST_MAX_JOBS):
+        self.delivery = delivery
+        self.max_jobs = max_jobs
+        self.windows = {}   # user_id -> minutes
+        self._pending = {}  # user_id -> [(job, future)]
+        self._timers = {}   # user_id -> TimerHandle
+        self.stats = {
+            "instant": 0,
+            "batched_jobs": 0,
+            "digests": 0,
+            "flushed_full": 0,
+        }
+
+    def set_windows(self, windows: dict):
+        """Replaces the digest users; anyone leaving digest mode gets their held jobs now."""
+        for user_id in [u for u in self._pending if u not in windows]:
+            self.flush(user_id)
+        self.windows = dict(windows)
+
+    def send(self, user_id, job: dict) -> asyncio.Future:
+        minutes = self.windows.get(user_id)
+        if not minutes:
+            self.stats["instant"] += 1
+            text, kb = build_job_card(job)
+            return self.delivery.enqueue(user_id, text, reply_markup=kb, parse_mode="HTML")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(user_id, [])
+        pending.append((job, future))
+        self.stats["batched_jobs"] += 1
+
+        if len(pending) >= self.max_jobs:
+            self.stats["flushed_full"] += 1
+            self.flush(user_id)
+        elif user_id not in self._timers:
+            self._timers[user_id] = loop.call_later(minutes * 60, self.flush, user_id)
+        return future
+
+    def flush(self, user_id):
+        timer = self._timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        items = self._pending.pop(user_id, None)
+        if not items:
+            return
+
+        # a digest too long for one message goes out in several
+        while items:
+            if len(items) == 1:
+                text, kb = build_job_card(items[0][0])
+                count = 1
+            else:
+                text, kb, count = build_digest([job for job, _ in items])
+            chunk, items = items[:count], items[count:]
+            self.stats["digests"] += 1
+            sent = self.delivery.enqueue(user_id, text, reply_markup=kb, parse_mode="HTML")
+            sent.add_done_callback(partial(_resolve, chunk))
+
+    def flush_all(self):
+        for user_id in list(self._pending):
+            self.flush(user_id)
+
+    def stop(self):
+        self.flush_all()
+
+    def held(self) -> int:
+        return sum(len(items) for items in self._pending.values())
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        s["digest_users"] = len(self.windows)
+        s["held_jobs"] = self.held()
+        # sendMessage calls avoided by batching
+        s["calls_saved"] = max(0, s["batched_jobs"] - s["digests"] - s["held_jobs"])
+        return s
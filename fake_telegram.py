@@ -0,0 +1,207 @@
+﻿import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter, deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+log = logging.getLogger("fake_telegram")
+
+FAKE_TG_LATENCY_MS = float(os.getenv("FAKE_TG_LATENCY_MS", "40"))
+FAKE_TG_JITTER_MS = float(os.getenv("FAKE_TG_JITTER_MS", "20"))
+# random 429s on top of the enforced limits below
+FAKE_TG_429_RATE = float(os.getenv("FAKE_TG_429_RATE", "0"))
+FAKE_TG_RETRY_AFTER = int(os.getenv("FAKE_TG_RETRY_AFTER", "3"))
+# Bot API limits, enforced like Telegram does (0 disables)
+FAKE_TG_GLOBAL_LIMIT = float(os.getenv("FAKE_TG_GLOBAL_LIMIT", "30"))
+FAKE_TG_CHAT_LIMIT = float(os.getenv("FAKE_TG_CHAT_LIMIT", "1"))
+# chats answering 403 "bot was blocked by the user"
+FAKE_TG_BLOCKED = os.getenv("FAKE_TG_BLOCKED", "")
+FAKE_TG_BLOCKED_RATE = float(os.getenv("FAKE_TG_BLOCKED_RATE", "0"))
+FAKE_TG_LOG = os.getenv("FAKE_TG_LOG", "")
+
+
+class Window:
+    """Sliding one-second window: allows `limit` hits per second."""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.hits = deque()
+
+    def retry_after(self, now: float) -> int:
+        """0 when the hit is allowed (and recorded), else seconds to wait."""
+        if not self.limit:
+            return 0
+        cutoff = now - 1.0
+        while self.hits and self.hits[0] <= cutoff:
+            self.hits.popleft()
+        if len(self.hits) >= self.limit:
+            return max(1, int(self.hits[0] - cutoff + 0.999))
+        self.hits.append(now)
+        return 0
+
+
+class FakeTelegram:
+    """
+    Local stand-in for the Bot API, for offline delivery benchmarks.
+
+    Implements getMe, sendMessage, editMessageText, answerCallbackQuery,
+    setWebhook, deleteWebhook and getWebhookInfo under /bot<token>/<method>,
+    with configurable latency, the global and per-chat flood limits (429
+    with retry_after), random 429 injection and 403 for blocked chats.
+    Every call is counted and, with FAKE_TG_LOG, appended as a JSON line.
+    """
+
+    def __init__(self, latency_ms: float = FAKE_TG_LATENCY_MS, jitter_ms: float = FAKE_TG_JITTER_MS,
+                 rate_429: float = FAKE_TG_429_RATE, retry_after: int = FAKE_TG_RETRY_AFTER,
+                 global_limit: float = FAKE_TG_GLOBAL_LIMIT, chat_limit: float = FAKE_TG_CHAT_LIMIT,
+                 blocked=None, blocked_rate: float = FAKE_TG_BLOCKED_RATE, log_path: str = FAKE_TG_LOG):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.chat_limit = chat_limit
+        self.blocked = {str(c).strip() for c in (blocked if blocked is not None else FAKE_TG_BLOCKED.split(","))
+                        if str(c).strip()}
+        self.blocked_rate = blocked_rate
+        self.log_path = log_path
+
+        self._global = Window(global_limit)
+        self._chats = {}
+        self._message_ids = Counter()
+        self.webhook_url = ""
+        self.stats = Counter()
+        self.delivered = Counter()  # chat_id -> messages accepted
+        self.messages = []          # (chat_id, text) in acceptance order
+
+    def is_blocked(self, chat_id: str) -> bool:
+        if chat_id in self.blocked:
+            return True
+        return bool(self.blocked_rate) and random.Random(chat_id).random() < self.blocked_rate
+
+    def _limited(self, chat_id: str) -> int:
+        now = time.monotonic()
+        window = self._chats.get(chat_id)
+        if window is None:
+            window = self._chats[chat_id] = Window(self.chat_limit)
+        wait = window.retry_after(now)
+        if wait:
+            return wait
+        wait = self._global.retry_after(now)
+        if wait:
+            window.hits.pop()
+        return wait
+
+    def _write_log(self, entry: dict):
+        if not self.log_path:
+            return
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _message(self, chat_id: str, text: str, message_id: int = None) -> dict:
+        if message_id is None:
+            self._message_ids[chat_id] += 1
+            message_id = self._message_ids[chat_id]
+        chat = int(chat_id) if chat_id.lstrip("-").isdigit() else chat_id
+        return {"message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat, "type": "private"}, "text": text}
+
+    async def call(self, method: str, params: dict):
+        """Returns (HTTP status, Bot API body) for one method call."""
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        self.stats[method] += 1
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}}
+        if method == "setWebhook":
+            self.webhook_url = params.get("url", "")
+            return 200, {"ok": True, "result": True, "description": "Webhook was set"}
+        if method == "deleteWebhook":
+            self.webhook_url = ""
+            return 200, {"ok": True, "result": True}
+        if method == "getWebhookInfo":
+            return 200, {"ok": True, "result": {"url": self.webhook_url, "has_custom_certificate": False,
+                                                "pending_update_count": 0}}
+        if method == "answerCallbackQuery":
+            return 200, {"ok": True, "result": True}
+        if method not in ("sendMessage", "editMessageText"):
+            self.stats["not_found"] += 1
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+        chat_id = str(params.get("chat_id", ""))
+        text = params.get("text", "")
+        if not chat_id or not text:
+            self.stats["bad_request"] += 1
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat_id and text are required"}
+
+        if self.is_blocked(chat_id):
+            self.stats["blocked"] += 1
+            status, body = 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+        else:
+            wait = self._limited(chat_id)
+            if not wait and self.rate_429 and random.random() < self.rate_429:
+                wait = self.retry_after
+            if wait:
+                self.stats["rate_limited"] += 1
+                status, body = 429, {"ok": False, "error_code": 429,
+                                     "description": f"Too Many Requests: retry after {wait}",
+                                     "parameters": {"retry_after": wait}}
+            else:
+                if method == "sendMessage":
+                    self.delivered[chat_id] += 1
+                    self.messages.append((chat_id, text))
+                    message_id = None
+                else:
+                    message_id = int(params.get("message_id") or 0)
+                status, body = 200, {"ok": True, "result": self._message(chat_id, text, message_id)}
+
+        self._write_log({"ts": round(time.time(), 3), "method": method, "chat_id": chat_id,
+                         "status": status, "text": text})
+        return status, body
+
+    def get_stats(self) -> dict:
+        return {"calls": dict(self.stats), "chats": len(self.delivered),
+                "delivered": sum(self.delivered.values()), "webhook_url": self.webhook_url}
+
+
+async def _params(request: Request) -> dict:
+    params = dict(request.query_params)
+    ctype = request.headers.get("content-type", "")
+    if "json" in ctype:
+        params.update(await request.json())
+    elif "form" in ctype:
+        params.update((await request.form()).items())
+    return params
+
+
+def create_app(fake: FakeTelegram = None) -> FastAPI:
+    fake = fake or FakeTelegram()
+    api = FastAPI()
+    api.state.fake = fake
+
+    @api.api_route("/bot{token}/{method}", methods=["GET", "POST"])
+    async def bot_method(token: str, method: str, request: Request):
+        status, body = await fake.call(method, await _params(request))
+        return JSONResponse(body, status_code=status)
+
+    @api.get("/stats")
+    async def stats():
+        return fake.get_stats()
+
+    return api
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    port = int(os.getenv("FAKE_TG_PORT", "8081"))
+    log.info(f"Fake Bot API on http://127.0.0.1:{port} — set TELEGRAM_API_BASE to use it")
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
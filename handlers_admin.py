@@ -1,9 +1,10 @@
-﻿import logging
+﻿import html
+import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import ADMIN_IDS
-from db import get_session, close_session
-from sqlalchemy import text
+from db_async import list_user_ids
+from tracing import slowest, format_trace
 
 log = logging.getLogger("handlers_admin")
 
@@ -16,12 +17,7 @@ async def admin_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not admin_only(update.effective_user.id):
         return
 
-    db = get_session()
-    try:
-        rows = db.execute(text("SELECT telegram_id FROM app_user ORDER BY telegram_id")).fetchall()
-        users = "\n".join(str(r[0]) for r in rows) or "(no users)"
-    finally:
-        close_session(db)
+    users = "\n".join(str(t) for t in await list_user_ids()) or "(no users)"
 
     await update.message.reply_text(f"ðŸ‘‘ *Users:*\n{users}", parse_mode="Markdown")
 
@@ -66,3 +62,20 @@ async def admin_feeds(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await update.message.reply_text("âœ… Feed toggles ok.")
 
+
+async def admin_traces(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/traces [n] [platform] - slowest recent job traces with per-stage timings (ms)."""
+    if not admin_only(update.effective_user.id):
+        return
+
+    args = update.message.text.split()[1:]
+    n = int(args[0]) if args and args[0].isdigit() else 10
+    platform = next((a for a in args if not a.isdigit()), None)
+
+    traces = slowest(min(n, 30), platform)
+    if not traces:
+        await update.message.reply_text("No traces recorded yet.")
+        return
+
+    body = html.escape("\n".join(format_trace(t) for t in traces))
+    await update.message.reply_text(f"Slowest traces:\n<pre>{body}</pre>", parse_mode="HTML")
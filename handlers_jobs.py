@@ -4,8 +4,8 @@ from datetime import datetime, timezone
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils import save_job, delete_saved_job, wrap_affiliate_link
-from db_events import record_event
+from db_async import save_job, delete_saved_job
+from utils import wrap_affiliate_link
 
 log = logging.getLogger("handlers_jobs")
 
@@ -108,11 +108,11 @@ async def handle_job_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         if action == "save":
-            save_job(uid, job_id)
+            await save_job(uid, job_id)
             await query.edit_message_reply_markup(reply_markup=None)
             await query.edit_message_text("âœ… Job saved.")
         elif action == "del":
-            delete_saved_job(uid, job_id)
+            await delete_saved_job(uid, job_id)
             await query.edit_message_reply_markup(reply_markup=None)
             await query.edit_message_text("ðŸ—‘ï¸ Job deleted.")
     except Exception as e:
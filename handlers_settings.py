@@ -2,9 +2,9 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils import get_user, set_user_setting
-from db_keywords import get_keywords
+from db_async import get_user, get_keywords, set_user_setting
 from config import ADMIN_IDS
+from digest import describe_digest
 
 log = logging.getLogger("handlers_settings")
 
@@ -14,12 +14,12 @@ async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     uid = query.from_user.id
-    user = get_user(uid)
+    user = await get_user(uid)
     if not user:
         await query.edit_message_text("User not found.")
         return
 
-    keywords = ", ".join(get_keywords(uid)) or "(none)"
+    keywords = ", ".join(await get_keywords(uid)) or "(none)"
     countries = user["countries"] or "ALL"
     proposal = user["proposal_template"] or "(none)"
 
@@ -48,3 +48,25 @@ async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
 
 
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/digest [minutes|off] - batch matches into one message per window, or send each job at once."""
+    uid = update.effective_user.id
+    args = update.message.text.split()[1:]
+
+    if not args:
+        user = await get_user(uid)
+        current = describe_digest(user.get("digest_minutes") if user else None)
+        await update.message.reply_text(f"Digest: {current}\nUsage: /digest <minutes> or /digest off")
+        return
+
+    arg = args[0].lower()
+    if arg in ("off", "0", "instant"):
+        minutes = None
+    elif arg.isdigit() and 1 <= int(arg) <= 1440:
+        minutes = int(arg)
+    else:
+        await update.message.reply_text("Usage: /digest <minutes, 1-1440> or /digest off")
+        return
+
+    await set_user_setting(uid, "digest_minutes", minutes)
+    await update.message.reply_text(f"Digest: {describe_digest(minutes)}")
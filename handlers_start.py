@@ -2,7 +2,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils import get_or_create_user_by_tid
+from db_async import get_or_create_user_by_tid
 
 log = logging.getLogger("handlers_start")
 
@@ -58,7 +58,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         tid = user.id
 
         # DB ensure
-        get_or_create_user_by_tid(tid)
+        await get_or_create_user_by_tid(tid)
 
         # Load admin list from env -> bot_data
         admin_ids = context.bot_data.get("ADMIN_IDS", [])
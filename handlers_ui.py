@@ -2,9 +2,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils import get_user, get_keywords, get_countries, get_proposal_template
-from db_keywords import delete_keyword
-from db_events import fetch_saved_jobs
+from db_async import get_user, get_keywords, fetch_saved_jobs, set_user_setting
+from digest import DIGEST_DEFAULT_MINUTES, describe_digest
 
 log = logging.getLogger("handlers_ui")
 
@@ -13,21 +12,22 @@ log = logging.getLogger("handlers_ui")
 #  SHARED UI BUILDERS
 # ======================
 
-def build_settings_message(user):
-    kw = ", ".join(get_keywords(user.id)) or "(none)"
-    countries = ", ".join(get_countries(user.id)) or "ALL"
-    proposal = get_proposal_template(user.id) or "(none)"
+async def build_settings_message(user):
+    kw = ", ".join(await get_keywords(user["telegram_id"])) or "(none)"
+    countries = user["countries"] or "ALL"
+    proposal = user["proposal_template"] or "(none)"
 
     return (
         "ðŸ›  *Your Settings*\n"
         f"â€¢ *Keywords:* {kw}\n"
         f"â€¢ *Countries:* {countries}\n"
         f"â€¢ *Proposal template:* {proposal}\n"
-        f"ðŸŸ¢ *Start date:* {user.created_at}\n"
-        f"ðŸŸ¢ *Trial ends:* {user.trial_until}\n"
-        f"ðŸŸ¢ *License until:* {user.license_until}\n"
-        f"âœ… *Active:* {'â˜‘ï¸' if user.is_active else 'âŒ'}\n"
-        f"ðŸš« *Blocked:* {'â˜‘ï¸' if user.is_blocked else 'âŒ'}\n"
+        f"ðŸŸ¢ *Start date:* {user['start_date']}\n"
+        f"ðŸŸ¢ *Trial ends:* {user['trial_until']}\n"
+        f"ðŸŸ¢ *License until:* {user['license_until']}\n"
+        f"âœ… *Active:* {'â˜‘ï¸' if user['active'] else 'âŒ'}\n"
+        f"ðŸš« *Blocked:* {'â˜‘ï¸' if user['blocked'] else 'âŒ'}\n"
+        f"📬 *Digest:* {describe_digest(user.get('digest_minutes'))}\n"
         "________________________________________\n"
         "ðŸŒ *Platforms monitored:*\n"
         "Global: Freelancer.com, PeoplePerHour, Malt, Workana, Guru, 99designs,\n"
@@ -39,8 +39,10 @@ def build_settings_message(user):
     )
 
 
-def build_settings_keyboard():
+def build_settings_keyboard(user):
+    digest = "📬 Digest: on" if user.get("digest_minutes") else "📬 Digest: off"
     return InlineKeyboardMarkup([
+        [InlineKeyboardButton(digest, callback_data="ui:digest")],
         [InlineKeyboardButton("âž• Add keyword", callback_data="act:addkw")],
         [InlineKeyboardButton("âž– Remove keyword", callback_data="act:delkw")],
         [InlineKeyboardButton("ðŸŒ Set countries", callback_data="act:setcountries")],
@@ -69,6 +71,7 @@ def build_help_message():
         "â€ƒðŸ“© *Proposal* â†’ affiliate job link\n"
         "â€ƒðŸŒ *Original* â†’ direct affiliate link\n"
         "âž¡ï¸ `/mysettings` anytime.\n"
+        "➡️ `/digest 15` bundles jobs into one message every 15 min, `/digest off` for instant.\n"
         "âž¡ï¸ `/selftest` for a test job.\n"
         "âž¡ï¸ `/platforms CC` (e.g. `/platforms GR`).\n"
         "________________________________________\n"
@@ -86,7 +89,7 @@ def build_contact_message(user):
         "Send your message here and the admin will receive it.\n"
         "You will get a reply directly inside this chat.\n"
         "________________________________________\n"
-        f"*Your ID:* `{user.telegram_id}`"
+        f"*Your ID:* `{user['telegram_id']}`"
     )
 
 
@@ -98,6 +101,7 @@ def build_admin_message():
         "â€¢ `/block <telegram_id>` / `/unblock <telegram_id>`\n"
         "â€¢ `/broadcast <text>` â€“ send to all active users\n"
         "â€¢ `/feedsstatus` â€“ show feed toggles\n"
+        "â€¢ `/traces [n] [platform]` â€“ slowest recent job traces\n"
         "/SELFTEST  \n"
         "/WORKERS TEST"
     )
@@ -133,8 +137,6 @@ async def handle_ui_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         data = query.data  # e.g. ui:settings
         tid = query.from_user.id
 
-        user = get_user(tid)
-
         # Check admin
         admin_ids = context.bot_data.get("ADMIN_IDS", [])
         is_admin = tid in admin_ids if admin_ids else False
@@ -150,16 +152,29 @@ async def handle_ui_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # ========== SETTINGS ==========
         if data == "ui:settings":
+            user = await get_user(tid)
+            await query.edit_message_text(
+                await build_settings_message(user),
+                reply_markup=build_settings_keyboard(user),
+                parse_mode="Markdown"
+            )
+            return
+
+        if data == "ui:digest":
+            user = await get_user(tid)
+            minutes = None if user.get("digest_minutes") else DIGEST_DEFAULT_MINUTES
+            await set_user_setting(tid, "digest_minutes", minutes)
+            user["digest_minutes"] = minutes
             await query.edit_message_text(
-                build_settings_message(user),
-                reply_markup=build_settings_keyboard(),
+                await build_settings_message(user),
+                reply_markup=build_settings_keyboard(user),
                 parse_mode="Markdown"
             )
             return
 
         # ========== KEYWORDS ==========
         if data == "ui:keywords":
-            kws = ", ".join(get_keywords(user.id)) or "(none)"
+            kws = ", ".join(await get_keywords(tid)) or "(none)"
             await query.edit_message_text(
                 f"ðŸŸ© *Your Keywords*\n{kws}",
                 reply_markup=InlineKeyboardMarkup([
@@ -173,7 +188,7 @@ async def handle_ui_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # ========== SAVED ==========
         if data == "ui:saved":
-            saved = fetch_saved_jobs(user.id)
+            saved = await fetch_saved_jobs(tid)
             if not saved:
                 msg = "ðŸ’¾ *Saved Jobs*\nYou have no saved jobs."
             else:
@@ -201,6 +216,7 @@ async def handle_ui_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # ========== CONTACT ==========
         if data == "ui:contact":
+            user = await get_user(tid)
             await query.edit_message_text(
                 build_contact_message(user),
                 reply_markup=InlineKeyboardMarkup([
@@ -237,7 +253,6 @@ async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Handles free messages (used for Contact â†’ Admin inbox)."""
     try:
         tid = update.effective_user.id
-        user = get_user(tid)
 
         # Forward to admin
         admin_ids = context.bot_data.get("ADMIN_IDS", [])
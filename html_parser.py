@@ -0,0 +1,98 @@
+﻿import logging
+import os
+import re
+
+import soupsieve as sv
+from bs4 import BeautifulSoup, SoupStrainer
+
+log = logging.getLogger("html_parser")
+
+
+def _default_backend() -> str:
+    backend = os.getenv("HTML_PARSER")
+    if backend:
+        return backend
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+HTML_PARSER = _default_backend()
+
+_SIMPLE_SELECTOR = re.compile(r"^([a-zA-Z][\w-]*)?(?:\.([\w-]+))?$")
+
+
+def _has_class(cls: str):
+    # the strainer sees the raw attribute ("job clicky"), not the split list
+    def match(value):
+        if value is None:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return cls in values
+    return match
+
+
+def parse_simple_selector(selector: str):
+    """(tag, class) for `tag`, `.class` or `tag.class` selectors, else None."""
+    m = _SIMPLE_SELECTOR.match(selector.strip())
+    if not m or not any(m.groups()):
+        return None
+    return m.groups()
+
+
+def strainer_for(selector: str):
+    """SoupStrainer for simple `tag`, `.class` or `tag.class` card selectors, else None."""
+    simple = parse_simple_selector(selector)
+    if not simple:
+        return None
+    tag, cls = simple
+    if cls:
+        return SoupStrainer(tag, class_=_has_class(cls))
+    return SoupStrainer(tag)
+
+
+class CardParser:
+    """
+    Parses listing pages card by card.
+
+    Only the job-card subtrees are built (SoupStrainer on the card selector),
+    the backend defaults to lxml when installed, and the card/field CSS
+    selectors are compiled once when the platform module is imported.
+    """
+
+    def __init__(self, card_selector: str, fields: dict, backend: str = None):
+        self.card_selector = card_selector
+        self.field_selectors = dict(fields)
+        self.backend = backend or HTML_PARSER
+
+        self._card = sv.compile(card_selector)
+        self._fields = {name: sv.compile(sel) for name, sel in fields.items()}
+        self._strainer = strainer_for(card_selector)
+
+    def cards(self, html: str):
+        soup = BeautifulSoup(html, self.backend, parse_only=self._strainer)
+        return self._card.select(soup)
+
+    def first(self, card, field: str):
+        return self._fields[field].select_one(card)
+
+    def text(self, card, field: str, default: str = ""):
+        el = self.first(card, field)
+        return el.get_text(strip=True) if el else default
+
+    def legacy(self):
+        """The original whole-page html.parser path, kept for benchmarks."""
+        return LegacyCardParser(self.card_selector, self.field_selectors)
+
+
+class LegacyCardParser(CardParser):
+    def __init__(self, card_selector: str, fields: dict):
+        super().__init__(card_selector, fields, backend="html.parser")
+
+    def cards(self, html: str):
+        return BeautifulSoup(html, "html.parser").select(self.card_selector)
+
+    def first(self, card, field: str):
+        return card.select_one(self.field_selectors[field])
@@ -0,0 +1,218 @@
+﻿import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+
+from html_parser import parse_simple_selector
+from metrics import FETCH_BYTES
+
+log = logging.getLogger("html_stream")
+
+HTML_STREAMING = os.getenv("HTML_STREAMING", "0") == "1"
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16384"))
+RECENT_KEYS_SIZE = int(os.getenv("STREAM_RECENT_KEYS", "500"))
+# consecutive already-seen cards before we stop (guards against pinned/featured posts)
+SEEN_STOP_AFTER = int(os.getenv("STREAM_SEEN_STOP_AFTER", "3"))
+
+try:
+    from lxml import etree
+except ImportError:  # streaming needs lxml; callers fall back to full parsing
+    etree = None
+
+
+def streaming_enabled() -> bool:
+    return HTML_STREAMING and etree is not None
+
+
+class CardStream:
+    """
+    Incremental card extractor on top of lxml's HTMLPullParser.
+
+    feed() takes raw response chunks and returns the HTML of every card that
+    completed in them. Finished cards are cleared from the tree so memory
+    stays flat, and `done` turns True once the element containing the cards
+    closes, i.e. the rest of the page (footer, scripts, ads) is irrelevant.
+    """
+
+    def __init__(self, card_selector: str, encoding: str = None):
+        simple = parse_simple_selector(card_selector)
+        if not simple:
+            raise ValueError(f"streaming needs a simple tag/.class selector, got {card_selector!r}")
+        self.tag, self.cls = simple
+
+        self._parser = etree.HTMLPullParser(events=("end",), encoding=encoding)
+        self._container = None
+        self.cards = 0
+        self.done = False
+
+    def _is_card(self, el) -> bool:
+        if not isinstance(el.tag, str):
+            return False
+        if self.tag and el.tag != self.tag:
+            return False
+        if self.cls and self.cls not in (el.get("class") or "").split():
+            return False
+        return True
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return []
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self):
+        if self.done:
+            return []
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        return self._drain()
+
+    def _drain(self):
+        out = []
+        for _, el in self._parser.read_events():
+            if self.done:
+                continue
+            if el is self._container:
+                self.done = True
+                continue
+            if not self._is_card(el):
+                continue
+
+            out.append(etree.tostring(el, encoding="unicode", method="html", with_tail=False))
+            self.cards += 1
+
+            parent = el.getparent()
+            if self._container is None:
+                self._container = parent
+            # drop finished cards (and whatever preceded them) from the tree
+            el.clear(keep_tail=False)
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+        return out
+
+
+class RecentKeys:
+    """Bounded, insertion-ordered set of job keys seen in recent cycles."""
+
+    def __init__(self, maxsize: int = RECENT_KEYS_SIZE):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+
+
+# platform -> RecentKeys / stream stats
+_recent = {}
+stream_stats = {}
+
+
+def _stats_for(platform: str) -> dict:
+    s = stream_stats.get(platform)
+    if s is None:
+        s = stream_stats[platform] = {
+            "streams": 0,
+            "not_modified": 0,
+            "stopped_at_container": 0,
+            "stopped_at_seen": 0,
+            "read_to_end": 0,
+            "bytes_read": 0,
+            "first_card_ms": None,
+        }
+    return s
+
+
+async def stream_jobs(client, url: str, platform: str, parse, card_selector: str, key: str = "url"):
+    """
+    Streams `url`, parses each card as it completes with parse(card_html)
+    and stops downloading at the end of the card container or once it runs
+    into jobs already seen in a previous cycle. Returns (new jobs, commit):
+    the jobs only count as seen, and the page validators are only stored,
+    once commit() is awaited after they have been processed.
+    """
+    recent = _recent.setdefault(platform, RecentKeys())
+    stats = _stats_for(platform)
+    stats["streams"] += 1
+
+    started = time.perf_counter()
+    first_card_ms = None
+    jobs = []
+    seen_run = 0
+    stop_reason = "read_to_end"
+
+    body_hash = hashlib.blake2b(digest_size=16)
+    body = {"size": 0, "complete": False}
+
+    async with client.stream(url, platform=platform) as response:
+        if response.status_code == 304:
+            stats["not_modified"] += 1
+            return [], None
+        response.raise_for_status()
+
+        stream = CardStream(card_selector, encoding=response.charset_encoding)
+
+        async def cards():
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                body_hash.update(chunk)
+                body["size"] += len(chunk)
+                for html in stream.feed(chunk):
+                    yield html
+                if stream.done:
+                    return
+            body["complete"] = True
+            for html in stream.close():
+                yield html
+
+        async with aclosing(cards()) as card_iter:
+            async for card_html in card_iter:
+                if first_card_ms is None:
+                    first_card_ms = round((time.perf_counter() - started) * 1000, 1)
+
+                for job in parse(card_html):
+                    if job.get(key) in recent:
+                        seen_run += 1
+                    else:
+                        seen_run = 0
+                        jobs.append(job)
+                if seen_run >= SEEN_STOP_AFTER:
+                    stop_reason = "stopped_at_seen"
+                    break
+
+        if stop_reason == "read_to_end" and stream.done:
+            stop_reason = "stopped_at_container"
+
+        stats[stop_reason] += 1
+        stats["bytes_read"] += response.num_bytes_downloaded
+        FETCH_BYTES.labels(platform).inc(response.num_bytes_downloaded)
+        stats["first_card_ms"] = first_card_ms
+
+    # a page we stopped reading early has no usable hash; its size (what a
+    # later 304 saves) comes from Content-Length when the server sent one
+    if body["complete"]:
+        save_validators = client.validator_commit(url, response, body_hash.digest(), body["size"])
+    else:
+        size = int(response.headers.get("Content-Length") or body["size"])
+        save_validators = client.validator_commit(url, response, None, size)
+    keys = [job.get(key) for job in jobs]
+
+    async def commit():
+        # oldest first so the newest keys survive trimming
+        for k in reversed(keys):
+            recent.add(k)
+        await save_validators()
+
+    return jobs, commit
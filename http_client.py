@@ -0,0 +1,472 @@
+﻿import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import (
+    FETCH_BYTES, HTTP_BREAKER_STATE, HTTP_BREAKER_TRIPS, HTTP_BYTES_SAVED, HTTP_CONNECTIONS_OPENED,
+    HTTP_REJECTED, HTTP_REQUESTS, HTTP_TLS_HANDSHAKES, HTTP_VALIDATION,
+)
+from rate_limit import TokenBucket
+
+log = logging.getLogger("http_client")
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "12"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "0") == "1"
+HTTP_VALIDATION_CACHE_SIZE = int(os.getenv("HTTP_VALIDATION_CACHE_SIZE", "2000"))
+# per-host politeness: request rate (req/s, 0 = unlimited) and burst
+HTTP_HOST_RATE = float(os.getenv("HTTP_HOST_RATE", "2"))
+HTTP_HOST_BURST = float(os.getenv("HTTP_HOST_BURST", "5"))
+# circuit breaker: consecutive failures before opening, first and longest open period
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+HTTP_BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", "60"))
+HTTP_BREAKER_MAX_COOLDOWN = float(os.getenv("HTTP_BREAKER_MAX_COOLDOWN", "900"))
+
+# answers that mean "back off" rather than "try again"
+THROTTLED = (403, 429)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HostUnavailable(Exception):
+    """Raised without touching the network while a host's circuit breaker is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host}, next probe in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def _retry_after(response) -> float:
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else 0.0
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: closed -> open -> half-open.
+
+    Opens after `failures` consecutive errors / 5xx, or straight away on a
+    403 or 429 (the site is throttling or banning us). While open every
+    request is refused locally. After the cooldown one probe goes through:
+    success closes the breaker, failure reopens it with the cooldown
+    doubled (up to `max_cooldown`). A Retry-After header longer than the
+    cooldown wins.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    GAUGE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, host: str, failures: int = HTTP_BREAKER_FAILURES,
+                 cooldown: float = HTTP_BREAKER_COOLDOWN, max_cooldown: float = HTTP_BREAKER_MAX_COOLDOWN):
+        self.host = host
+        self.failures = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._set_state(self.CLOSED)
+        self.consecutive = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self._probing = False
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0}
+        self.last_reason = None
+
+    def _set_state(self, state: str):
+        self.state = state
+        HTTP_BREAKER_STATE.labels(self.host).set(self.GAUGE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Raises HostUnavailable unless a request may go out now; True when it is the half-open probe."""
+        if self.state == self.CLOSED:
+            return False
+        now = time.monotonic()
+        if self.state == self.OPEN and now >= self.open_until:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            self.stats["probes"] += 1
+            log.info(f"[{self.host}] circuit half-open, sending probe")
+            return True
+        self.stats["rejected"] += 1
+        HTTP_REJECTED.labels(self.host).inc()
+        raise HostUnavailable(self.host, max(0.0, self.open_until - now))
+
+    def abandon_probe(self):
+        """The probe ended without an outcome (cancelled); let the next request probe instead."""
+        if self._probing:
+            self._probing = False
+            log.info(f"[{self.host}] probe abandoned, next request probes again")
+
+    def success(self):
+        if self.state != self.CLOSED:
+            log.info(f"[{self.host}] circuit closed")
+        self._set_state(self.CLOSED)
+        self.consecutive = 0
+        self.cooldown = self.base_cooldown
+        self._probing = False
+
+    def failure(self, reason: str, retry_after: float = 0.0):
+        self.consecutive += 1
+        probe_failed = self.state == self.HALF_OPEN
+        self._probing = False
+        if probe_failed or reason in ("403", "429") or self.consecutive >= self.failures:
+            self._open(reason, retry_after, longer=probe_failed)
+
+    def _open(self, reason: str, retry_after: float, longer: bool):
+        if longer:
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        wait = max(self.cooldown, min(retry_after, self.max_cooldown))
+        self._set_state(self.OPEN)
+        self.open_until = time.monotonic() + wait
+        self.last_reason = reason
+        self.stats["opened"] += 1
+        HTTP_BREAKER_TRIPS.labels(self.host, reason).inc()
+        log.warning(f"[{self.host}] circuit open for {wait:.0f}s after {reason} "
+                    f"({self.consecutive} consecutive failures)")
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        s["state"] = self.state
+        s["consecutive_failures"] = self.consecutive
+        s["last_reason"] = self.last_reason
+        if self.state == self.OPEN:
+            s["open_for"] = round(max(0.0, self.open_until - time.monotonic()), 1)
+        return s
+
+
+class HostPolicy:
+    """Everything that throttles requests to one host: rate, in-flight cap and breaker."""
+
+    def __init__(self, host: str, max_in_flight: int, rate: float = HTTP_HOST_RATE, burst: float = HTTP_HOST_BURST):
+        self.host = host
+        self.sem = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.breaker = CircuitBreaker(host)
+
+    async def acquire(self) -> bool:
+        """
+        Waits for a rate token and a free slot; raises HostUnavailable while
+        the breaker is open. Returns True when this request is the probe.
+        """
+        probe = self.breaker.allow()
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            await self.sem.acquire()
+        except BaseException:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+        return probe
+
+    def release(self, probe: bool = False, recorded: bool = True):
+        """Frees the slot. A probe that never recorded an outcome must not keep the breaker waiting for it."""
+        self.sem.release()
+        if probe and not recorded:
+            self.breaker.abandon_probe()
+
+    def record(self, response=None, error: Exception = None):
+        if error is not None:
+            self.breaker.failure(type(error).__name__)
+        elif response.status_code in THROTTLED:
+            self.breaker.failure(str(response.status_code), _retry_after(response))
+        elif response.status_code >= 500:
+            self.breaker.failure(str(response.status_code))
+        else:
+            self.breaker.success()
+
+
+class HttpClient:
+    """
+    Long-lived pooled client shared by all platform_* fetchers.
+
+    Keeps connections alive between cycles, applies a HostPolicy per host
+    (request rate, concurrent requests, circuit breaker), asks for
+    compressed bodies and counts how many requests had to open a new
+    TCP/TLS connection, so reuse can be measured.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_per_host: int = HTTP_MAX_PER_HOST, http2: bool = HTTP_HTTP2, transport=None):
+        if http2 and not _http2_available():
+            log.warning("HTTP_HTTP2=1 but the 'h2' package is not installed — using HTTP/1.1")
+            http2 = False
+
+        self.max_per_host = max_per_host
+        self._policies = {}
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers={"Accept-Encoding": "gzip, deflate"},
+            http2=http2,
+            transport=transport,
+        )
+
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "tls_handshakes": 0,
+            "bytes_downloaded": 0,
+        }
+        self.host_stats = {}
+
+        # url -> {"etag", "last_modified", "body_hash", "size"}
+        self._validators = OrderedDict()
+        self.cache_stats = {}
+
+    def policy(self, host: str) -> HostPolicy:
+        policy = self._policies.get(host)
+        if policy is None:
+            policy = self._policies[host] = HostPolicy(host, self.max_per_host)
+        return policy
+
+    def _host_entry(self, host: str) -> dict:
+        entry = self.host_stats.get(host)
+        if entry is None:
+            entry = self.host_stats[host] = {"requests": 0, "connections_opened": 0, "bytes_downloaded": 0}
+        return entry
+
+    def _extensions(self, host: str, entry: dict, extensions=None) -> dict:
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                self.stats["connections_opened"] += 1
+                entry["connections_opened"] += 1
+                HTTP_CONNECTIONS_OPENED.labels(host).inc()
+            elif event_name == "connection.start_tls.complete":
+                self.stats["tls_handshakes"] += 1
+                HTTP_TLS_HANDSHAKES.labels(host).inc()
+
+        extensions = dict(extensions or {})
+        extensions["trace"] = trace
+        return extensions
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = urlsplit(url).hostname or ""
+        entry = self._host_entry(host)
+        extensions = self._extensions(host, entry, kwargs.pop("extensions", None))
+
+        policy = self.policy(host)
+        probe = await policy.acquire()
+        recorded = False
+        try:
+            self.stats["requests"] += 1
+            entry["requests"] += 1
+            HTTP_REQUESTS.labels(host).inc()
+            try:
+                response = await self._client.request(method, url, extensions=extensions, **kwargs)
+            except Exception as e:
+                self.stats["errors"] += 1
+                policy.record(error=e)
+                recorded = True
+                raise
+            policy.record(response)
+            recorded = True
+        finally:
+            policy.release(probe, recorded)
+
+        self.stats["bytes_downloaded"] += response.num_bytes_downloaded
+        entry["bytes_downloaded"] += response.num_bytes_downloaded
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url: str, platform: str = None, **kwargs):
+        """
+        Streaming conditional GET (`async with client.stream(url) as response`).
+        Leaving the block before the body is read closes the connection, which
+        is how streaming parsers stop a download early. A 304 means unchanged.
+        Validators are not stored here: the caller commits them with
+        validator_commit() once it has processed the body.
+        """
+        host = urlsplit(url).hostname or ""
+        entry = self._host_entry(host)
+        extensions = self._extensions(host, entry, kwargs.pop("extensions", None))
+        cached = self._validators.get(url)
+        headers = self.conditional_headers(url, kwargs.pop("headers", None))
+        cstats = self._cache_entry(platform or host)
+
+        policy = self.policy(host)
+        probe = await policy.acquire()
+        recorded = False
+        try:
+            self.stats["requests"] += 1
+            entry["requests"] += 1
+            HTTP_REQUESTS.labels(host).inc()
+            try:
+                async with self._client.stream("GET", url, headers=headers, extensions=extensions, **kwargs) as response:
+                    policy.record(response)
+                    recorded = True
+                    cstats["requests"] += 1
+                    if response.status_code == 304 and cached:
+                        self._count_validation(platform or host, cstats, "not_modified", cached.get("size", 0))
+                    elif response.status_code == 200:
+                        self._count_validation(platform or host, cstats, "changed")
+                    try:
+                        yield response
+                    finally:
+                        self.stats["bytes_downloaded"] += response.num_bytes_downloaded
+                        entry["bytes_downloaded"] += response.num_bytes_downloaded
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                # status errors were already recorded from the response itself
+                if not isinstance(e, httpx.HTTPStatusError):
+                    policy.record(error=e)
+                    recorded = True
+                raise
+        finally:
+            policy.release(probe, recorded)
+
+    # ----------------------------------------------------------
+    # VALIDATION CACHE
+    # ----------------------------------------------------------
+    def _cache_entry(self, key: str) -> dict:
+        cstats = self.cache_stats.get(key)
+        if cstats is None:
+            cstats = self.cache_stats[key] = {
+                "requests": 0, "not_modified": 0, "same_body": 0, "changed": 0, "bytes_saved": 0,
+            }
+        return cstats
+
+    def _count_validation(self, key: str, cstats: dict, result: str, bytes_saved: int = 0):
+        cstats[result] += 1
+        HTTP_VALIDATION.labels(key, result).inc()
+        if bytes_saved:
+            cstats["bytes_saved"] += bytes_saved
+            HTTP_BYTES_SAVED.labels(key).inc(bytes_saved)
+
+    def conditional_headers(self, url: str, headers=None) -> dict:
+        headers = dict(headers or {})
+        cached = self._validators.get(url)
+        if cached:
+            self._validators.move_to_end(url)
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def remember_validators(self, url: str, response: httpx.Response, body_hash, size: int):
+        self._validators[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body_hash": body_hash,
+            "size": size,
+        }
+        self._validators.move_to_end(url)
+        while len(self._validators) > HTTP_VALIDATION_CACHE_SIZE:
+            self._validators.popitem(last=False)
+
+    def validator_commit(self, url: str, response: httpx.Response, body_hash, size: int):
+        """
+        Returns an async callable that stores this response's validators.
+        Fetchers hand it back as the `commit` of a (jobs, commit) result, so
+        a page only counts as seen once its jobs were processed.
+        """
+        async def commit():
+            self.remember_validators(url, response, body_hash, size)
+        return commit
+
+    async def get_if_changed(self, url: str, platform: str = None, **kwargs):
+        """
+        Conditional GET. Sends If-None-Match / If-Modified-Since from the
+        previous response for this URL and returns (response, changed, commit).
+        `changed` is False on 304 or when the body hash equals the last one,
+        in which case callers can skip parsing entirely. The validators are
+        not stored until commit() is awaited (None when there is nothing to
+        store); a caller that fails before that gets the page again.
+        """
+        key = platform or urlsplit(url).hostname or ""
+        cstats = self._cache_entry(key)
+
+        cached = self._validators.get(url)
+        headers = self.conditional_headers(url, kwargs.pop("headers", None))
+
+        response = await self.get(url, headers=headers, **kwargs)
+        cstats["requests"] += 1
+        FETCH_BYTES.labels(key).inc(response.num_bytes_downloaded)
+
+        if response.status_code == 304 and cached:
+            self._count_validation(key, cstats, "not_modified", cached.get("size", 0))
+            return response, False, None
+
+        if response.status_code != 200:
+            return response, True, None
+
+        body_hash = hashlib.blake2b(response.content, digest_size=16).digest()
+        same = cached is not None and cached.get("body_hash") == body_hash
+        commit = self.validator_commit(url, response, body_hash, len(response.content))
+
+        if same:
+            self._count_validation(key, cstats, "same_body")
+            return response, False, commit
+
+        self._count_validation(key, cstats, "changed")
+        return response, True, commit
+
+    def get_cache_stats(self) -> dict:
+        out = {}
+        for key, c in self.cache_stats.items():
+            entry = dict(c)
+            hits = c["not_modified"] + c["same_body"]
+            entry["hit_rate"] = round(hits / c["requests"], 3) if c["requests"] else 0.0
+            out[key] = entry
+        return out
+
+    def get_breaker_stats(self) -> dict:
+        return {host: policy.breaker.get_stats() for host, policy in self._policies.items()}
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        reqs = s["requests"] or 1
+        s["connection_reuse_ratio"] = round(1 - s["connections_opened"] / reqs, 3)
+        s["hosts"] = {h: dict(v) for h, v in self.host_stats.items()}
+        for host, policy in self._policies.items():
+            s["hosts"].setdefault(host, {})["breaker"] = policy.breaker.get_stats()
+        s["validation_cache"] = self.get_cache_stats()
+        return s
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client = None
+
+
+def get_http_client() -> HttpClient:
+    """Shared client for the current process (create and use it on one event loop)."""
+    global _client
+    if _client is None:
+        _client = HttpClient()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        log.info(f"HTTP client stats: {_client.get_stats()}")
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,114 @@
+﻿import logging
+from collections import deque
+
+log = logging.getLogger("keyword_matcher")
+
+
+def normalize_keyword(kw: str) -> str:
+    return (kw or "").strip().lower()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the distinct normalized keywords of all users.
+
+    One pass over a job's text returns every subscribed user together with
+    all of the keywords that matched for them (substring semantics, same as
+    the old `k.lower() in fulltext` loop).
+    """
+
+    def __init__(self, user_keywords: dict):
+        # pattern index -> normalized keyword
+        self.patterns = []
+        # pattern index -> {user_id: original keyword}
+        self.subscribers = []
+
+        # automaton: goto transitions, failure links, outputs per state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        index = {}
+        for user_id, kws in user_keywords.items():
+            for kw in kws:
+                norm = normalize_keyword(kw)
+                if not norm:
+                    continue
+                pid = index.get(norm)
+                if pid is None:
+                    pid = len(self.patterns)
+                    index[norm] = pid
+                    self.patterns.append(norm)
+                    self.subscribers.append({})
+                    self._add_pattern(norm, pid)
+                self.subscribers[pid].setdefault(user_id, kw)
+
+        self._build_links()
+        log.info(
+            f"Matcher built: {len(self.patterns)} distinct keywords, "
+            f"{len(user_keywords)} users, {len(self._goto)} states"
+        )
+
+    @classmethod
+    def from_db(cls):
+        # imported here so the matcher itself stays usable without a DB
+        from db_keywords import get_all_user_keywords
+        return cls(get_all_user_keywords())
+
+    # ----------------------------------------------------------
+    # BUILD
+    # ----------------------------------------------------------
+    def _add_pattern(self, pattern: str, pid: int):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pid)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                link = self._goto[f].get(ch, 0)
+                self._fail[nxt] = link if link != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # ----------------------------------------------------------
+    # MATCH
+    # ----------------------------------------------------------
+    def find_patterns(self, text: str):
+        """Returns the set of pattern indices that occur in text."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        found = set()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def match(self, text: str) -> dict:
+        """Returns {user_id: [matched keywords]} for one job text."""
+        hits = {}
+        for pid in sorted(self.find_patterns(text)):
+            for user_id, kw in self.subscribers[pid].items():
+                hits.setdefault(user_id, []).append(kw)
+        return hits
+
+
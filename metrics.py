@@ -0,0 +1,315 @@
+﻿import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("metrics")
+
+# Processes other than the web server (workers) publish snapshots here and
+# /metrics merges them; stale files belong to processes that are gone.
+METRICS_DIR = os.getenv("METRICS_DIR", "/tmp/freelancer-bot-metrics")
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", "10"))
+METRICS_STALE_SECONDS = float(os.getenv("METRICS_STALE_SECONDS", "300"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def snapshot(self):
+        return {"|".join(k): c.value for k, c in self._children.items()}
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def snapshot(self):
+        return {"|".join(k): c.value for k, c in self._children.items()}
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def snapshot(self):
+        return {"|".join(k): {"counts": list(c.counts), "sum": c.sum} for k, c in self._children.items()}
+
+
+# ----------------------------------------------------------
+# REGISTRY
+# ----------------------------------------------------------
+_registry = {}
+
+
+def _register(metric):
+    existing = _registry.get(metric.name)
+    if existing is not None:
+        return existing
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help: str, labelnames=()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames=()) -> Gauge:
+    return _register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def snapshot() -> dict:
+    return {
+        name: {"kind": m.kind, "help": m.help, "labels": list(m.labelnames),
+               "buckets": list(getattr(m, "buckets", ())), "values": m.snapshot()}
+        for name, m in _registry.items()
+    }
+
+
+# ----------------------------------------------------------
+# CROSS-PROCESS PUBLISHING
+# ----------------------------------------------------------
+def _snapshot_path(process: str, pid: int = None) -> str:
+    return os.path.join(METRICS_DIR, f"{process}-{pid or os.getpid()}.json")
+
+
+def publish(process: str):
+    """Writes this process' metrics where the web server's /metrics picks them up."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(process)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def start_publisher(process: str, interval: float = METRICS_PUBLISH_SECONDS):
+    """Publishes a snapshot every `interval` seconds from a daemon thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                publish(process)
+            except Exception as e:
+                log.warning(f"Metrics publish failed: {e}")
+
+    threading.Thread(target=run, name="metrics-publisher", daemon=True).start()
+
+
+def _published_snapshots():
+    try:
+        names = os.listdir(METRICS_DIR)
+    except FileNotFoundError:
+        return []
+
+    own = f"-{os.getpid()}.json"
+    now = time.time()
+    out = []
+    for name in names:
+        if not name.endswith(".json") or name.endswith(own):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > METRICS_STALE_SECONDS:
+                continue
+            with open(path) as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def _merge(into: dict, snap: dict):
+    for name, m in snap.items():
+        target = into.setdefault(name, {**m, "values": {}})
+        if target["kind"] != m["kind"] or target["buckets"] != m["buckets"]:
+            continue
+        for key, value in m["values"].items():
+            if m["kind"] == "counter":
+                target["values"][key] = target["values"].get(key, 0.0) + value
+            elif m["kind"] == "gauge":
+                # one process owns each labelled gauge in practice; max keeps the worst state
+                target["values"][key] = max(target["values"].get(key, value), value)
+            else:
+                cur = target["values"].setdefault(key, {"counts": [0] * len(value["counts"]), "sum": 0.0})
+                cur["counts"] = [a + b for a, b in zip(cur["counts"], value["counts"])]
+                cur["sum"] += value["sum"]
+
+
+# ----------------------------------------------------------
+# EXPOSITION
+# ----------------------------------------------------------
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _labels(names, key: str, extra=()):
+    values = key.split("|") if names else []
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    esc = lambda s: s.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """Prometheus text format (0.0.4) of this process plus published worker snapshots."""
+    merged = {}
+    _merge(merged, snapshot())
+    for snap in _published_snapshots():
+        _merge(merged, snap)
+
+    lines = []
+    for name in sorted(merged):
+        m = merged[name]
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        names = m["labels"]
+        for key in sorted(m["values"]):
+            value = m["values"][key]
+            if m["kind"] in ("counter", "gauge"):
+                lines.append(f"{name}{_labels(names, key)} {_fmt(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(m["buckets"]) + [float("inf")], value["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, key, [('le', _fmt(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_fmt(value['sum'])}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------
+# METRICS
+# ----------------------------------------------------------
+FETCH_SECONDS = histogram("fetch_seconds", "Platform fetch latency (download + parse)", ["platform"])
+FETCH_BYTES = counter("fetch_bytes_total", "Bytes downloaded per platform", ["platform"])
+PARSE_SECONDS = histogram("parse_seconds", "Listing parse time", ["platform"])
+JOBS_PARSED = counter("jobs_parsed_total", "Jobs returned by fetchers", ["platform"])
+MATCHES = counter("matches_total", "(user, job) keyword matches", ["platform"])
+DEDUP_HITS = counter("dedup_hits_total", "Jobs or deliveries dropped as duplicates", ["platform", "kind"])
+HTTP_REQUESTS = counter("http_requests_total", "Fetch requests per host", ["host"])
+HTTP_CONNECTIONS_OPENED = counter("http_connections_opened_total", "New TCP connections per host (the rest reused one)", ["host"])
+HTTP_TLS_HANDSHAKES = counter("http_tls_handshakes_total", "TLS handshakes per host", ["host"])
+HTTP_VALIDATION = counter("http_validation_total", "Conditional fetches by outcome (not_modified, same_body, changed)", ["platform", "result"])
+HTTP_BYTES_SAVED = counter("http_validation_bytes_saved_total", "Body bytes a 304 saved us downloading", ["platform"])
+HTTP_REJECTED = counter("http_rejected_total", "Requests refused by an open per-host circuit breaker", ["host"])
+HTTP_BREAKER_TRIPS = counter("http_breaker_trips_total", "Per-host circuit breaker openings", ["host", "reason"])
+HTTP_BREAKER_STATE = gauge("http_breaker_state", "Per-host circuit breaker state (0 closed, 1 half-open, 2 open)", ["host"])
+
+TELEGRAM_SENDS = counter("telegram_sends_total", "Telegram sendMessage outcomes", ["result"])
+
+WEBHOOK_SECONDS = histogram("webhook_seconds", "Webhook request handling time", ["status"])
+UPDATE_SECONDS = histogram("update_process_seconds", "Time to process one Telegram update")
+
+DB_QUERY_SECONDS = histogram("db_query_seconds", "DB round-trip latency by call site", ["site"])
+FEED_ACKS = counter("feed_acks_total", "Send outcomes written to feed_event", ["outcome"])
+EVENT_WRITER_PENDING = gauge("event_writer_pending", "Send outcomes buffered, not yet written")
+USER_CACHE_EVENTS = counter("user_cache_events_total", "User cache hits, misses, evictions and invalidations", ["cache", "event"])
+USER_CACHE_ENTRIES = gauge("user_cache_entries", "Entries held in a user cache", ["cache"])
+
+
+def db_timer(site: str):
+    """`with db_timer("get_user"): ...` records one DB round-trip."""
+    return DB_QUERY_SECONDS.labels(site).time()
@@ -0,0 +1,177 @@
+﻿import hashlib
+import logging
+import operator
+import os
+import re
+import struct
+import time
+from collections import deque
+
+log = logging.getLogger("near_duplicates")
+
+NEAR_DUP_WINDOW = float(os.getenv("NEAR_DUP_WINDOW", str(48 * 3600)))
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.75"))
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "64"))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))
+NEAR_DUP_INDEX_SIZE = int(os.getenv("NEAR_DUP_INDEX_SIZE", "50000"))
+# below this many distinct words a posting is too short to compare reliably
+NEAR_DUP_MIN_FEATURES = int(os.getenv("NEAR_DUP_MIN_FEATURES", "8"))
+# characters of description that go into the signature
+NEAR_DUP_TEXT_CHARS = int(os.getenv("NEAR_DUP_TEXT_CHARS", "1500"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def features(text: str):
+    """Distinct lowercased words (Greek included)."""
+    return set(_TOKEN.findall(text.lower()))
+
+
+def job_text(job: dict) -> str:
+    return (job.get("title") or "") + " " + (job.get("description") or "")[:NEAR_DUP_TEXT_CHARS]
+
+
+class MinHasher:
+    """MinHash signatures: the fraction of equal slots estimates Jaccard similarity."""
+
+    def __init__(self, permutations: int = NEAR_DUP_PERMUTATIONS, min_features: int = NEAR_DUP_MIN_FEATURES):
+        self.permutations = permutations
+        self.min_features = min_features
+        self._unpack = struct.Struct(f"<{permutations}I").unpack
+
+    def signature(self, text: str):
+        """Tuple of per-slot minima, or None if the text has too few words."""
+        words = features(text)
+        if len(words) < self.min_features:
+            return None
+        # one XOF digest per word gives all k independent 32-bit hashes at
+        # once; zip/min then takes the per-slot minimum without a Python loop
+        size = self.permutations * 4
+        rows = [self._unpack(hashlib.shake_128(w.encode("utf-8")).digest(size)) for w in words]
+        return tuple(map(min, zip(*rows)))
+
+    @staticmethod
+    def similarity(sig_a, sig_b) -> float:
+        return sum(map(operator.eq, sig_a, sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    Sliding-window MinHash/LSH index for cross-platform duplicate postings.
+
+    Signatures are cut into `bands`; a lookup only compares against jobs
+    sharing at least one band, and a candidate counts as a duplicate when
+    its estimated Jaccard similarity is >= threshold. Entries older than
+    `window` seconds, or beyond `maxsize`, are evicted.
+    """
+
+    def __init__(self, window: float = NEAR_DUP_WINDOW, threshold: float = NEAR_DUP_THRESHOLD,
+                 bands: int = NEAR_DUP_BANDS, maxsize: int = NEAR_DUP_INDEX_SIZE, hasher: MinHasher = None):
+        self.window = window
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.hasher = hasher or MinHasher()
+
+        perms = self.hasher.permutations
+        if perms % bands:
+            raise ValueError(f"{perms} permutations can't be split into {bands} bands")
+        self.bands = bands
+        self._rows = perms // bands
+
+        # (band no, band slice) -> {key: signature}
+        self._buckets = {}
+        # key -> (signature, added at); _order holds keys oldest first
+        self._entries = {}
+        self._order = deque()
+
+        self.stats = {"checked": 0, "duplicates": 0, "unsigned": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, sig):
+        r = self._rows
+        return [(i, sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def _evict(self, now: float):
+        while self._order and (
+            len(self._entries) > self.maxsize or now - self._order[0][1] > self.window
+        ):
+            key, added = self._order.popleft()
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            for band in self._band_keys(entry[0]):
+                bucket = self._buckets.get(band)
+                if bucket is not None:
+                    bucket.pop(key, None)
+                    if not bucket:
+                        del self._buckets[band]
+            self.stats["evicted"] += 1
+
+    def find(self, sig, exclude=None):
+        """Key of the most similar indexed job at or above the threshold, or None."""
+        best, best_sim = None, self.threshold
+        seen = set()
+        for band in self._band_keys(sig):
+            for key, other in self._buckets.get(band, {}).items():
+                if key == exclude or key in seen:
+                    continue
+                seen.add(key)
+                sim = MinHasher.similarity(sig, other)
+                if sim >= best_sim:
+                    best, best_sim = key, sim
+        return best
+
+    def add(self, key, sig, now: float = None):
+        now = time.monotonic() if now is None else now
+        if key in self._entries:
+            return
+        self._entries[key] = (sig, now)
+        self._order.append((key, now))
+        for band in self._band_keys(sig):
+            self._buckets.setdefault(band, {})[key] = sig
+        self._evict(now)
+
+    def check(self, key, text: str, now: float = None):
+        """
+        Returns the key of the earlier job `text` duplicates, or None after
+        indexing it as a new original. An already indexed key is never a
+        duplicate of itself (re-scrapes are handled by feed_event).
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        self.stats["checked"] += 1
+
+        if key in self._entries:
+            return None
+
+        sig = self.hasher.signature(text)
+        if sig is None:
+            self.stats["unsigned"] += 1
+            return None
+
+        original = self.find(sig, exclude=key)
+        if original is not None:
+            self.stats["duplicates"] += 1
+            return original
+
+        self.add(key, sig, now)
+        return None
+
+    def filter_jobs(self, platform: str, jobs, key_for):
+        """Drops jobs that duplicate an earlier posting on any platform. Returns the rest."""
+        unique = []
+        for job in jobs:
+            original = self.check((platform, key_for(job)), job_text(job))
+            if original is None:
+                unique.append(job)
+            else:
+                log.debug(f"[{platform}] {key_for(job)} duplicates {original[0]}:{original[1]}")
+        return unique
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        s["size"] = len(self._entries)
+        s["buckets"] = len(self._buckets)
+        return s
@@ -1,12 +1,18 @@
 ﻿import logging
-import httpx
 from datetime import datetime, timezone, timedelta
-from bs4 import BeautifulSoup
+
+from html_parser import CardParser
+from html_stream import stream_jobs, streaming_enabled
+from metrics import PARSE_SECONDS
+from tracing import trace_stage
+from http_client import get_http_client
 
 logger = logging.getLogger("platform.careerjet")
 
 BASE_URL = "https://www.careerjet.com/search/jobs?s={query}"
 
+CARD_PARSER = CardParser(".job", {"link": "a.title", "desc": ".desc", "date": ".date"})
+
 
 def parse_relative_date(text: str) -> datetime:
     """Converts '2 days ago', '5 hours ago' â†’ datetime."""
@@ -34,9 +40,49 @@ def parse_relative_date(text: str) -> datetime:
         return now
 
 
-async def fetch_careerjet_jobs(keywords: list[str]):
+def parse_careerjet_jobs(html: str, parser: CardParser = CARD_PARSER):
+    jobs = []
+
+    for card in parser.cards(html):
+        a = parser.first(card, "link")
+        if not a:
+            continue
+
+        job_url = a.get("href")
+        if not job_url:
+            continue
+
+        if job_url.startswith("/"):
+            job_url = "https://www.careerjet.com" + job_url
+
+        title = a.get_text(strip=True)
+
+        description = parser.text(card, "desc")
+
+        date_el = parser.first(card, "date")
+        if date_el:
+            posted_at = parse_relative_date(date_el.get_text(strip=True))
+        else:
+            posted_at = datetime.now(tz=timezone.utc)
+
+        jobs.append(
+            {
+                "platform": "careerjet",
+                "title": title,
+                "description": description,
+                "budget_amount": None,
+                "budget_currency": None,
+                "posted_at": posted_at,
+                "url": job_url,
+            }
+        )
+
+    return jobs
+
+
+async def fetch_careerjet_jobs(keywords: list[str], client=None):
     """
-    Scrapes CareerJet.
+    Scrapes CareerJet. Returns (jobs, commit).
 
     Normalized output structure:
     {
@@ -53,55 +99,19 @@ async def fetch_careerjet_jobs(keywords: list[str]):
     query = "+".join(keywords) if keywords else ""
     url = BASE_URL.format(query=query)
 
-    try:
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.get(url)
-            r.raise_for_status()
-
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        jobs = []
-
-        for card in soup.select(".job"):
-            a = card.select_one("a.title")
-            if not a:
-                continue
-
-            job_url = a.get("href")
-            if not job_url:
-                continue
-
-            if job_url.startswith("/"):
-                job_url = "https://www.careerjet.com" + job_url
-
-            title = a.get_text(strip=True)
-
-            desc_el = card.select_one(".desc")
-            description = desc_el.get_text(strip=True) if desc_el else ""
-
-            date_el = card.select_one(".date")
-            if date_el:
-                posted_at = parse_relative_date(date_el.get_text(strip=True))
-            else:
-                posted_at = datetime.now(tz=timezone.utc)
-
-            jobs.append(
-                {
-                    "platform": "careerjet",
-                    "title": title,
-                    "description": description,
-                    "budget_amount": None,
-                    "budget_currency": None,
-                    "posted_at": posted_at,
-                    "url": job_url,
-                }
-            )
-
-        return jobs
-
-    except Exception as e:
-        logger.error(f"CareerJet error: {e}")
-        return []
+    client = client or get_http_client()
+    if streaming_enabled():
+        return await stream_jobs(client, url, "careerjet", parse_careerjet_jobs, CARD_PARSER.card_selector)
+
+    r, changed, commit = await client.get_if_changed(url, platform="careerjet")
+    if not changed:
+        # same listing as last cycle: nothing new to parse
+        return [], commit
+    r.raise_for_status()
+
+    with PARSE_SECONDS.labels("careerjet").time(), trace_stage("parse"):
+        return parse_careerjet_jobs(r.text), commit
+
 
 
 
@@ -1,7 +1,11 @@
-﻿import logging
-import httpx
+﻿import asyncio
+import logging
+import os
 from datetime import datetime, timezone
 
+from http_client import get_http_client
+from metrics import FETCH_BYTES
+
 logger = logging.getLogger("worker.freelancer")
 
 API_URL = (
@@ -10,15 +14,148 @@ API_URL = (
     "&sort_direction=desc&query={query}"
 )
 
+# Incremental mode: newest-first pages of the compact project object
+# (title, preview_description, budget, currency, seo_url, time_submitted).
+ACTIVE_URL = "https://www.freelancer.com/api/projects/0.1/projects/active/"
+PAGE_SIZE = int(os.getenv("FREELANCER_PAGE_SIZE", "50"))
+MAX_PAGES = int(os.getenv("FREELANCER_MAX_PAGES", "5"))
+WATERMARK_KEY = "watermark"
+
+
+def normalize_project(p: dict) -> dict:
+    budget_amount = None
+    budget_currency = None
+
+    if "budget" in p and p["budget"]:
+        budget_amount = p["budget"].get("minimum")
+        budget_currency = p["currency"]["code"] if p.get("currency") else None
+
+    posted_at = datetime.fromtimestamp(
+        p.get("time_submitted", 0),
+        tz=timezone.utc
+    )
+
+    return {
+        "platform": "freelancer",
+        "job_id": str(p.get("id")),
+        "title": p.get("title", ""),
+        "description": p.get("preview_description", ""),
+        "budget_amount": budget_amount,
+        "budget_currency": budget_currency,
+        "posted_at": posted_at,
+        "url": f"https://www.freelancer.com/projects/{p.get('seo_url', '')}",
+    }
+
+
+# ----------------------------------------------------------
+# WATERMARK
+# ----------------------------------------------------------
+def load_watermark():
+    """Returns (last time_submitted, ids seen at that second) or (None, set())."""
+    from db_platform_state import get_platform_state
+
+    wm = get_platform_state("freelancer", WATERMARK_KEY) or {}
+    return wm.get("ts"), set(wm.get("ids", []))
+
+
+def save_watermark(ts, ids):
+    from db_platform_state import set_platform_state
+
+    set_platform_state("freelancer", WATERMARK_KEY, {"ts": ts, "ids": sorted(ids)})
+
+
+def split_new_projects(projects, wm_ts, wm_ids):
+    """
+    Splits a newest-first page at the watermark.
+    Returns (new projects, reached) where `reached` means older pages
+    can't contain anything new.
+    """
+    if wm_ts is None:
+        return list(projects), False
+
+    new = []
+    for p in projects:
+        ts = p.get("time_submitted", 0)
+        if ts < wm_ts:
+            return new, True
+        if ts == wm_ts and str(p.get("id")) in wm_ids:
+            continue
+        new.append(p)
+    return new, False
+
+
+def advance_watermark(projects, wm_ts, wm_ids):
+    ts, ids = wm_ts, set(wm_ids)
+    for p in projects:
+        p_ts = p.get("time_submitted", 0)
+        if ts is None or p_ts > ts:
+            ts, ids = p_ts, {str(p.get("id"))}
+        elif p_ts == ts:
+            ids.add(str(p.get("id")))
+    return ts, ids
+
+
+def incremental_params(wm_ts, offset: int) -> dict:
+    params = {
+        "compact": "true",
+        "limit": PAGE_SIZE,
+        "offset": offset,
+        "sort_field": "time_submitted",
+        "sort_direction": "desc",
+    }
+    if wm_ts is not None:
+        params["from_time"] = wm_ts
+    return params
+
+
+async def fetch_freelancer_new_jobs(client=None):
+    """
+    Incremental fetch: pages newest-first from the API until it reaches the
+    persisted watermark. A quiet market costs one small page per cycle; on
+    the very first run only the newest page is taken.
+
+    Returns (jobs, commit). The watermark is not moved here: the caller
+    awaits commit() (which saves it past these jobs) once they have been
+    processed, so a failure in between fetches them again next cycle.
+    commit is None when there is nothing to advance.
+    """
+    client = client or get_http_client()
+    wm_ts, wm_ids = await asyncio.to_thread(load_watermark)
+
+    fresh = []
+    for page in range(MAX_PAGES):
+        response = await client.get(ACTIVE_URL, params=incremental_params(wm_ts, page * PAGE_SIZE))
+        response.raise_for_status()
+        FETCH_BYTES.labels("freelancer").inc(response.num_bytes_downloaded)
+        projects = response.json().get("result", {}).get("projects", [])
+
+        new, reached = split_new_projects(projects, wm_ts, wm_ids)
+        fresh.extend(new)
+
+        if reached or wm_ts is None or len(projects) < PAGE_SIZE:
+            break
+    else:
+        logger.warning(f"Freelancer: watermark not reached after {MAX_PAGES} pages")
+
+    commit = None
+    if fresh:
+        watermark = advance_watermark(fresh, wm_ts, wm_ids)
+
+        async def commit():
+            await asyncio.to_thread(save_watermark, *watermark)
 
-async def fetch_freelancer_jobs(keywords: list[str]):
+    return [normalize_project(p) for p in fresh], commit
+
+
+async def fetch_freelancer_jobs(keywords: list[str], client=None):
     """
     Fetch jobs from Freelancer.com API.
 
-    Returns normalized job list:
+    Returns (normalized job list, commit); see HttpClient.get_if_changed:
     [
         {
             "platform": "freelancer",
+            "job_id": str,
             "title": str,
             "description": str,
             "budget_amount": int|None,
@@ -32,47 +169,21 @@ async def fetch_freelancer_jobs(keywords: list[str]):
         query = ",".join(keywords) if keywords else ""
         url = API_URL.format(query=query)
 
-        async with httpx.AsyncClient(timeout=12) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-        jobs = []
-        for p in data.get("result", {}).get("projects", []):
-            title = p.get("title", "")
-            desc = p.get("preview_description", "")
-
-            budget_amount = None
-            budget_currency = None
-
-            if "budget" in p and p["budget"]:
-                budget_amount = p["budget"].get("minimum")
-                budget_currency = p["currency"]["code"] if p.get("currency") else None
-
-            posted_at = datetime.fromtimestamp(
-                p.get("time_submitted", 0),
-                tz=timezone.utc
-            )
-
-            url = f"https://www.freelancer.com/projects/{p.get('seo_url', '')}"
+        client = client or get_http_client()
+        response, changed, commit = await client.get_if_changed(url, platform="freelancer")
+        if not changed:
+            # same listing as last cycle: nothing new to parse
+            return [], commit
+        response.raise_for_status()
+        data = response.json()
 
-            jobs.append(
-                {
-                    "platform": "freelancer",
-                    "title": title,
-                    "description": desc,
-                    "budget_amount": budget_amount,
-                    "budget_currency": budget_currency,
-                    "posted_at": posted_at,
-                    "url": url,
-                }
-            )
+        jobs = [normalize_project(p) for p in data.get("result", {}).get("projects", [])]
 
-        return jobs
+        return jobs, commit
 
     except Exception as e:
         logger.error(f"Freelancer fetch error: {e}")
-        return []
+        return [], None
 
 
 
@@ -1,16 +1,60 @@
 ﻿import logging
-import httpx
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
+
+from html_parser import CardParser
+from html_stream import stream_jobs, streaming_enabled
+from metrics import PARSE_SECONDS
+from tracing import trace_stage
+from http_client import get_http_client
 
 logger = logging.getLogger("platform.kariera")
 
 BASE_URL = "https://www.kariera.gr/el/jobs?keywords={query}"
 
+CARD_PARSER = CardParser("article", {"link": "a", "desc": "p"})
+
+
+def parse_kariera_jobs(html: str, parser: CardParser = CARD_PARSER):
+    jobs = []
+
+    for el in parser.cards(html):
+        a = parser.first(el, "link")
+        if not a:
+            continue
+
+        job_url = a.get("href")
+        if not job_url:
+            continue
+
+        if job_url.startswith("/"):
+            job_url = "https://www.kariera.gr" + job_url
+
+        title = a.get_text(strip=True)
+
+        # Description snippet
+        description = parser.text(el, "desc")
+
+        # Kariera also rarely gives clean date â†’ fallback now
+        posted_at = datetime.now(tz=timezone.utc)
+
+        jobs.append(
+            {
+                "platform": "kariera",
+                "title": title,
+                "description": description,
+                "budget_amount": None,
+                "budget_currency": None,
+                "posted_at": posted_at,
+                "url": job_url,
+            }
+        )
 
-async def fetch_kariera_jobs(keywords: list[str]):
+    return jobs
+
+
+async def fetch_kariera_jobs(keywords: list[str], client=None):
     """
-    Scrapes Kariera.gr job listings.
+    Scrapes Kariera.gr job listings. Returns (jobs, commit).
 
     Normalized output:
     {
@@ -27,52 +71,19 @@ async def fetch_kariera_jobs(keywords: list[str]):
     query = "+".join(keywords) if keywords else ""
     url = BASE_URL.format(query=query)
 
-    try:
-        async with httpx.AsyncClient(timeout=12) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        jobs = []
-
-        for el in soup.select("article"):
-            a = el.select_one("a")
-            if not a:
-                continue
-
-            job_url = a.get("href")
-            if not job_url:
-                continue
-
-            if job_url.startswith("/"):
-                job_url = "https://www.kariera.gr" + job_url
-
-            title = a.get_text(strip=True)
-
-            # Description snippet
-            desc_el = el.select_one("p")
-            description = desc_el.get_text(strip=True) if desc_el else ""
-
-            # Kariera also rarely gives clean date â†’ fallback now
-            posted_at = datetime.now(tz=timezone.utc)
+    client = client or get_http_client()
+    if streaming_enabled():
+        return await stream_jobs(client, url, "kariera", parse_kariera_jobs, CARD_PARSER.card_selector)
 
-            jobs.append(
-                {
-                    "platform": "kariera",
-                    "title": title,
-                    "description": description,
-                    "budget_amount": None,
-                    "budget_currency": None,
-                    "posted_at": posted_at,
-                    "url": job_url,
-                }
-            )
+    response, changed, commit = await client.get_if_changed(url, platform="kariera")
+    if not changed:
+        # same listing as last cycle: nothing new to parse
+        return [], commit
+    response.raise_for_status()
 
-        return jobs
+    with PARSE_SECONDS.labels("kariera").time(), trace_stage("parse"):
+        return parse_kariera_jobs(response.text), commit
 
-    except Exception as e:
-        logger.error(f"Kariera fetch error: {e}")
-        return []
 
 
 
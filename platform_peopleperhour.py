@@ -1,62 +1,71 @@
 ﻿import logging
-import httpx
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
+
+from html_parser import CardParser
+from html_stream import stream_jobs, streaming_enabled
+from metrics import PARSE_SECONDS
+from tracing import trace_stage
+from http_client import get_http_client
 
 logger = logging.getLogger("worker.pph")
 
 BASE_URL = "https://www.peopleperhour.com/freelance-jobs"
 
+CARD_PARSER = CardParser("section.job", {"title": "h3.job-title", "desc": "p.job-description", "link": "a"})
+
+
+def parse_peopleperhour_jobs(html: str, parser: CardParser = CARD_PARSER):
+    jobs = []
+
+    for card in parser.cards(html):
+        url_el = parser.first(card, "link")
+
+        title = parser.text(card, "title", "No title")
+        desc = parser.text(card, "desc")
+        url = (
+            "https://www.peopleperhour.com"
+            + url_el.get("href", "")
+            if url_el
+            else None
+        )
+
+        # Posted date (PPH does not expose exact timestamp; using current time)
+        posted_at = datetime.now(timezone.utc)
 
-async def fetch_peopleperhour_jobs():
+        jobs.append(
+            {
+                "platform": "peopleperhour",
+                "title": title,
+                "description": desc,
+                "budget_amount": None,
+                "budget_currency": None,
+                "posted_at": posted_at,
+                "url": url,
+            }
+        )
+
+    return jobs
+
+
+async def fetch_peopleperhour_jobs(client=None):
     """
     Scrapes latest PeoplePerHour jobs (HTML).
-    Returns normalized list of dicts.
+    Returns (normalized list of dicts, commit).
     """
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(BASE_URL)
-            response.raise_for_status()
-            html = response.text
-
-        soup = BeautifulSoup(html, "html.parser")
-        job_cards = soup.select("section.job")
-        jobs = []
-
-        for card in job_cards:
-            title_el = card.select_one("h3.job-title")
-            desc_el = card.select_one("p.job-description")
-            url_el = card.select_one("a")
-
-            title = title_el.get_text(strip=True) if title_el else "No title"
-            desc = desc_el.get_text(strip=True) if desc_el else ""
-            url = (
-                "https://www.peopleperhour.com"
-                + url_el.get("href", "")
-                if url_el
-                else None
-            )
-
-            # Posted date (PPH does not expose exact timestamp; using current time)
-            posted_at = datetime.now(timezone.utc)
-
-            jobs.append(
-                {
-                    "platform": "peopleperhour",
-                    "title": title,
-                    "description": desc,
-                    "budget_amount": None,
-                    "budget_currency": None,
-                    "posted_at": posted_at,
-                    "url": url,
-                }
-            )
-
-        return jobs
-
-    except Exception as e:
-        logger.error(f"PPH fetch error: {e}")
-        return []
+    client = client or get_http_client()
+    if streaming_enabled():
+        return await stream_jobs(client, BASE_URL, "peopleperhour", parse_peopleperhour_jobs, CARD_PARSER.card_selector)
+
+    response, changed, commit = await client.get_if_changed(BASE_URL, platform="peopleperhour")
+    if not changed:
+        # same listing as last cycle: nothing new to parse
+        return [], commit
+    response.raise_for_status()
+    html = response.text
+
+    with PARSE_SECONDS.labels("peopleperhour").time(), trace_stage("parse"):
+        return parse_peopleperhour_jobs(html), commit
+
 
 
 
@@ -1,16 +1,69 @@
 ﻿import logging
-import httpx
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
+
+from html_parser import CardParser
+from html_stream import stream_jobs, streaming_enabled
+from metrics import PARSE_SECONDS
+from tracing import trace_stage
+from http_client import get_http_client
 
 logger = logging.getLogger("worker.skywalker")
 
 BASE_URL = "https://www.skywalker.gr/el/el/jobs/search?keywords={query}"
 
+CARD_PARSER = CardParser("article.article-item", {"link": "a", "title": ".article-title", "desc": ".article-desc"})
+
+
+def parse_skywalker_jobs(html: str, parser: CardParser = CARD_PARSER):
+    jobs = []
+
+    for item in parser.cards(html):
+
+        # URL
+        link = parser.first(item, "link")
+        if not link:
+            continue
+
+        href = link.get("href")
+        if not href:
+            continue
+
+        if href.startswith("http"):
+            url = href
+        else:
+            url = "https://www.skywalker.gr" + href
+
+        # Title
+        title = parser.text(item, "title", "Job")
+
+        # Description
+        description = parser.text(item, "desc")
 
-async def fetch_skywalker_jobs(keywords: list[str]):
+        # Skywalker rarely shows post date â€” fallback to NOW
+        posted_at = datetime.now(tz=timezone.utc)
+
+        # No budget info
+        budget_amount = None
+        budget_currency = None
+
+        jobs.append(
+            {
+                "platform": "skywalker",
+                "title": title,
+                "description": description,
+                "budget_amount": budget_amount,
+                "budget_currency": budget_currency,
+                "posted_at": posted_at,
+                "url": url,
+            }
+        )
+
+    return jobs
+
+
+async def fetch_skywalker_jobs(keywords: list[str], client=None):
     """
-    Scrape Skywalker job listings.
+    Scrape Skywalker job listings. Returns (jobs, commit).
     Normalized output:
     {
         "platform": "skywalker",
@@ -26,62 +79,19 @@ async def fetch_skywalker_jobs(keywords: list[str]):
     query = "+".join(keywords) if keywords else ""
     url = BASE_URL.format(query=query)
 
-    try:
-        async with httpx.AsyncClient(timeout=12) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        jobs = []
-
-        for item in soup.select("article.article-item"):
-
-            # URL
-            link = item.select_one("a")
-            if not link:
-                continue
-
-            href = link.get("href")
-            if not href:
-                continue
-
-            if href.startswith("http"):
-                url = href
-            else:
-                url = "https://www.skywalker.gr" + href
-
-            # Title
-            title_el = item.select_one(".article-title")
-            title = title_el.get_text(strip=True) if title_el else "Job"
-
-            # Description
-            desc_el = item.select_one(".article-desc")
-            description = desc_el.get_text(strip=True) if desc_el else ""
-
-            # Skywalker rarely shows post date â€” fallback to NOW
-            posted_at = datetime.now(tz=timezone.utc)
-
-            # No budget info
-            budget_amount = None
-            budget_currency = None
-
-            jobs.append(
-                {
-                    "platform": "skywalker",
-                    "title": title,
-                    "description": description,
-                    "budget_amount": budget_amount,
-                    "budget_currency": budget_currency,
-                    "posted_at": posted_at,
-                    "url": url,
-                }
-            )
-
-        return jobs
-
-    except Exception as e:
-        logger.error(f"Skywalker fetch error: {e}")
-        return []
+    client = client or get_http_client()
+    if streaming_enabled():
+        return await stream_jobs(client, url, "skywalker", parse_skywalker_jobs, CARD_PARSER.card_selector)
+
+    response, changed, commit = await client.get_if_changed(url, platform="skywalker")
+    if not changed:
+        # same listing as last cycle: nothing new to parse
+        return [], commit
+    response.raise_for_status()
+
+    with PARSE_SECONDS.labels("skywalker").time(), trace_stage("parse"):
+        return parse_skywalker_jobs(response.text), commit
+
 
 
 
@@ -0,0 +1,93 @@
+﻿import logging
+import time
+
+from keyword_matcher import normalize_keyword
+
+log = logging.getLogger("query_planner")
+
+
+class TTLCache:
+    """Tiny dict cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, maxsize: int = 5000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if len(self._data) >= self.maxsize:
+            now = time.monotonic()
+            self._data = {k: v for k, v in self._data.items() if v[0] > now}
+            if len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+
+class QueryPlanner:
+    """
+    Plans search-per-keyword scraping for one cycle.
+
+    Collapses every user's keywords to the distinct normalized queries,
+    fetches each query once (through a TTL cache) and routes the results
+    back to all subscribers of that query.
+    """
+
+    def __init__(self, user_keywords: dict):
+        # normalized query -> {user_id: original keyword}
+        self.routes = {}
+        for user_id, kws in user_keywords.items():
+            for kw in kws:
+                q = normalize_keyword(kw)
+                if q:
+                    self.routes.setdefault(q, {}).setdefault(user_id, kw)
+
+    @property
+    def queries(self):
+        return sorted(self.routes)
+
+    def fetch_all(self, fetch, cache: TTLCache = None) -> dict:
+        """Runs fetch(query) once per distinct query. Returns {query: jobs}."""
+        results = {}
+        fetched = 0
+        for q in self.queries:
+            jobs = cache.get(q) if cache else None
+            if jobs is None:
+                jobs = fetch(q) or []
+                fetched += 1
+                if cache:
+                    cache.set(q, jobs)
+            results[q] = jobs
+
+        subs = sum(len(u) for u in self.routes.values())
+        log.info(f"Planner: {subs} user keywords -> {len(self.routes)} queries, {fetched} fetched")
+        return results
+
+    def route(self, results: dict, platform: str) -> dict:
+        """
+        Fans query results out to subscribers.
+        Returns {(user_id, platform, job_id): (job, [matched keywords])}.
+        """
+        candidates = {}
+        for q, jobs in results.items():
+            for job in jobs:
+                jid = str(job["job_id"])
+                for user_id, kw in self.routes.get(q, {}).items():
+                    key = (user_id, platform, jid)
+                    entry = candidates.get(key)
+                    if entry is None:
+                        candidates[key] = (job, [kw])
+                    elif kw not in entry[1]:
+                        entry[1].append(kw)
+        return candidates
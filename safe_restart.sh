@@ -11,18 +11,17 @@ echo "ðŸ‘‰ Detecting running workers..."
 pkill -f worker_freelancer.py || true
 pkill -f worker_pph.py || true
 pkill -f worker_skywalker.py || true
+pkill -f worker_ingest.py || true
 echo "âœ… Workers terminated (if any)."
 
 echo
 echo "ðŸ‘‰ Restarting workers..."
-nohup python3 workers/worker_freelancer.py > logs/worker_freelancer.log 2>&1 &
-nohup python3 workers/worker_pph.py > logs/worker_pph.log 2>&1 &
-nohup python3 workers/worker_skywalker.py > logs/worker_skywalker.log 2>&1 &
+nohup python3 workers/worker_ingest.py > logs/worker_ingest.log 2>&1 &
 echo "âœ… Workers restarted."
 
 echo
 echo "ðŸ‘‰ Checking new worker status..."
-ps aux | grep worker_ | grep -v grep
+ps aux | grep worker_ingest | grep -v grep
 
 echo
 echo "=========================================================="
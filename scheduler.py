@@ -0,0 +1,139 @@
+﻿import logging
+import os
+import random
+import time
+
+from db_platform_state import get_platform_state, set_platform_state
+from html_stream import RecentKeys
+
+log = logging.getLogger("scheduler")
+
+SCHEDULER_ADAPTIVE = os.getenv("SCHEDULER_ADAPTIVE", "1") == "1"
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "20"))
+SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", "1800"))
+# new jobs we are happy to pick up per fetch: fewer means fresher alerts, more means fewer fetches
+SCHEDULER_TARGET_NEW = float(os.getenv("SCHEDULER_TARGET_NEW", "3"))
+# weight kept by older cycles in the arrival-rate estimate, per cycle
+SCHEDULER_DECAY = float(os.getenv("SCHEDULER_DECAY", "0.7"))
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+STATE_KEY = "schedule"
+
+
+def bounds_for(name: str):
+    """(min, max) interval for a platform: INTERVAL_MIN_<NAME> / INTERVAL_MAX_<NAME> or the global ones."""
+    lo = float(os.getenv(f"INTERVAL_MIN_{name.upper()}", str(SCHEDULER_MIN_INTERVAL)))
+    hi = float(os.getenv(f"INTERVAL_MAX_{name.upper()}", str(SCHEDULER_MAX_INTERVAL)))
+    return lo, max(lo, hi)
+
+
+class PlatformSchedule:
+    """
+    Polling interval of one platform, learned from its arrival rate.
+
+    The rate is new jobs over elapsed seconds, both decayed per cycle. The
+    interval is whatever should yield SCHEDULER_TARGET_NEW new jobs per
+    fetch, moved at most 2x per cycle and kept within [min, max]. A page
+    made almost entirely of new jobs means listings were probably missed,
+    so the interval is halved straight away. A cycle without new jobs just
+    decays the estimate, which lengthens the interval step by step.
+    """
+
+    def __init__(self, name: str, interval: float, min_interval: float, max_interval: float,
+                 target_new: float = SCHEDULER_TARGET_NEW, decay: float = SCHEDULER_DECAY,
+                 jitter: float = SCHEDULER_JITTER):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.decay = decay
+        self.jitter = jitter
+        self.interval = self._clamp(interval)
+
+        self.new_jobs = 0.0   # decayed new-job count
+        self.seconds = 0.0    # decayed elapsed time
+        self.cycles = 0
+        self.last_new = None
+        self._seen = RecentKeys(maxsize=2000)
+        self._last_fetch = None
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def rate(self) -> float:
+        """Estimated new jobs per second."""
+        return self.new_jobs / self.seconds if self.seconds else 0.0
+
+    def observe(self, job_ids) -> int:
+        """Feeds one fetch result; returns how many of its jobs were new."""
+        now = time.monotonic()
+        job_ids = list(job_ids)
+        new = sum(1 for jid in job_ids if jid not in self._seen)
+        for jid in reversed(job_ids):
+            self._seen.add(jid)
+
+        elapsed = now - self._last_fetch if self._last_fetch is not None else None
+        self._last_fetch = now
+        self.cycles += 1
+        self.last_new = new
+        # the first fetch of a run only primes the seen set
+        if elapsed is None:
+            return new
+
+        self.new_jobs = self.new_jobs * self.decay + new
+        self.seconds = self.seconds * self.decay + elapsed
+
+        if len(job_ids) >= 10 and new >= 0.8 * len(job_ids):
+            wanted = self.interval / 2
+        elif self.rate() > 0:
+            wanted = self.target_new / self.rate()
+        else:
+            wanted = self.interval * 2
+        self.interval = self._clamp(min(self.interval * 2, max(self.interval / 2, wanted)))
+        return new
+
+    def next_delay(self) -> float:
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def to_state(self) -> dict:
+        return {"interval": round(self.interval, 1), "new_jobs": round(self.new_jobs, 3),
+                "seconds": round(self.seconds, 1), "saved_at": int(time.time())}
+
+    def load_state(self, state: dict):
+        if not state:
+            return
+        self.interval = self._clamp(float(state.get("interval", self.interval)))
+        self.new_jobs = float(state.get("new_jobs", 0.0))
+        self.seconds = float(state.get("seconds", 0.0))
+
+    def get_stats(self) -> dict:
+        return {"interval": round(self.interval, 1), "rate_per_min": round(self.rate() * 60, 3),
+                "last_new": self.last_new, "cycles": self.cycles,
+                "bounds": [self.min_interval, self.max_interval]}
+
+
+class AdaptiveScheduler:
+    """PlatformSchedules of every platform, persisted in platform_state across restarts."""
+
+    def __init__(self):
+        self.platforms = {}
+
+    def add(self, name: str, interval: float) -> PlatformSchedule:
+        lo, hi = bounds_for(name)
+        schedule = self.platforms[name] = PlatformSchedule(name, interval, lo, hi)
+        return schedule
+
+    def load(self):
+        """Restores saved state (sync, run it in a thread)."""
+        for name, schedule in self.platforms.items():
+            try:
+                schedule.load_state(get_platform_state(name, STATE_KEY))
+            except Exception as e:
+                log.warning(f"[{name}] could not load schedule: {e}")
+            log.info(f"[{name}] interval {schedule.interval:.0f}s "
+                     f"(bounds {schedule.min_interval:.0f}-{schedule.max_interval:.0f}s)")
+
+    def save(self, name: str):
+        set_platform_state(name, STATE_KEY, self.platforms[name].to_state())
+
+    def get_stats(self) -> dict:
+        return {name: s.get_stats() for name, s in self.platforms.items()}
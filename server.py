@@ -1,9 +1,13 @@
 ﻿import os
 import logging
+import time
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from telegram import Update
 
 from bot import application
+from metrics import UPDATE_SECONDS, WEBHOOK_SECONDS, render
+from update_queue import UpdateQueue, QUEUED, DUPLICATE, SHED
 
 log = logging.getLogger("server")
 
@@ -16,24 +20,45 @@ app = FastAPI()
 BOT_READY = False
 
 
+async def process_update(data: dict):
+    with UPDATE_SECONDS.time():
+        await application.process_update(Update.de_json(data, application.bot))
+
+
+# updates are acknowledged immediately and handled by this worker pool
+update_queue = UpdateQueue(process_update)
+
+
 @app.get("/")
 async def root():
     return {"status": "Freelancer Bot is running"}
 
 
+@app.get("/metrics")
+async def metrics():
+    # includes snapshots published by the worker processes
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post(WEBHOOK_PATH)
 async def telegram_webhook(request: Request):
     if not BOT_READY:
         # Bot not initialized yet â€” ignore Telegram updates
         return JSONResponse({"ok": False, "reason": "bot_not_ready"})
 
+    started = time.perf_counter()
     try:
         update = await request.json()
-        await application.process_update(update)
-        return JSONResponse({"ok": True})
-    except Exception as e:
-        log.error(f"Webhook error: {e}", exc_info=True)
-        return JSONResponse({"ok": False})
+    except Exception:
+        WEBHOOK_SECONDS.labels("invalid").observe(time.perf_counter() - started)
+        return JSONResponse({"ok": False, "reason": "invalid_json"})
+
+    result = update_queue.submit(update)
+    WEBHOOK_SECONDS.labels(result).observe(time.perf_counter() - started)
+    if result == SHED:
+        # 503 makes Telegram redeliver later instead of us dropping it
+        return JSONResponse({"ok": False, "reason": "overloaded"}, status_code=503)
+    return JSONResponse({"ok": result in (QUEUED, DUPLICATE), "status": result})
 
 
 @app.on_event("startup")
@@ -44,6 +69,7 @@ async def startup_event():
     # âœ… REQUIRED â€” MUST BE FIRST
     await application.initialize()
     await application.start()
+    update_queue.start()
 
     # âœ… reset Telegram webhook
     await application.bot.delete_webhook()
@@ -61,6 +87,8 @@ async def shutdown_event():
     log.info("Shutting down Telegram application...")
     BOT_READY = False
 
+    await update_queue.stop()
+    log.info(f"Update queue stats: {update_queue.get_stats()}")
     await application.stop()
     await application.shutdown()
 
@@ -19,12 +19,11 @@ echo "ðŸ‘‰ Cleaning any stale workers..."
 pkill -f worker_freelancer.py || true
 pkill -f worker_pph.py || true
 pkill -f worker_skywalker.py || true
+pkill -f worker_ingest.py || true
 echo "âœ… Old workers terminated (if any)."
 
 echo "ðŸ‘‰ Starting background workers..."
-nohup python3 workers/worker_freelancer.py > logs/worker_freelancer.log 2>&1 &
-nohup python3 workers/worker_pph.py        > logs/worker_pph.log 2>&1 &
-nohup python3 workers/worker_skywalker.py  > logs/worker_skywalker.log 2>&1 &
+nohup python3 workers/worker_ingest.py > logs/worker_ingest.log 2>&1 &
 echo "âœ… Workers running."
 
 echo "ðŸ‘‰ Starting FastAPI + Telegram bot via uvicorn..."
@@ -0,0 +1,303 @@
+﻿import asyncio
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+from metrics import TELEGRAM_SENDS
+from rate_limit import TokenBucket
+
+log = logging.getLogger("telegram_delivery")
+
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN")
+# point at a local fake_telegram.py server for offline benchmarks
+API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+# Telegram limits: ~30 msg/s overall, ~1 msg/s to the same chat
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+PER_CHAT_RATE = float(os.getenv("TG_PER_CHAT_RATE", "1"))
+MAX_CONCURRENCY = int(os.getenv("TG_MAX_CONCURRENCY", "16"))
+MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "5"))
+
+
+class _Message:
+    __slots__ = ("chat_id", "payload", "future", "attempts")
+
+    def __init__(self, chat_id, payload, future):
+        self.chat_id = chat_id
+        self.payload = payload
+        self.future = future
+        self.attempts = 0
+
+
+class DeliveryEngine:
+    """
+    Async sendMessage engine shared by all workers.
+
+    Messages are queued per chat; a dispatcher hands them out respecting the
+    global token bucket and one in-flight message per chat, paced by the
+    per-chat rate. 429 responses reschedule the chat after `retry_after`;
+    network errors and 5xx are retried with exponential backoff.
+    """
+
+    def __init__(self, token: str = BOT_TOKEN, api_base: str = API_BASE,
+                 global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 max_concurrency: int = MAX_CONCURRENCY, max_retries: int = MAX_RETRIES, transport=None):
+        self.api_url = f"{api_base}/bot{token}"
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self._transport = transport
+
+        self._global_rate = global_rate
+        self._global = None
+        self._client = None
+        self._sem = None
+        self._wake = None
+        self._dispatcher = None
+        self._loop = None
+        self._thread = None
+
+        self._chats = {}          # chat_id -> deque[_Message]
+        self._next_at = {}        # chat_id -> earliest next send (monotonic)
+        self._scheduled = set()   # chats present in the heap or in flight
+        self._heap = []
+        self._seq = itertools.count()
+        self._tasks = set()
+
+        self._sent_times = deque()
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "rate_limited": 0,
+        }
+
+    # ----------------------------------------------------------
+    # LIFECYCLE
+    # ----------------------------------------------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        # no initial burst: a full bucket on top of the refill would double the first second
+        self._global = TokenBucket(self._global_rate, 1)
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._wake = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            transport=self._transport,
+        )
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        log.info("Delivery engine started")
+
+    async def stop(self, drain_timeout: float = 30.0):
+        deadline = time.monotonic() + drain_timeout
+        while (self.queue_depth() or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._dispatcher:
+            self._dispatcher.cancel()
+        for t in list(self._tasks):
+            t.cancel()
+        if self._client:
+            await self._client.aclose()
+        log.info(f"Delivery engine stopped: {self.get_stats()}")
+
+    def start_in_thread(self):
+        """Runs the engine on its own event loop thread, for synchronous callers."""
+        if self._thread:
+            return self
+        ready = threading.Event()
+
+        def runner():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=runner, name="tg-delivery", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop_thread(self, drain_timeout: float = 30.0):
+        if not self._thread:
+            return
+        fut = asyncio.run_coroutine_threadsafe(self.stop(drain_timeout), self._loop)
+        try:
+            fut.result(drain_timeout + 5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ----------------------------------------------------------
+    # ENQUEUE
+    # ----------------------------------------------------------
+    def enqueue(self, chat_id, text: str, reply_markup=None, parse_mode: str = "Markdown",
+                disable_web_page_preview: bool = True) -> asyncio.Future:
+        """Queues a sendMessage. Must be called on the engine's loop; resolves to True/False."""
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "disable_web_page_preview": disable_web_page_preview,
+        }
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        future = self._loop.create_future()
+        self._chats.setdefault(chat_id, deque()).append(_Message(chat_id, payload, future))
+        self.stats["enqueued"] += 1
+        if chat_id not in self._scheduled:
+            self._schedule(chat_id)
+        return future
+
+    def send_message(self, chat_id, text: str, reply_markup=None, parse_mode: str = "Markdown"):
+        """Thread-safe enqueue for synchronous code; returns a concurrent Future."""
+        async def _enqueue():
+            return await self.enqueue(chat_id, text, reply_markup, parse_mode)
+        return asyncio.run_coroutine_threadsafe(_enqueue(), self._loop)
+
+    def _schedule(self, chat_id):
+        self._scheduled.add(chat_id)
+        ready_at = max(time.monotonic(), self._next_at.get(chat_id, 0.0))
+        heapq.heappush(self._heap, (ready_at, next(self._seq), chat_id))
+        self._wake.set()
+
+    # ----------------------------------------------------------
+    # DISPATCH
+    # ----------------------------------------------------------
+    async def _dispatch(self):
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            ready_at, _, chat_id = self._heap[0]
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            await self._global.acquire()
+            await self._sem.acquire()
+
+            msg = self._chats[chat_id].popleft()
+            task = asyncio.create_task(self._send(msg))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, msg: _Message):
+        chat_id = msg.chat_id
+        retry_in = None
+        try:
+            msg.attempts += 1
+            try:
+                r = await self._client.post(f"{self.api_url}/sendMessage", json=msg.payload)
+                status = r.status_code
+                body = r.json() if r.content else {}
+            except (httpx.TransportError, ValueError) as e:
+                status, body = None, {"description": str(e)}
+
+            if status == 200 and body.get("ok"):
+                self.stats["sent"] += 1
+                TELEGRAM_SENDS.labels("sent").inc()
+                self._sent_times.append(time.monotonic())
+                msg.future.set_result(True)
+            elif status == 429:
+                self.stats["rate_limited"] += 1
+                TELEGRAM_SENDS.labels("rate_limited").inc()
+                retry_in = float(body.get("parameters", {}).get("retry_after", 1))
+                log.warning(f"429 for chat {chat_id}, retry after {retry_in}s")
+            elif (status is None or status >= 500) and msg.attempts <= self.max_retries:
+                retry_in = min(60.0, 2 ** (msg.attempts - 1)) + random.uniform(0, 0.5)
+                log.warning(f"Send to {chat_id} failed ({status}: {body.get('description')}), retry in {retry_in:.1f}s")
+            else:
+                self.stats["failed"] += 1
+                TELEGRAM_SENDS.labels("failed").inc()
+                log.error(f"Send to {chat_id} dropped ({status}): {body.get('description')}")
+                msg.future.set_result(False)
+        except Exception as e:
+            self.stats["failed"] += 1
+            TELEGRAM_SENDS.labels("failed").inc()
+            log.error(f"Send to {chat_id} error: {e}")
+            if not msg.future.done():
+                msg.future.set_result(False)
+        finally:
+            self._sem.release()
+            self._after_send(msg, retry_in)
+
+    def _after_send(self, msg: _Message, retry_in):
+        chat_id = msg.chat_id
+        queue = self._chats[chat_id]
+
+        if retry_in is not None:
+            self.stats["retried"] += 1
+            TELEGRAM_SENDS.labels("retried").inc()
+            queue.appendleft(msg)
+            self._next_at[chat_id] = time.monotonic() + retry_in
+        else:
+            self._next_at[chat_id] = time.monotonic() + self.per_chat_interval
+
+        if queue:
+            self._schedule(chat_id)
+        else:
+            self._scheduled.discard(chat_id)
+            del self._chats[chat_id]
+
+        if len(self._next_at) > 10000:
+            now = time.monotonic()
+            self._next_at = {c: t for c, t in self._next_at.items() if t > now}
+
+    # ----------------------------------------------------------
+    # STATS
+    # ----------------------------------------------------------
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._chats.values())
+
+    def throughput(self, window: float = 60.0) -> float:
+        """Messages per second over the last `window` seconds."""
+        cutoff = time.monotonic() - window
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+        return len(self._sent_times) / window
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        s["queue_depth"] = self.queue_depth()
+        s["in_flight"] = len(self._tasks)
+        s["chats_waiting"] = len(self._chats)
+        s["throughput_per_sec"] = round(self.throughput(), 2)
+        return s
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_delivery_engine() -> DeliveryEngine:
+    """Shared engine for synchronous workers, running on a background loop thread."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DeliveryEngine().start_in_thread()
+            atexit.register(_engine.stop_thread)
+        return _engine
@@ -0,0 +1,47 @@
+﻿import asyncio
+import os
+import re
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_stream import stream_jobs
+from http_client import HttpClient
+
+PAGE = ("<html><body><ul class='jobs'>"
+        + "".join(f"<li class='job'><a href='/j/{n}'>Job {n}</a></li>" for n in range(5))
+        + "</ul><footer>x</footer></body></html>").encode()
+
+
+def parse(card_html):
+    return [{"url": re.search(r"/j/\d+", card_html).group(0)}]
+
+
+def serve(request):
+    if request.headers.get("If-None-Match") == '"p1"':
+        return httpx.Response(304)
+    return httpx.Response(200, headers={"ETag": '"p1"'}, content=PAGE)
+
+
+def test_stream_marks_jobs_seen_only_on_commit():
+    client = HttpClient(transport=httpx.MockTransport(serve))
+    url = "https://jobs.test/list"
+
+    async def main():
+        try:
+            jobs, commit = await stream_jobs(client, url, "streamtest", parse, "li.job")
+            assert len(jobs) == 5
+            # processing failed: nothing committed, the same jobs come back
+            again, commit = await stream_jobs(client, url, "streamtest", parse, "li.job")
+            assert again == jobs
+            await commit()
+            return await stream_jobs(client, url, "streamtest", parse, "li.job")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(main()) == ([], None)
+    cache = client.get_cache_stats()["streamtest"]
+    assert cache["not_modified"] == 1
+    assert cache["bytes_saved"] > 0
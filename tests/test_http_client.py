@@ -0,0 +1,157 @@
+﻿import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+from http_client import CircuitBreaker, HostUnavailable, HttpClient
+
+
+def make_client(handler):
+    return HttpClient(transport=httpx.MockTransport(handler))
+
+
+def trip(client, host):
+    breaker = client.policy(host).breaker
+    breaker.base_cooldown = breaker.cooldown = 0.05
+    breaker.failure("429")
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_cancelled_probe_does_not_wedge_breaker():
+    hang = asyncio.Event()
+
+    async def handler(request):
+        if request.url.path == "/hang":
+            await hang.wait()
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        client = make_client(handler)
+        breaker = trip(client, "a.test")
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.create_task(client.get("https://a.test/hang"))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # the next request becomes the probe and closes the breaker
+        response = await client.get("https://a.test/ok")
+        assert response.status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_cancelled_stream_probe_does_not_wedge_breaker():
+    hang = asyncio.Event()
+
+    async def handler(request):
+        if request.url.path == "/hang":
+            await hang.wait()
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        client = make_client(handler)
+        breaker = trip(client, "b.test")
+        await asyncio.sleep(0.06)
+
+        async def read():
+            async with client.stream("https://b.test/hang") as response:
+                await response.aread()
+
+        probe = asyncio.create_task(read())
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async with client.stream("https://b.test/ok") as response:
+            assert response.status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_open_breaker_rejects_without_network():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        return httpx.Response(429, headers={"Retry-After": "30"})
+
+    async def run():
+        client = make_client(handler)
+        await client.get("https://c.test/")
+        with pytest.raises(HostUnavailable):
+            await client.get("https://c.test/")
+        assert len(calls) == 1
+        assert client.get_breaker_stats()["c.test"]["state"] == CircuitBreaker.OPEN
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_breaker_state_is_exported():
+    from metrics import render
+
+    breaker = CircuitBreaker("d.test")
+    assert 'http_breaker_state{host="d.test"} 0' in render()
+    breaker.failure("403")
+    assert 'http_breaker_state{host="d.test"} 2' in render()
+    breaker.success()
+    assert 'http_breaker_state{host="d.test"} 0' in render()
+
+
+def test_validators_are_stored_only_on_commit():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, text="<html>jobs</html>")
+
+    client = make_client(handler)
+    requests_before = metrics.HTTP_REQUESTS.labels("c.test").value
+
+    async def main():
+        try:
+            url = "https://c.test/jobs"
+            _, changed, commit = await client.get_if_changed(url)
+            assert changed
+            # processing failed: no commit, so the page is fetched and parsed again
+            _, changed, commit = await client.get_if_changed(url)
+            assert changed
+            await commit()
+            _, changed, commit = await client.get_if_changed(url)
+            assert not changed and commit is None
+        finally:
+            await client.aclose()
+
+    asyncio.run(main())
+    assert seen == [None, None, '"v1"']
+
+    text = metrics.render()
+    assert 'http_validation_total{platform="c.test",result="changed"} 2' in text
+    assert 'http_validation_total{platform="c.test",result="not_modified"} 1' in text
+    assert 'http_validation_bytes_saved_total{platform="c.test"} 17' in text
+    assert metrics.HTTP_REQUESTS.labels("c.test").value - requests_before == 3
+
+
+def test_fetch_layer_does_not_load_telegram():
+    code = "import http_client, sys; print('telegram_delivery' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,62 @@
+﻿import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher, normalize_keyword
+
+
+def naive_match(user_keywords, text):
+    """The old per-user `k.lower() in fulltext` loop, keeping every hit."""
+    fulltext = text.lower()
+    hits = {}
+    for user_id, kws in user_keywords.items():
+        for kw in kws:
+            norm = normalize_keyword(kw)
+            if norm and norm in fulltext:
+                hits.setdefault(user_id, set()).add(norm)
+    return hits
+
+
+def normalized(hits):
+    return {uid: {normalize_keyword(kw) for kw in kws} for uid, kws in hits.items()}
+
+
+def check(user_keywords, text):
+    assert normalized(KeywordMatcher(user_keywords).match(text)) == naive_match(user_keywords, text)
+
+
+def test_overlapping_patterns():
+    users = {1: ["he", "she", "his", "hers"], 2: ["ushers"], 3: ["s"], 4: ["shex"]}
+    for text in ("ushers", "she sells", "this", "hhhers", "ahishers", "xyz"):
+        check(users, text)
+    assert normalized(KeywordMatcher(users).match("ushers")) == {
+        1: {"he", "she", "hers"}, 2: {"ushers"}, 3: {"s"}}
+
+
+def test_case_folding():
+    users = {1: ["Python"], 2: ["  DJANGO "], 3: ["react native"]}
+    hits = KeywordMatcher(users).match("Senior PYTHON / Django dev, React Native a plus")
+    assert hits == {1: ["Python"], 2: ["  DJANGO "], 3: ["react native"]}
+
+
+def test_several_keywords_per_user():
+    users = {1: ["api", "scraping", "excel"], 2: ["api"], 3: ["logo"]}
+    hits = KeywordMatcher(users).match("Web scraping tool with a REST API")
+    assert {uid: sorted(kws) for uid, kws in hits.items()} == {1: ["api", "scraping"], 2: ["api"]}
+
+
+def test_empty_pattern_set():
+    assert KeywordMatcher({}).match("anything at all") == {}
+    # blank keywords are dropped, never match everything
+    assert KeywordMatcher({1: ["", "   "], 2: []}).match("anything at all") == {}
+
+
+def test_matches_naive_loop_on_random_input():
+    rng = random.Random(7)
+    alphabet = "abcAB "
+    word = lambda n: "".join(rng.choice(alphabet) for _ in range(n))
+    for _ in range(200):
+        users = {uid: [word(rng.randint(0, 4)) for _ in range(rng.randint(0, 4))] for uid in range(5)}
+        check(users, word(rng.randint(0, 30)))
@@ -0,0 +1,62 @@
+﻿import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicates import MinHasher, NearDuplicateIndex
+
+TEXT = ("Need a Python developer to build a web scraper for product listings, "
+        "export results to Excel and schedule daily runs on a Linux server")
+REWORDED = TEXT.replace("daily", "nightly")
+OTHER = ("Looking for a logo designer to create a modern brand identity with "
+         "business cards, letterhead and social media banners for a bakery")
+
+
+def test_signature_similarity_tracks_jaccard():
+    hasher = MinHasher()
+    assert hasher.signature("too few words here") is None
+    assert MinHasher.similarity(hasher.signature(TEXT), hasher.signature(TEXT.upper())) == 1.0
+    assert MinHasher.similarity(hasher.signature(TEXT), hasher.signature(REWORDED)) >= 0.75
+    assert MinHasher.similarity(hasher.signature(TEXT), hasher.signature(OTHER)) < 0.3
+
+
+def test_cross_platform_duplicate_is_detected():
+    index = NearDuplicateIndex(window=100)
+    assert index.check(("freelancer", "1"), TEXT, now=0) is None
+    assert index.check(("pph", "9"), REWORDED, now=1) == ("freelancer", "1")
+    assert index.check(("pph", "10"), OTHER, now=2) is None
+    # a re-scrape of an indexed key is never a duplicate of itself
+    assert index.check(("freelancer", "1"), TEXT, now=3) is None
+    stats = index.get_stats()
+    assert (stats["checked"], stats["duplicates"], stats["size"]) == (4, 1, 2)
+
+
+def test_short_postings_are_not_signed():
+    index = NearDuplicateIndex()
+    assert index.check(("freelancer", "1"), "fix my site", now=0) is None
+    assert index.check(("pph", "2"), "fix my site", now=0) is None
+    assert index.get_stats()["unsigned"] == 2 and len(index) == 0
+
+
+def test_window_and_size_evict_old_entries():
+    index = NearDuplicateIndex(window=10, maxsize=1)
+    index.check(("freelancer", "1"), TEXT, now=0)
+    assert index.check(("pph", "2"), TEXT, now=11) is None
+    assert index.get_stats()["evicted"] == 1
+    index.check(("pph", "3"), OTHER, now=12)
+    assert len(index) == 1 and index.get_stats()["buckets"] == index.bands
+    assert index.check(("skywalker", "4"), TEXT, now=13) is None
+
+
+def test_filter_jobs_keeps_originals():
+    index = NearDuplicateIndex()
+    index.filter_jobs("freelancer", [{"id": 1, "title": "", "description": TEXT}], lambda j: j["id"])
+    jobs = [{"id": 7, "title": "", "description": REWORDED}, {"id": 8, "title": "", "description": OTHER}]
+    assert index.filter_jobs("pph", jobs, lambda j: j["id"]) == [jobs[1]]
+
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(bands=5, hasher=MinHasher(permutations=64))
@@ -0,0 +1,56 @@
+﻿import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_planner
+from query_planner import QueryPlanner, TTLCache
+
+
+def test_keywords_collapse_to_distinct_queries():
+    planner = QueryPlanner({1: ["Python", "django"], 2: [" python "], 3: ["", "logo"]})
+    assert planner.queries == ["django", "logo", "python"]
+    assert planner.routes["python"] == {1: "Python", 2: " python "}
+
+
+def test_each_query_is_fetched_once():
+    planner = QueryPlanner({1: ["python"], 2: ["Python"], 3: ["logo"]})
+    calls = []
+
+    def fetch(q):
+        calls.append(q)
+        return [{"job_id": q}] if q == "python" else None
+
+    assert planner.fetch_all(fetch) == {"logo": [], "python": [{"job_id": "python"}]}
+    assert calls == ["logo", "python"]
+
+
+def test_route_fans_out_and_merges_keywords():
+    planner = QueryPlanner({1: ["python", "scraper"], 2: ["python"]})
+    job = {"job_id": 7}
+    candidates = planner.route({"python": [job], "scraper": [job]}, "pph")
+    assert candidates == {(1, "pph", "7"): (job, ["python", "scraper"]), (2, "pph", "7"): (job, ["python"])}
+
+
+def test_cache_skips_fetches_until_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_planner.time, "monotonic", lambda: now[0])
+    planner = QueryPlanner({1: ["python"]})
+    cache = TTLCache(ttl=60)
+    calls = []
+    fetch = lambda q: calls.append(q) or [{"job_id": 1}]
+
+    planner.fetch_all(fetch, cache)
+    planner.fetch_all(fetch, cache)
+    assert calls == ["python"] and (cache.hits, cache.misses) == (1, 1)
+    now[0] += 61
+    planner.fetch_all(fetch, cache)
+    assert calls == ["python", "python"]
+
+
+def test_cache_is_bounded():
+    cache = TTLCache(ttl=60, maxsize=2)
+    for key in "abc":
+        cache.set(key, [key])
+    assert cache.get("a") is None
+    assert cache.get("b") == ["b"] and cache.get("c") == ["c"]
@@ -0,0 +1,36 @@
+﻿import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram_delivery import DeliveryEngine
+
+
+def test_global_rate_holds_from_the_first_second():
+    rate = 50
+    sent = []
+
+    def handler(request):
+        sent.append(time.monotonic())
+        chat = json.loads(request.content)["chat_id"]
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": chat}})
+
+    engine = DeliveryEngine(token="test", global_rate=rate, transport=httpx.MockTransport(handler))
+
+    async def main():
+        await engine.start()
+        try:
+            # one message per chat, so only the global bucket paces them
+            futures = [engine.enqueue(chat, "hi") for chat in range(2 * rate)]
+            return await asyncio.gather(*futures)
+        finally:
+            await engine.stop(drain_timeout=0)
+
+    assert all(asyncio.run(main()))
+    busiest = max(sum(1 for t in sent if start <= t < start + 1.0) for start in sent)
+    assert busiest <= rate + 1
@@ -0,0 +1,69 @@
+﻿import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from update_queue import DUPLICATE, INVALID, QUEUED, SHED, RecentIds, UpdateQueue
+
+
+def test_recent_ids_forget_the_oldest():
+    seen = RecentIds(size=2)
+    for update_id in (1, 2, 3):
+        seen.add(update_id)
+    assert 1 not in seen and 2 in seen and 3 in seen
+
+
+def test_submit_validates_dedups_and_sheds():
+    async def main():
+        queue = UpdateQueue(process=None, maxsize=2)
+        results = [queue.submit(u) for u in (
+            {"update_id": 1}, {"update_id": 1}, {"message": {}}, "junk", {"update_id": 2}, {"update_id": 3})]
+        assert results == [QUEUED, DUPLICATE, INVALID, INVALID, QUEUED, SHED]
+        # a shed update isn't remembered, so Telegram's retry can still get in
+        await queue._queue.get()
+        assert queue.submit({"update_id": 3}) == QUEUED
+        stats = queue.get_stats()
+        assert (stats["received"], stats["queued"], stats["duplicates"], stats["shed"], stats["invalid"]) \
+            == (7, 3, 1, 1, 2)
+        assert stats["max_depth"] == 2
+
+    asyncio.run(main())
+
+
+def test_workers_process_updates_and_survive_errors():
+    done = []
+
+    async def process(update):
+        await asyncio.sleep(0)
+        if update["update_id"] == 2:
+            raise RuntimeError("boom")
+        done.append(update["update_id"])
+
+    async def main():
+        queue = UpdateQueue(process, workers=2)
+        queue.start()
+        for update_id in range(1, 6):
+            queue.submit({"update_id": update_id})
+        await queue.stop(drain_seconds=1)
+        return queue.get_stats()
+
+    stats = asyncio.run(main())
+    assert sorted(done) == [1, 3, 4, 5]
+    assert (stats["processed"], stats["errors"], stats["queue_depth"], stats["workers"]) == (4, 1, 0, 0)
+
+
+def test_stop_gives_up_after_drain_timeout():
+    async def process(update):
+        await asyncio.sleep(10)
+
+    async def main():
+        queue = UpdateQueue(process, workers=1)
+        queue.start()
+        queue.submit({"update_id": 1})
+        queue.submit({"update_id": 2})
+        await queue.stop(drain_seconds=0.05)
+        return queue.get_stats()
+
+    stats = asyncio.run(main())
+    assert stats["processed"] == 0 and stats["queue_depth"] == 1 and stats["workers"] == 0
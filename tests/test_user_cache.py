@@ -0,0 +1,21 @@
+﻿import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from user_cache import LRUTTLCache
+
+
+def test_cache_events_are_exported():
+    cache = LRUTTLCache("test_cache", maxsize=1)
+    cache.set(1, "a")
+    cache.get(1)
+    cache.get(2)
+    cache.set(2, "b")
+    cache.invalidate(2)
+
+    text = metrics.render()
+    for event, value in (("hits", 1), ("misses", 1), ("evictions", 1), ("invalidations", 1)):
+        assert f'user_cache_events_total{{cache="test_cache",event="{event}"}} {value}' in text
+    assert 'user_cache_entries{cache="test_cache"} 0' in text
@@ -0,0 +1,179 @@
+﻿import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+log = logging.getLogger("tracing")
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+# the ingestion process appends finished traces here; the bot reads them back
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/freelancer-bot-traces.jsonl")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(5 * 1024 * 1024)))
+
+_current_cycle = contextvars.ContextVar("trace_cycle", default=None)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def sampled(job_id: str, rate: float = TRACE_SAMPLE_RATE) -> bool:
+    """Deterministic per job, so every process makes the same decision."""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    h = int.from_bytes(hashlib.blake2b(str(job_id).encode(), digest_size=8).digest(), "big")
+    return h / 2 ** 64 < rate
+
+
+class Cycle:
+    """Batch-level stages of one platform cycle (fetch, parse, ...), shared by its job traces."""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+
+    def add_span(self, name: str, start: float, end: float):
+        self.spans.append({"stage": name, "start_ms": _ms(start - self.t0), "ms": _ms(end - start)})
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter())
+
+    def trace_job(self, job_id: str, **attrs):
+        """A JobTrace for `job_id` if it is sampled, else None."""
+        if not sampled(job_id):
+            return None
+        return JobTrace(self, job_id, **attrs)
+
+
+class JobTrace:
+    """One job's path through fetch -> parse -> match -> feed_event -> delivery."""
+
+    def __init__(self, cycle: Cycle, job_id: str, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.platform = cycle.platform
+        self.job_id = str(job_id)
+        self.started = cycle.started
+        self.t0 = cycle.t0
+        self.spans = list(cycle.spans)
+        self.attrs = attrs
+        self._done = False
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        span = {"stage": name, "start_ms": _ms(start - self.t0), "ms": _ms(end - start)}
+        span.update(attrs)
+        self.spans.append(span)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter())
+
+    def finish(self, **attrs):
+        if self._done:
+            return
+        self._done = True
+        self.attrs.update(attrs)
+        record({
+            "trace_id": self.trace_id,
+            "platform": self.platform,
+            "job_id": self.job_id,
+            "started": self.started,
+            "total_ms": _ms(time.perf_counter() - self.t0),
+            "spans": self.spans,
+            "attrs": self.attrs,
+        })
+
+
+def start_cycle(platform: str) -> Cycle:
+    """Starts a cycle and makes it current for code awaited from this task."""
+    cycle = Cycle(platform)
+    _current_cycle.set(cycle)
+    return cycle
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Records a stage on the current cycle, if any (e.g. parse inside a fetcher)."""
+    cycle = _current_cycle.get()
+    if cycle is None:
+        yield
+        return
+    with cycle.stage(name):
+        yield
+
+
+# ----------------------------------------------------------
+# STORAGE
+# ----------------------------------------------------------
+_buffer = deque(maxlen=TRACE_BUFFER_SIZE)
+_lock = threading.Lock()
+
+
+def record(trace: dict):
+    with _lock:
+        _buffer.append(trace)
+        if not TRACE_FILE:
+            return
+        try:
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_FILE_MAX_BYTES:
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            with open(TRACE_FILE, "a") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+        except OSError as e:
+            log.warning(f"Trace write failed: {e}")
+
+
+def _file_traces(limit: int):
+    try:
+        with open(TRACE_FILE, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024 * 1024))
+            lines = f.read().splitlines()[-limit:]
+    except (OSError, TypeError):
+        return []
+    out = []
+    for line in lines:
+        try:
+            out.append(json.loads(line))
+        except ValueError:
+            continue
+    return out
+
+
+def recent_traces(limit: int = TRACE_BUFFER_SIZE):
+    """Finished traces from this process and from the trace file, newest last."""
+    by_id = {t["trace_id"]: t for t in _file_traces(limit)}
+    with _lock:
+        by_id.update((t["trace_id"], t) for t in _buffer)
+    return sorted(by_id.values(), key=lambda t: t["started"])[-limit:]
+
+
+def slowest(n: int = 10, platform: str = None):
+    traces = [t for t in recent_traces() if platform is None or t["platform"] == platform]
+    return sorted(traces, key=lambda t: t["total_ms"], reverse=True)[:n]
+
+
+def format_trace(trace: dict) -> str:
+    stages = " ".join(f"{s['stage']}={s['ms']:.0f}" for s in trace["spans"])
+    attrs = trace.get("attrs") or {}
+    extra = f" age={attrs['age_s']:.0f}s" if attrs.get("age_s") is not None else ""
+    return f"{trace['trace_id']} {trace['platform']}:{trace['job_id']} {trace['total_ms']:.0f}ms{extra}\n  {stages}"
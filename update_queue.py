@@ -0,0 +1,142 @@
+﻿import asyncio
+import logging
+import os
+import time
+
+log = logging.getLogger("update_queue")
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "5000"))
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "10"))
+
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+SHED = "shed"
+INVALID = "invalid"
+
+
+class RecentIds:
+    """Fixed-size ring buffer of recently seen ids with O(1) membership."""
+
+    def __init__(self, size: int = WEBHOOK_DEDUP_SIZE):
+        self._ring = [None] * size
+        self._pos = 0
+        self._ids = set()
+
+    def __contains__(self, value):
+        return value in self._ids
+
+    def add(self, value):
+        old = self._ring[self._pos]
+        if old is not None:
+            self._ids.discard(old)
+        self._ring[self._pos] = value
+        self._ids.add(value)
+        self._pos = (self._pos + 1) % len(self._ring)
+
+
+class UpdateQueue:
+    """
+    Decouples the webhook from update processing.
+
+    submit() validates an update, drops update_ids seen recently (Telegram
+    retries a webhook it thinks failed) and puts it on a bounded queue
+    without waiting; when the queue is full the update is shed instead.
+    A pool of `workers` tasks drains the queue through `process(update)`.
+    """
+
+    def __init__(self, process, workers: int = WEBHOOK_WORKERS, maxsize: int = WEBHOOK_QUEUE_SIZE,
+                 dedup_size: int = WEBHOOK_DEDUP_SIZE):
+        self.process = process
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._seen = RecentIds(dedup_size)
+        self._tasks = []
+
+        self.stats = {
+            "received": 0,
+            "queued": 0,
+            "duplicates": 0,
+            "shed": 0,
+            "invalid": 0,
+            "processed": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "max_wait_ms": 0.0,
+            "total_wait_ms": 0.0,
+            "max_process_ms": 0.0,
+            "total_process_ms": 0.0,
+        }
+
+    def submit(self, update) -> str:
+        """Enqueues one decoded update. Returns QUEUED, DUPLICATE, SHED or INVALID."""
+        self.stats["received"] += 1
+
+        update_id = update.get("update_id") if isinstance(update, dict) else None
+        if not isinstance(update_id, int):
+            self.stats["invalid"] += 1
+            return INVALID
+
+        if update_id in self._seen:
+            self.stats["duplicates"] += 1
+            return DUPLICATE
+
+        try:
+            self._queue.put_nowait((time.perf_counter(), update))
+        except asyncio.QueueFull:
+            # not remembered: Telegram's redelivery may get in later
+            self.stats["shed"] += 1
+            return SHED
+
+        self._seen.add(update_id)
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self._queue.qsize())
+        return QUEUED
+
+    async def _worker(self):
+        while True:
+            queued_at, update = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                await self.process(update)
+                self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error(f"Update {update.get('update_id')} failed: {e}", exc_info=True)
+            finally:
+                wait_ms = (started - queued_at) * 1000
+                process_ms = (time.perf_counter() - started) * 1000
+                self.stats["total_wait_ms"] += wait_ms
+                self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+                self.stats["total_process_ms"] += process_ms
+                self.stats["max_process_ms"] = max(self.stats["max_process_ms"], process_ms)
+                self._queue.task_done()
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"update-worker-{i}") for i in range(self.workers)
+        ]
+        log.info(f"Update queue started: {self.workers} workers, capacity {self._queue.maxsize}")
+
+    async def stop(self, drain_seconds: float = WEBHOOK_DRAIN_SECONDS):
+        """Lets queued updates finish (up to drain_seconds), then stops the workers."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_seconds)
+        except asyncio.TimeoutError:
+            log.warning(f"Update queue stopped with {self._queue.qsize()} updates pending")
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        done = (s["processed"] + s["errors"]) or 1
+        s["avg_wait_ms"] = s["total_wait_ms"] / done
+        s["avg_process_ms"] = s["total_process_ms"] / done
+        s["queue_depth"] = self._queue.qsize()
+        s["workers"] = len(self._tasks)
+        return s
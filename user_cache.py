@@ -0,0 +1,93 @@
+﻿import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import USER_CACHE_ENTRIES, USER_CACHE_EVENTS
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+
+class LRUTTLCache:
+    """
+    Bounded LRU whose entries also expire after `ttl` seconds.
+    Thread-safe, since both the handlers and the sync helpers share it.
+    Hits, misses, evictions, invalidations and size are exported on /metrics.
+    """
+
+    def __init__(self, name: str, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._events = {event: USER_CACHE_EVENTS.labels(name, event) for event in self.stats}
+        self._entries = USER_CACHE_ENTRIES.labels(name)
+
+    def _count(self, event: str, n: int = 1):
+        # caller holds self._lock
+        self.stats[event] += n
+        self._events[event].inc(n)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self._count("hits")
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+                self._entries.set(len(self._data))
+            self._count("misses")
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._count("evictions")
+            self._entries.set(len(self._data))
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._count("invalidations")
+                self._entries.set(len(self._data))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._entries.set(0)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self) -> dict:
+        s = dict(self.stats)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 3) if lookups else 0.0
+        s["size"] = len(self._data)
+        return s
+
+
+# telegram_id -> app_user row dict / keyword list / app_user.id
+user_rows = LRUTTLCache("user_rows")
+user_keywords = LRUTTLCache("user_keywords")
+known_users = LRUTTLCache("known_users")
+
+
+def invalidate_user(tid: int):
+    user_rows.invalidate(tid)
+
+
+def invalidate_keywords(tid: int):
+    user_keywords.invalidate(tid)
+
+
+def get_cache_stats() -> dict:
+    return {c.name: c.get_stats() for c in (user_rows, user_keywords, known_users)}
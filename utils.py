@@ -1,9 +1,17 @@
-﻿import logging
+﻿import html
+import logging
 from sqlalchemy import text
 from db import get_session, close_session
+from metrics import db_timer
+from user_cache import invalidate_user
 
 log = logging.getLogger("utils")
 
+# Telegram rejects longer messages; job fields are cut well below it
+MESSAGE_MAX_CHARS = 4096
+CARD_TITLE_CHARS = 256
+CARD_MATCH_CHARS = 200
+
 # ----------------------------------------------------------
 # CREATE OR FETCH USER
 # ----------------------------------------------------------
@@ -45,15 +53,16 @@ def get_user_id(tid: int):
 def get_user(tid: int):
     db = get_session()
     try:
-        row = db.execute(
-            text("""
-                SELECT telegram_id, countries, proposal_template, active, blocked,
-                       start_date, trial_until, license_until
-                FROM app_user
-                WHERE telegram_id=:u
-            """),
-            {"u": tid}
-        ).fetchone()
+        with db_timer("get_user"):
+            row = db.execute(
+                text("""
+                    SELECT telegram_id, countries, proposal_template, active, blocked,
+                           start_date, trial_until, license_until, digest_minutes
+                    FROM app_user
+                    WHERE telegram_id=:u
+                """),
+                {"u": tid}
+            ).fetchone()
 
         if not row:
             return None
@@ -66,7 +75,8 @@ def get_user(tid: int):
             "blocked": row[4],
             "start_date": row[5],
             "trial_until": row[6],
-            "license_until": row[7]
+            "license_until": row[7],
+            "digest_minutes": row[8]
         }
 
     finally:
@@ -86,6 +96,7 @@ def set_user_setting(tid: int, field: str, value):
         db.commit()
     finally:
         close_session(db)
+        invalidate_user(tid)
 
 
 # ----------------------------------------------------------
@@ -96,8 +107,12 @@ def save_job(tid: int, job_id: str):
     try:
         db.execute(
             text("""
-                INSERT INTO saved_job (user_id, job_id)
-                VALUES (:u, :j)
+                INSERT INTO saved_job (user_id, job_id, job_ref)
+                VALUES (:u, :j, (
+                    SELECT job_ref FROM feed_event
+                    WHERE user_id=:u AND job_id=:j AND job_ref IS NOT NULL
+                    ORDER BY id DESC LIMIT 1
+                ))
                 ON CONFLICT DO NOTHING;
             """),
             {"u": tid, "j": job_id}
@@ -119,6 +134,62 @@ def delete_saved_job(tid: int, job_id: str):
         close_session(db)
 
 
+# ----------------------------------------------------------
+# SEND JOB (workers)
+# ----------------------------------------------------------
+def shorten(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+
+def build_job_card(job: dict):
+    """
+    Returns (text, reply_markup) for a normalized job dict. The text is HTML
+    (send with parse_mode="HTML"); job fields are escaped, so titles with
+    *, _ or < can't get the message rejected.
+    """
+    title = html.escape(shorten(job.get("title") or "(no title)", CARD_TITLE_CHARS))
+    desc = html.escape((job.get("description") or "")[:400])
+    platform = html.escape(job.get("platform") or "Unknown")
+    original_url = job.get("original_url") or job.get("url")
+    proposal_url = job.get("affiliate_url") or original_url
+
+    if job.get("budget_amount"):
+        budget = html.escape(f"{job['budget_amount']} {job.get('budget_currency') or ''}".strip())
+    else:
+        budget = "N/A"
+
+    msg = (
+        f"<b>{title}</b>\n"
+        f"🪙 <b>Budget:</b> {budget}\n"
+        f"🌍 <b>Source:</b> {platform}\n"
+    )
+    if job.get("match_keyword"):
+        msg += f"🔍 <b>Match:</b> {html.escape(shorten(job['match_keyword'], CARD_MATCH_CHARS))}\n"
+    msg += f"📝 {desc}"
+
+    jid = job.get("job_id") or job.get("id")
+    rows = []
+    if original_url:
+        rows.append([
+            {"text": "Proposal", "url": proposal_url},
+            {"text": "Original", "url": original_url},
+        ])
+    rows.append([
+        {"text": "⭐ Save", "callback_data": f"act:save:{jid}"},
+        {"text": "🗑️ Delete", "callback_data": f"act:del:{jid}"},
+    ])
+
+    return msg, {"inline_keyboard": rows}
+
+
+def send_job_to_user(tid: int, job: dict):
+    """Queues a job card for a normalized job dict on the shared delivery engine."""
+    from telegram_delivery import get_delivery_engine
+
+    msg, kb = build_job_card(job)
+    return get_delivery_engine().send_message(tid, msg, reply_markup=kb, parse_mode="HTML")
+
+
 # ----------------------------------------------------------
 # AFFILIATE WRAPPER
 # ----------------------------------------------------------
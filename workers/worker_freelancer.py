@@ -1,18 +1,17 @@
 ﻿#!/usr/bin/env python3
-import os
 import time
 import logging
 import requests
-from datetime import datetime, timezone
 
-from db import get_session, close_session
-from sqlalchemy import text
-from db_events import record_event
-from db_keywords import get_keywords
-from utils import wrap_affiliate_link
-
-BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-CHAT_API = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+from db_events import ack_sends, claim_events
+from db_jobs import store_jobs
+from keyword_matcher import KeywordMatcher
+from platform_freelancer import (
+    MAX_PAGES, PAGE_SIZE, advance_watermark, incremental_params,
+    load_watermark, normalize_project, save_watermark, split_new_projects,
+)
+from telegram_delivery import get_delivery_engine
+from utils import build_job_card, wrap_affiliate_link
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("freelancer_worker")
@@ -20,130 +19,74 @@ log = logging.getLogger("freelancer_worker")
 API_URL = "https://www.freelancer.com/api/projects/0.1/projects/active/"
 
 
-def posted_ago(ts):
-    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
-    diff = datetime.now(timezone.utc) - dt
+def fetch_freelancer_jobs():
+    """
+    Only projects newer than the persisted watermark (see platform_freelancer).
+    Returns (projects, new watermark or None); save it once they are processed.
+    """
+    wm_ts, wm_ids = load_watermark()
 
-    mins = int(diff.total_seconds() // 60)
-    hrs = mins // 60
-    days = hrs // 24
+    fresh = []
+    for page in range(MAX_PAGES):
+        r = requests.get(API_URL, params=incremental_params(wm_ts, page * PAGE_SIZE), timeout=20)
+        r.raise_for_status()
+        projects = r.json()["result"]["projects"]
 
-    if mins < 1:
-        return "just now"
-    if mins < 60:
-        return f"{mins} minutes ago"
-    if hrs < 24:
-        return f"{hrs} hours ago"
-    return f"{days} days ago"
+        new, reached = split_new_projects(projects, wm_ts, wm_ids)
+        fresh.extend(new)
 
+        if reached or wm_ts is None or len(projects) < PAGE_SIZE:
+            break
 
-def fetch_freelancer_jobs():
-    params = {
-        "limit": 30,
-        "full_description": True,
-        "job_details": True,
-        "sort_field": "time_submitted",
-        "sort_direction": "desc"
-    }
-    r = requests.get(API_URL, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()["result"]["projects"]
-
-
-def already_sent(user_id, job_id):
-    db = get_session()
-    try:
-        r = db.execute(
-            text("SELECT 1 FROM feed_event WHERE user_id=:u AND job_id=:j"),
-            {"u": user_id, "j": job_id}
-        ).fetchone()
-        return bool(r)
-    finally:
-        close_session(db)
+    watermark = advance_watermark(fresh, wm_ts, wm_ids) if fresh else None
+    return fresh, watermark
 
 
 def send_job_card(chat_id, job, match_kw):
-    budget_min = job.get("budget", {}).get("minimum")
-    budget_max = job.get("budget", {}).get("maximum")
-    currency = job.get("currency", {}).get("code", "USD")
-
-    title = job.get("title", "Untitled")
-    desc = job.get("preview_description", "")[:400]
-
-    ts = job.get("time_submitted")
-    ago = posted_ago(ts)
-
-    budget_text = f"{budget_min}â€“{budget_max} {currency}"
-    usd = job.get("budget", {}).get("minimum_usd")
-    if usd:
-        budget_text += f" ({usd}$)"
-
-    msg = (
-        f"*{title}*\n"
-        f"ðŸª™ *Budget:* {budget_text}\n"
-        f"ðŸŒ *Source:* Freelancer\n"
-        f"ðŸ” *Match:* {match_kw}\n"
-        f"ðŸ“ {desc}\n"
-        f"ðŸ•’ {ago}"
-    )
-
-    jid = str(job["id"])
-
-    kb = {
-        "inline_keyboard": [
-            [
-                {"text": "Proposal", "url": wrap_affiliate_link(job["seo_url"])},
-                {"text": "Original", "url": wrap_affiliate_link(job["seo_url"])}
-            ],
-            [
-                {"text": "â­ Save", "callback_data": f"act:save:{jid}"},
-                {"text": "ðŸ—‘ï¸ Delete", "callback_data": f"act:del:{jid}"}
-            ]
-        ]
-    }
-
-    requests.post(CHAT_API, json={
-        "chat_id": chat_id,
-        "text": msg,
-        "parse_mode": "Markdown",
-        "reply_markup": kb
-    })
-
-
-def process_user_jobs(user_id):
-    kws = get_keywords(user_id)
-    if not kws:
+    """Queues the shared HTML job card for a raw Freelancer project."""
+    card = normalize_project(job)
+    card.update(affiliate_url=wrap_affiliate_link(card["url"]), match_keyword=match_kw)
+    msg, kb = build_job_card(card)
+    return get_delivery_engine().send_message(chat_id, msg, reply_markup=kb, parse_mode="HTML")
+
+
+def run_cycle():
+    """
+    One worker cycle: fetch the feed once, build the keyword matcher from
+    every active user's keywords, fan each job out to the users it hits,
+    then claim all (user, job) pairs in one round-trip, send only the
+    newly claimed ones and record which sends went through.
+    """
+    matcher = KeywordMatcher.from_db()
+    if not matcher.patterns:
         return
 
-    jobs = fetch_freelancer_jobs()
+    jobs, watermark = fetch_freelancer_jobs()
 
+    candidates = {}
     for job in jobs:
         jid = str(job["id"])
-        fulltext = (job.get("title", "") + " " + job.get("preview_description", "")).lower()
-
-        match = None
-        for k in kws:
-            if k.lower() in fulltext:
-                match = k
-                break
+        fulltext = job.get("title", "") + " " + job.get("preview_description", "")
 
-        if not match:
-            continue
+        for uid, matched in matcher.match(fulltext).items():
+            candidates[(uid, "freelancer", jid)] = (job, matched)
 
-        if already_sent(user_id, jid):
-            continue
-
-        send_job_card(user_id, job, match)
-        record_event(user_id, "freelancer", jid)
+    matched_jobs = {key[2]: job for key, (job, _) in candidates.items()}
+    refs = store_jobs("freelancer", [normalize_project(p) for p in matched_jobs.values()])
 
+    sends = {}
+    for key in claim_events(candidates.keys(), refs):
+        job, matched = candidates[key]
+        try:
+            sends[key] = send_job_card(key[0], job, ", ".join(matched))
+        except Exception as e:
+            log.error(f"User {key[0]} error: {e}")
+    # unsent claims stay 'claimed' and are picked up by the ingest redelivery sweep
+    ack_sends(sends, timeout=60)
 
-def get_all_users():
-    db = get_session()
-    try:
-        rows = db.execute(text("SELECT telegram_id FROM app_user WHERE active=true")).fetchall()
-        return [r[0] for r in rows]
-    finally:
-        close_session(db)
+    # only now: a failure above leaves the watermark alone and refetches these projects
+    if watermark:
+        save_watermark(*watermark)
 
 
 if __name__ == "__main__":
@@ -151,8 +94,7 @@ if __name__ == "__main__":
 
     while True:
         try:
-            for uid in get_all_users():
-                process_user_jobs(uid)
+            run_cycle()
         except Exception as e:
             log.error(f"Worker error: {e}")
 
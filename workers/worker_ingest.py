@@ -0,0 +1,330 @@
+﻿#!/usr/bin/env python3
+import os
+import asyncio
+import hashlib
+import logging
+import random
+import signal
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from config import PLATFORMS, WORKER_INTERVAL
+from db_events import claim_events, ensure_feed_events_schema, get_event_writer
+from db_jobs import ensure_job_schema, fetch_unsent_jobs, store_jobs
+from db_platform_state import ensure_platform_state_schema
+from digest import DigestRouter, ensure_digest_schema, get_digest_users
+from http_client import HostUnavailable, get_http_client, close_http_client
+from keyword_matcher import KeywordMatcher
+from metrics import DEDUP_HITS, FETCH_SECONDS, JOBS_PARSED, MATCHES, start_publisher
+from near_duplicates import NearDuplicateIndex
+from scheduler import SCHEDULER_ADAPTIVE, AdaptiveScheduler
+from telegram_delivery import DeliveryEngine
+from tracing import Cycle, start_cycle
+
+from platform_freelancer import fetch_freelancer_new_jobs
+from platform_peopleperhour import fetch_peopleperhour_jobs
+from platform_skywalker import fetch_skywalker_jobs
+from platform_kariera import fetch_kariera_jobs
+from platform_careerjet import fetch_careerjet_jobs
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger("worker.ingest")
+
+MATCHER_TTL = int(os.getenv("MATCHER_TTL", "60"))
+NEAR_DUP_DETECTION = os.getenv("NEAR_DUP_DETECTION", "1") == "1"
+# claims still unsent after this long (and not held in this process) are sent again
+REDELIVER_AFTER = int(os.getenv("FEED_REDELIVER_AFTER", "600"))
+REDELIVER_INTERVAL = int(os.getenv("FEED_REDELIVER_INTERVAL", "300"))
+
+# name -> (fetch(client) coroutine factory, default interval in seconds)
+# Fetchers are called without keywords: we pull the latest listings once
+# and match them against every user's keywords locally. A fetcher may
+# return (jobs, commit) instead of jobs; commit is an async callable that
+# persists its progress (a watermark, page validators, seen keys) and is
+# awaited only after the jobs have been processed.
+# Fetch errors propagate: an empty list must mean "nothing new", since
+# that is what the adaptive scheduler learns from.
+FETCHERS = {
+    "freelancer": (lambda client: fetch_freelancer_new_jobs(client), 60),
+    "peopleperhour": (lambda client: fetch_peopleperhour_jobs(client), WORKER_INTERVAL),
+    "skywalker": (lambda client: fetch_skywalker_jobs([], client), WORKER_INTERVAL),
+    "kariera": (lambda client: fetch_kariera_jobs([], client), WORKER_INTERVAL),
+    "careerjet": (lambda client: fetch_careerjet_jobs([], client), WORKER_INTERVAL),
+}
+
+
+def fetch_result(result):
+    """Splits a fetcher's return value into (jobs, commit or None)."""
+    return result if isinstance(result, tuple) else (result, None)
+
+
+def platform_interval(name: str, default: int) -> int:
+    return int(os.getenv(f"INTERVAL_{name.upper()}", str(default)))
+
+
+def batch_span(traces: dict, stage: str, start: float):
+    """Records a batch stage that ended now on every live trace of the batch."""
+    end = time.perf_counter()
+    for trace in traces.values():
+        trace.add_span(stage, start, end)
+
+
+def finish_traces(traces: dict, keep: set, outcome: str):
+    """Finishes traces of jobs that stop here (not in `keep`) with `outcome`."""
+    for jid in [jid for jid in traces if jid not in keep]:
+        traces.pop(jid).finish(outcome=outcome)
+
+
+async def trace_delivery(trace, futures: list, job: dict):
+    start = time.perf_counter()
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    trace.add_span("deliver", start, time.perf_counter(),
+                   recipients=len(results), failed=sum(1 for r in results if r is not True))
+
+    age_s = None
+    posted = job.get("posted_at")
+    if isinstance(posted, datetime):
+        if posted.tzinfo is None:
+            posted = posted.replace(tzinfo=timezone.utc)
+        age_s = round((datetime.now(timezone.utc) - posted).total_seconds(), 1)
+    trace.finish(outcome="delivered", age_s=age_s)
+
+
+def job_id_for(job: dict) -> str:
+    """Stable short id for a normalized job (fits in Telegram callback_data)."""
+    if job.get("job_id"):
+        return str(job["job_id"])
+    return hashlib.sha1((job.get("url") or job.get("title") or "").encode()).hexdigest()[:16]
+
+
+class IngestionEngine:
+    """
+    Runs every enabled platform fetcher on one event loop, each on its own
+    schedule, and feeds the results through match -> dedup -> deliver.
+    """
+
+    def __init__(self, platforms: dict = None):
+        self.platforms = platforms if platforms is not None else {
+            name: spec for name, spec in FETCHERS.items() if PLATFORMS.get(name, False)
+        }
+        self.delivery = DeliveryEngine()
+        self.digests = DigestRouter(self.delivery)
+        self.http = None
+        # one index for all platforms: a repost elsewhere collapses into the first delivery
+        self.near_dups = NearDuplicateIndex() if NEAR_DUP_DETECTION else None
+        self.scheduler = AdaptiveScheduler() if SCHEDULER_ADAPTIVE else None
+        self._matcher = None
+        self._matcher_at = 0.0
+        self._matcher_lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+        self._trace_tasks = set()
+        self.acks = get_event_writer()
+        self._inflight = set()  # claimed (user, platform, job) keys with a send pending here
+
+    async def get_matcher(self) -> KeywordMatcher:
+        async with self._matcher_lock:
+            if self._matcher is None or time.monotonic() - self._matcher_at > MATCHER_TTL:
+                self._matcher = await asyncio.to_thread(KeywordMatcher.from_db)
+                self.digests.set_windows(await asyncio.to_thread(get_digest_users))
+                self._matcher_at = time.monotonic()
+            return self._matcher
+
+    async def process_jobs(self, platform: str, jobs: list, cycle: Cycle = None) -> int:
+        """Drops cross-platform reposts, then matches, claims and hands jobs to delivery. Returns jobs claimed."""
+        cycle = cycle or Cycle(platform)
+        traces = {}
+        for job in jobs:
+            trace = cycle.trace_job(job_id_for(job))
+            if trace is not None:
+                traces[trace.job_id] = trace
+
+        JOBS_PARSED.labels(platform).inc(len(jobs))
+        if self.near_dups is not None:
+            start = time.perf_counter()
+            unique = self.near_dups.filter_jobs(platform, jobs, job_id_for)
+            batch_span(traces, "near_dup", start)
+            DEDUP_HITS.labels(platform, "near_duplicate").inc(len(jobs) - len(unique))
+            finish_traces(traces, {job_id_for(j) for j in unique}, "near_duplicate")
+            jobs = unique
+        if not jobs:
+            return 0
+
+        matcher = await self.get_matcher()
+        if not matcher.patterns:
+            finish_traces(traces, set(), "no_keywords")
+            return 0
+
+        candidates = {}
+        matched_jobs = {}
+        for job in jobs:
+            jid = job_id_for(job)
+            start = time.perf_counter()
+            fulltext = (job.get("title") or "") + " " + (job.get("description") or "")
+            for uid, matched in matcher.match(fulltext).items():
+                candidates[(uid, platform, jid)] = (job, matched)
+                matched_jobs[jid] = dict(job, job_id=jid)
+            if jid in traces:
+                traces[jid].add_span("match", start, time.perf_counter())
+
+        MATCHES.labels(platform).inc(len(candidates))
+        finish_traces(traces, set(matched_jobs), "no_match")
+        if not candidates:
+            return 0
+
+        # only jobs someone will receive go to the store; unchanged ones are skipped there
+        start = time.perf_counter()
+        refs = await asyncio.to_thread(store_jobs, platform, matched_jobs.values())
+        batch_span(traces, "store", start)
+
+        start = time.perf_counter()
+        claimed = await asyncio.to_thread(claim_events, candidates.keys(), refs)
+        batch_span(traces, "feed_event", start)
+        DEDUP_HITS.labels(platform, "already_sent").inc(len(candidates) - len(claimed))
+        finish_traces(traces, {key[2] for key in claimed}, "already_sent")
+
+        sends = {}
+        for key in claimed:
+            job, matched = candidates[key]
+            card = dict(job, job_id=key[2], match_keyword=", ".join(matched))
+            future = self.deliver(key, card)
+            if key[2] in traces:
+                sends.setdefault(key[2], []).append(future)
+
+        for jid, futures in sends.items():
+            task = asyncio.create_task(trace_delivery(traces[jid], futures, matched_jobs[jid]))
+            self._trace_tasks.add(task)
+            task.add_done_callback(self._trace_tasks.discard)
+
+        return len(claimed)
+
+    def deliver(self, key: tuple, card: dict) -> asyncio.Future:
+        """Sends a claimed job and records the outcome on its feed_event row."""
+        self._inflight.add(key)
+        future = self.digests.send(key[0], card)
+
+        def done(f):
+            self._inflight.discard(key)
+            self.acks.add(key, not f.cancelled() and f.exception() is None and f.result() is True)
+
+        future.add_done_callback(done)
+        return future
+
+    async def redeliver(self) -> int:
+        """Sends claims that never got a successful send (failed, or lost in a crash)."""
+        rows = await asyncio.to_thread(fetch_unsent_jobs, REDELIVER_AFTER)
+        sent = 0
+        for user_id, job in rows:
+            key = (user_id, job.platform, job.id)
+            if key in self._inflight:
+                continue
+            self.deliver(key, dict(vars(job), job_id=job.id))
+            sent += 1
+        return sent
+
+    async def run_redelivery(self):
+        while not self._stop.is_set():
+            try:
+                sent = await self.redeliver()
+                if sent:
+                    log.info(f"Redelivering {sent} unsent jobs")
+            except Exception as e:
+                log.error(f"Redelivery error: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=REDELIVER_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_platform(self, name: str, fetch, interval: int):
+        schedule = self.scheduler.platforms.get(name) if self.scheduler else None
+        if schedule is None:
+            log.info(f"[{name}] scheduled every {interval}s")
+        # spread the first fetches so platforms don't all fire at once
+        await asyncio.sleep(random.uniform(0, min(5, interval)))
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            cycle = start_cycle(name)
+            delay = interval
+            try:
+                with FETCH_SECONDS.labels(name).time(), cycle.stage("fetch"):
+                    jobs = await fetch(self.http)
+                jobs, commit = fetch_result(jobs)
+                if schedule is not None:
+                    schedule.observe(job_id_for(j) for j in jobs)
+                sent = await self.process_jobs(name, jobs, cycle)
+                if commit is not None:
+                    await commit()
+                log.info(f"[{name}] {len(jobs)} jobs, {sent} new deliveries "
+                         f"({time.monotonic() - started:.1f}s)")
+            except HostUnavailable as e:
+                log.warning(f"[{name}] fetch skipped: {e}")
+            except httpx.HTTPError as e:
+                log.error(f"[{name}] fetch error: {e}")
+            except Exception as e:
+                log.error(f"[{name}] cycle error: {e}", exc_info=True)
+
+            if schedule is not None:
+                delay = schedule.next_delay()
+                try:
+                    await asyncio.to_thread(self.scheduler.save, name)
+                except Exception as e:
+                    log.warning(f"[{name}] could not save schedule: {e}")
+                log.info(f"[{name}] next fetch in {delay:.0f}s "
+                         f"({schedule.last_new} new, {schedule.rate() * 60:.2f} jobs/min)")
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        await asyncio.to_thread(ensure_feed_events_schema)
+        await asyncio.to_thread(ensure_job_schema)
+        await asyncio.to_thread(ensure_platform_state_schema)
+        await asyncio.to_thread(ensure_digest_schema)
+
+        if self.scheduler is not None:
+            for name, (_, interval) in self.platforms.items():
+                self.scheduler.add(name, platform_interval(name, interval))
+            await asyncio.to_thread(self.scheduler.load)
+
+        self.http = get_http_client()
+        await self.delivery.start()
+        start_publisher("ingest")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except NotImplementedError:
+                pass
+
+        tasks = [
+            asyncio.create_task(self.run_platform(name, fetch, platform_interval(name, interval)))
+            for name, (fetch, interval) in self.platforms.items()
+        ]
+        tasks.append(asyncio.create_task(self.run_redelivery()))
+        log.info(f"✅ Ingestion started: {', '.join(self.platforms) or '(no platforms)'}")
+
+        try:
+            await self._stop.wait()
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.digests.stop()
+            log.info(f"Digest stats: {self.digests.get_stats()}")
+            await self.delivery.stop()
+            await asyncio.to_thread(self.acks.close)
+            log.info(f"Ack writer stats: {self.acks.get_stats()}")
+            await close_http_client()
+            if self.near_dups is not None:
+                log.info(f"Near-duplicate index stats: {self.near_dups.get_stats()}")
+            if self.scheduler is not None:
+                log.info(f"Scheduler stats: {self.scheduler.get_stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(IngestionEngine().run())
@@ -2,55 +2,47 @@
 import logging
 import os
 import requests
-from bs4 import BeautifulSoup
 
-from db import get_session, close_session
-from db_keywords import get_keywords_for_user
-from db_events import record_event
+from db_keywords import get_all_user_keywords
+from db_events import ack_sends, claim_events
+from db_jobs import store_jobs
+from html_parser import CardParser
+from query_planner import QueryPlanner, TTLCache
 from utils import send_job_to_user
 
 log = logging.getLogger("worker.pph")
 
 INTERVAL = int(os.getenv("WORKER_INTERVAL", "180"))
+# Cross-cycle reuse of search results, off by default (0). The planner
+# already scrapes each query once per cycle; a TTL above INTERVAL makes a
+# cycle reuse the previous one's results instead of scraping, so a new job
+# can reach users up to one extra INTERVAL later. Only worth it to cut load.
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "0"))
 
 BASE_URL = "https://www.peopleperhour.com/freelance-jobs?search="
 
+CARD_PARSER = CardParser("li.project", {
+    "title": "h3 a",
+    "desc": ".project__description",
+    "budget": ".project__budget",
+})
 
-def fetch_pph(keyword: str):
-    """
-    Scrapes PeoplePerHour for matching jobs.
-    """
-    url = BASE_URL + requests.utils.quote(keyword)
-    headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
-
-    try:
-        r = requests.get(url, headers=headers, timeout=15)
-        if r.status_code != 200:
-            return []
-    except Exception:
-        return []
-
-    soup = BeautifulSoup(r.text, "html.parser")
-    results = soup.select("li.project")
 
+def parse_pph(html: str, parser: CardParser = CARD_PARSER):
     jobs = []
 
-    for item in results:
+    for item in parser.cards(html):
         try:
-            title_el = item.select_one("h3 a")
+            title_el = parser.first(item, "title")
             if not title_el:
                 continue
 
             title = title_el.get_text(strip=True)
             link = "https://www.peopleperhour.com" + title_el.get("href")
 
-            desc_el = item.select_one(".project__description")
-            desc = desc_el.get_text(strip=True) if desc_el else ""
+            desc = parser.text(item, "desc")
 
-            budget_el = item.select_one(".project__budget")
-            budget_text = budget_el.get_text(strip=True) if budget_el else None
+            budget_text = parser.text(item, "budget", None)
 
             amount = None
             currency = None
@@ -82,39 +74,48 @@ def fetch_pph(keyword: str):
     return jobs
 
 
-def run_once():
-    db = get_session()
+def fetch_pph(keyword: str):
+    """
+    Scrapes PeoplePerHour for matching jobs.
+    """
+    url = BASE_URL + requests.utils.quote(keyword)
+    headers = {
+        "User-Agent": "Mozilla/5.0"
+    }
 
     try:
-        users = db.execute("SELECT telegram_id FROM users").fetchall()
-    finally:
-        close_session(db)
+        r = requests.get(url, headers=headers, timeout=15)
+        if r.status_code != 200:
+            return []
+    except Exception:
+        return []
 
-    for (telegram_id,) in users:
-        keywords = get_keywords_for_user(telegram_id)
-        if not keywords:
-            continue
+    return parse_pph(r.text)
 
-        for kw in keywords:
-            jobs = fetch_pph(kw)
-            if not jobs:
-                continue
 
-            for job in jobs:
-                event = {
-                    "platform": "pph",
-                    "job_id": job["job_id"],
-                    "telegram_id": telegram_id,
-                    "title": job["title"],
-                    "description": job["description"],
-                    "original_url": job["original_url"],
-                    "affiliate_url": job["affiliate_url"],
-                    "budget_amount": job["budget_amount"],
-                    "budget_currency": job["budget_currency"],
-                }
-
-                if record_event(**event):
-                    send_job_to_user(telegram_id, event)
+# keyword -> jobs, shared across cycles
+_query_cache = TTLCache(QUERY_CACHE_TTL) if QUERY_CACHE_TTL > 0 else None
+
+
+def run_once():
+    """
+    Scrapes each distinct keyword once, no matter how many users follow it,
+    then claims and sends the results to every subscriber.
+    """
+    planner = QueryPlanner(get_all_user_keywords())
+    if not planner.routes:
+        return
+
+    results = planner.fetch_all(fetch_pph, _query_cache)
+    candidates = planner.route(results, "pph")
+    refs = store_jobs("pph", {key[2]: job for key, (job, _) in candidates.items()}.values())
+
+    sends = {}
+    for key in claim_events(candidates.keys(), refs):
+        job, matched = candidates[key]
+        event = dict(job, platform="pph", match_keyword=", ".join(matched))
+        sends[key] = send_job_to_user(key[0], event)
+    ack_sends(sends, timeout=INTERVAL)
 
 
 def main_loop():
@@ -4,10 +4,10 @@ import time
 import sys
 import os
 
+# All platforms run concurrently inside the single ingestion process.
+# The per-platform worker_*.py scripts remain for standalone debugging.
 WORKERS = [
-    "worker_freelancer.py",
-    "worker_pph.py",
-    "worker_skywalker.py"
+    "worker_ingest.py"
 ]
 
 def run_worker(path):